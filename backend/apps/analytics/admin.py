@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import StudentProgress, TestAnalytics, TestAttemptHistory
+from .models import StudentProgress, TestAnalytics, TestAttemptHistory, QuestionStats
 
 @admin.register(StudentProgress)
 class StudentProgressAdmin(admin.ModelAdmin):
@@ -19,4 +19,9 @@ class TestAttemptHistoryAdmin(admin.ModelAdmin):
     list_display = ('student', 'test', 'score', 'completed_at', 'duration')
     list_filter = ('completed_at', 'test__subject')
     search_fields = ('student__email', 'test__title')
-    readonly_fields = ('completed_at',)
\ No newline at end of file
+    readonly_fields = ('completed_at',)
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ('question', 'response_count', 'p_value', 'point_biserial', 'discrimination_index', 'distractor_efficiency', 'flags')
+    search_fields = ('question__question_text',)
+    readonly_fields = ('updated_at',)
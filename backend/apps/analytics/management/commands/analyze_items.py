@@ -0,0 +1,31 @@
+# apps/analytics/management/commands/analyze_items.py
+import time
+from django.core.management.base import BaseCommand
+from apps.analytics.services.item_analysis_service import ItemAnalysisService
+
+
+class Command(BaseCommand):
+    help = 'Runs item analysis for one test (report only) or stores QuestionStats for every question'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, help='Print item statistics for this test id without storing them')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['test']:
+            rows = ItemAnalysisService.analyze_test(options['test'])
+            for question_id, row in rows.items():
+                self.stdout.write(
+                    f"Q{question_id}: n={row['response_count']} p={row['p_value']:.2f} "
+                    f"r_pb={row['point_biserial']:.2f} D={row['discrimination_index']:.2f} "
+                    f"DE={row['distractor_efficiency']:.2f} {' '.join(row['flags'])}"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"Analyzed {len(rows)} questions in {time.perf_counter() - start:.2f}s"
+            ))
+            return
+        stats = ItemAnalysisService.analyze_since(None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored statistics for {stats['questions']} questions ({stats['flagged']} flagged) "
+            f"in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,24 @@
+# apps/analytics/management/commands/calibrate_items.py
+import time
+from django.core.management.base import BaseCommand
+from apps.analytics.services.calibration_service import CalibrationService
+
+
+class Command(BaseCommand):
+    help = 'Fits IRT difficulty/discrimination for every question and stores them in QuestionStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=CalibrationService.MODELS, default='2PL')
+        parser.add_argument('--max-iter', type=int, default=None, help='Sweep limit')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = CalibrationService.calibrate(model=options['model'], max_iter=options['max_iter'])
+        message = (
+            f"Calibrated {stats['questions']} questions from {stats['responses']} responses "
+            f"in {stats['iterations']} sweeps ({time.perf_counter() - start:.1f}s)"
+        )
+        if stats['converged']:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(self.style.WARNING(f"{message}; did not converge"))
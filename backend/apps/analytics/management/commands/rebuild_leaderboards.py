@@ -0,0 +1,17 @@
+# apps/analytics/management/commands/rebuild_leaderboards.py
+from django.core.management.base import BaseCommand
+from apps.analytics.services.leaderboard_service import LeaderboardService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the Redis test and subject leaderboards from graded attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', type=int, action='append', dest='tests',
+                            help='Only rebuild boards for this test id and its subject (repeatable)')
+
+    def handle(self, *args, **options):
+        stats = LeaderboardService.rebuild(options['tests'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {stats['tests']} test and {stats['subjects']} subject leaderboards."
+        ))
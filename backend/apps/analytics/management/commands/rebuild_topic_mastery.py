@@ -0,0 +1,15 @@
+# apps/analytics/management/commands/rebuild_topic_mastery.py
+from django.core.management.base import BaseCommand
+from apps.analytics.services.mastery_service import MasteryService
+
+
+class Command(BaseCommand):
+    help = 'Recomputes TopicMastery rows from stored responses (backfill or repair)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='students',
+                            help='Only rebuild this student id (repeatable)')
+
+    def handle(self, *args, **options):
+        created = MasteryService.rebuild(options['students'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {created} topic mastery rows."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testanalytics',
+            name='scored_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
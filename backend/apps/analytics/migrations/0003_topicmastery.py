@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_testanalytics_scored_attempts'),
+        ('content', '0002_alter_question_created_by_alter_question_topics_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('time_sum', models.PositiveBigIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_mastery', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to='content.topic')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student'], name='analytics_t_student_01a3ee_idx')],
+                'unique_together': {('student', 'topic')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_topicmastery'),
+        ('content', '0002_alter_question_created_by_alter_question_topics_and_more'),
+        ('examination', '0008_testattempt_test_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSubjectRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('granularity', models.CharField(choices=[('D', 'Daily'), ('W', 'Weekly')], max_length=1)),
+                ('period_start', models.DateField()),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('best_score', models.FloatField(blank=True, null=True)),
+                ('duration_sum', models.PositiveBigIntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_rollups', to=settings.AUTH_USER_MODEL)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'granularity', 'period_start'], name='analytics_s_student_d455c4_idx')],
+                'unique_together': {('student', 'subject', 'granularity', 'period_start')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('granularity', models.CharField(choices=[('D', 'Daily'), ('W', 'Weekly')], max_length=1)),
+                ('period_start', models.DateField()),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.FloatField(default=0)),
+                ('best_score', models.FloatField(blank=True, null=True)),
+                ('duration_sum', models.PositiveBigIntegerField(default=0)),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='examination.test')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['test', 'granularity', 'period_start'], name='analytics_t_test_id_437a5c_idx')],
+                'unique_together': {('test', 'granularity', 'period_start')},
+            },
+        ),
+    ]
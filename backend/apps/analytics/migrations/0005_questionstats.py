@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_studentsubjectrollup_testrollup'),
+        ('content', '0002_alter_question_created_by_alter_question_topics_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('response_count', models.PositiveIntegerField(default=0)),
+                ('p_value', models.FloatField(blank=True, null=True)),
+                ('point_biserial', models.FloatField(blank=True, null=True)),
+                ('discrimination_index', models.FloatField(blank=True, null=True)),
+                ('distractor_efficiency', models.FloatField(blank=True, null=True)),
+                ('option_counts', models.JSONField(default=dict)),
+                ('flags', models.JSONField(default=list)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='content.question')),
+            ],
+            options={
+                'verbose_name_plural': 'question stats',
+            },
+        ),
+    ]
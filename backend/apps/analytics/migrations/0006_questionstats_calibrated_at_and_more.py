@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_questionstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionstats',
+            name='calibrated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='irt_difficulty',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='irt_discrimination',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='irt_model',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_scored_attempts(apps, schema_editor):
+    """Rows written before 0002 have scored_attempts=0, which would make the first
+    incremental merge discard the stored average; count the attempts behind it."""
+    TestAnalytics = apps.get_model('analytics', 'TestAnalytics')
+    TestAttempt = apps.get_model('examination', 'TestAttempt')
+    counts = TestAttempt.objects.filter(
+        test_id=OuterRef('test_id'), score__isnull=False
+    ).order_by().values('test_id').annotate(total=Count('id')).values('total')
+    TestAnalytics.objects.filter(scored_attempts=0).update(
+        scored_attempts=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_questionstats_calibrated_at_and_more'),
+        ('examination', '0009_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_scored_attempts, migrations.RunPython.noop),
+    ]
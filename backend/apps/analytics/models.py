@@ -33,52 +33,70 @@ class StudentProgress(TimeStampedModel):
             raise ValidationError("Only students can have progress records.")
 
     def update_progress(self):
-        from apps.examination.models import TestAttempt, StudentResponse
-        from apps.content.models import Topic
-        logger.debug(f'Updating progress for student {self.student.email}, subject {self.subject.name}')
+        from apps.examination.models import TestAttempt
+        logger.debug(f'Updating progress for student {self.student_id}, subject {self.subject_id}')
         attempts = TestAttempt.objects.filter(
             student=self.student,
             test__subject=self.subject,
             score__isnull=False
         )
-        logger.debug(f'Found {attempts.count()} attempts')
-        self.total_attempts = attempts.count()
-        if self.total_attempts > 0:
-            self.average_score = attempts.aggregate(models.Avg('score'))['score__avg']
-        else:
-            self.average_score = 0
-
-        # Update strength and weakness topics
-        responses = StudentResponse.objects.filter(
-            attempt__in=attempts,
-            question__topics__subject=self.subject
-        ).select_related('question')
-        logger.debug(f'Found {responses.count()} responses')
-        
-        topic_performance = {}
-        for response in responses:
-            for topic in response.question.topics.all():
-                if topic.id not in topic_performance:
-                    topic_performance[topic.id] = {'correct': 0, 'total': 0}
-                topic_performance[topic.id]['total'] += 1
-                if response.is_correct:
-                    topic_performance[topic.id]['correct'] += 1
+        totals = attempts.aggregate(count=models.Count('id'), average=models.Avg('score'))
+        self.total_attempts = totals['count']
+        self.average_score = totals['average'] if self.total_attempts > 0 else 0
+        logger.debug(f'Found {self.total_attempts} attempts')
 
-        self.strength_topics.clear()
-        self.weakness_topics.clear()
+        # Per-topic correct/total from the materialized mastery counters
+        topic_performance = TopicMastery.objects.filter(
+            student=self.student,
+            topic__subject=self.subject
+        ).values('topic_id', 'topic__name', 'correct', 'total').order_by('topic_id')
+
+        strength_ids, weakness_ids = [], []
         feedback_lines = []
-        for topic_id, perf in topic_performance.items():
+        for perf in topic_performance:
             accuracy = perf['correct'] / perf['total'] if perf['total'] > 0 else 0
-            topic = Topic.objects.get(id=topic_id)
             if accuracy >= 0.8:
-                self.strength_topics.add(topic)
+                strength_ids.append(perf['topic_id'])
             elif accuracy < 0.5:
-                self.weakness_topics.add(topic)
-                feedback_lines.append(f"Review {topic.name} (accuracy: {accuracy:.0%}). Suggested: Study related material in {self.subject.name}.")
+                weakness_ids.append(perf['topic_id'])
+                feedback_lines.append(f"Review {perf['topic__name']} (accuracy: {accuracy:.0%}). Suggested: Study related material in {self.subject.name}.")
+
+        self.strength_topics.clear()
+        self.weakness_topics.clear()
+        if strength_ids:
+            self.strength_topics.add(*strength_ids)
+        if weakness_ids:
+            self.weakness_topics.add(*weakness_ids)
 
         self.feedback = '\n'.join(feedback_lines) or "Keep practicing to identify strengths and weaknesses."
         self.save()
         logger.info(f'Saved StudentProgress: total_attempts={self.total_attempts}, average_score={self.average_score}')
+
+class TopicMastery(TimeStampedModel):
+    """Running per-student, per-topic answer counters, updated once per graded attempt."""
+    student = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='topic_mastery')
+    topic = models.ForeignKey('content.Topic', on_delete=models.CASCADE, related_name='mastery')
+    correct = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    time_sum = models.PositiveBigIntegerField(default=0)  # seconds
+
+    class Meta:
+        unique_together = ['student', 'topic']
+        indexes = [
+            models.Index(fields=['student']),
+        ]
+
+    @property
+    def accuracy(self):
+        return self.correct / self.total if self.total else 0
+
+    @property
+    def avg_time(self):
+        return self.time_sum / self.total if self.total else 0
+
+    def __str__(self):
+        return f"{self.student_id} - {self.topic_id}: {self.correct}/{self.total}"
+
 class TestAnalytics(TimeStampedModel):
     test = models.OneToOneField('examination.Test', on_delete=models.CASCADE)
     average_score = models.FloatField(
@@ -90,6 +108,7 @@ class TestAnalytics(TimeStampedModel):
     difficulty_distribution = models.JSONField(default=dict)  # e.g., {"E": 2, "M": 2, "H": 1}
     question_analysis = models.JSONField(default=dict)  # e.g., {"51": {"correct_count": 20, "incorrect_count": 5, "common_wrong_answers": {"B": 3}}}
     anomalies = models.JSONField(default=dict)  # e.g., {"51": {"excessive_time_count": 5}}
+    scored_attempts = models.PositiveIntegerField(default=0)  # attempts behind average_score, for incremental merges
 
     class Meta:
         indexes = [
@@ -100,40 +119,54 @@ class TestAnalytics(TimeStampedModel):
     def update_analytics(self):
         from apps.examination.models import TestAttempt, StudentResponse
         attempts = TestAttempt.objects.filter(test=self.test, score__isnull=False)
-        self.average_score = attempts.aggregate(models.Avg('score'))['score__avg'] or 0
+        totals = attempts.aggregate(average=models.Avg('score'), count=models.Count('id'))
+        self.average_score = totals['average'] or 0
+        self.scored_attempts = totals['count']
 
         # Difficulty distribution
-        questions = self.test.questions.all()
-        self.difficulty_distribution = {
-            'E': questions.filter(difficulty='E').count(),
-            'M': questions.filter(difficulty='M').count(),
-            'H': questions.filter(difficulty='H').count()
+        questions = list(self.test.questions.values_list('id', 'difficulty'))
+        self.difficulty_distribution = {'E': 0, 'M': 0, 'H': 0}
+        for _, difficulty in questions:
+            if difficulty in self.difficulty_distribution:
+                self.difficulty_distribution[difficulty] += 1
+
+        # Question analysis and anomalies from one grouped pass over the responses
+        question_analysis = {
+            question_id: {'correct_count': 0, 'incorrect_count': 0, 'common_wrong_answers': {}}
+            for question_id, _ in questions
         }
+        excessive_time = {}
+        # Flushed autosaves of in-progress attempts are counted by their delta once submitted
+        groups = StudentResponse.objects.filter(
+            attempt__test=self.test, attempt__end_time__isnull=False, attempt__score__isnull=False
+        ).values(
+            'question_id', 'is_correct', 'selected_answer'
+        ).annotate(
+            count=models.Count('id'),
+            excessive_time_count=models.Count('id', filter=models.Q(time_taken__gt=120))
+        ).order_by()
+        for group in groups:
+            analysis = question_analysis.get(group['question_id'])
+            if analysis is None:  # response to a question no longer in the test
+                continue
+            if group['is_correct']:
+                analysis['correct_count'] += group['count']
+            else:
+                analysis['incorrect_count'] += group['count']
+                if group['selected_answer']:
+                    wrong = analysis['common_wrong_answers']
+                    wrong[group['selected_answer']] = wrong.get(group['selected_answer'], 0) + group['count']
+            if group['excessive_time_count']:
+                excessive_time[group['question_id']] = excessive_time.get(group['question_id'], 0) + group['excessive_time_count']
 
-        # Question analysis and anomalies
-        self.question_analysis = {}
-        self.anomalies = {}
-        for q in questions:
-            responses = StudentResponse.objects.filter(attempt__test=self.test, question=q)
-            correct_count = responses.filter(is_correct=True).count()
-            incorrect_count = responses.filter(is_correct=False).count()
-            
-            # Common wrong answers
-            wrong_answers = responses.filter(is_correct=False).values('selected_answer').annotate(
-                count=models.Count('selected_answer')
-            ).order_by('-count')
-            common_wrong = {item['selected_answer']: item['count'] for item in wrong_answers if item['selected_answer']}
-
-            # Anomalies: excessive time (>120s)
-            excessive_time_count = responses.filter(time_taken__gt=120).count()
-
-            self.question_analysis[str(q.id)] = {
-                'correct_count': correct_count,
-                'incorrect_count': incorrect_count,
-                'common_wrong_answers': common_wrong
-            }
-            if excessive_time_count > 0:
-                self.anomalies[str(q.id)] = {'excessive_time_count': excessive_time_count}
+        for analysis in question_analysis.values():
+            analysis['common_wrong_answers'] = dict(
+                sorted(analysis['common_wrong_answers'].items(), key=lambda item: -item[1])
+            )
+        self.question_analysis = {str(question_id): analysis for question_id, analysis in question_analysis.items()}
+        self.anomalies = {
+            str(question_id): {'excessive_time_count': count} for question_id, count in excessive_time.items()
+        }
 
         self.save()
 
@@ -150,6 +183,7 @@ class TestAttemptHistory(TimeStampedModel):
         indexes = [
             models.Index(fields=['student', 'completed_at']),
             models.Index(fields=['test', 'completed_at']),
+            models.Index(fields=['created_at']),  # rollup watermark
         ]
 
     def clean(self):
@@ -158,4 +192,77 @@ class TestAttemptHistory(TimeStampedModel):
             raise ValidationError("Only students can have attempt history.")
 
 
+class RollupGranularity(models.TextChoices):
+    DAY = 'D', 'Daily'
+    WEEK = 'W', 'Weekly'
+
 
+class StudentSubjectRollup(TimeStampedModel):
+    """TestAttemptHistory aggregated per student, subject and day/week."""
+    student = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='subject_rollups')
+    subject = models.ForeignKey('content.Subject', on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=1, choices=RollupGranularity.choices)
+    period_start = models.DateField()
+    attempt_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    best_score = models.FloatField(null=True, blank=True)
+    duration_sum = models.PositiveBigIntegerField(default=0)  # seconds
+
+    class Meta:
+        unique_together = ['student', 'subject', 'granularity', 'period_start']
+        indexes = [
+            models.Index(fields=['student', 'granularity', 'period_start']),
+        ]
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+
+class TestRollup(TimeStampedModel):
+    """TestAttemptHistory aggregated per test and day/week."""
+    test = models.ForeignKey('examination.Test', on_delete=models.CASCADE, related_name='rollups')
+    granularity = models.CharField(max_length=1, choices=RollupGranularity.choices)
+    period_start = models.DateField()
+    attempt_count = models.PositiveIntegerField(default=0)
+    score_sum = models.FloatField(default=0)
+    best_score = models.FloatField(null=True, blank=True)
+    duration_sum = models.PositiveBigIntegerField(default=0)  # seconds
+
+    class Meta:
+        unique_together = ['test', 'granularity', 'period_start']
+        indexes = [
+            models.Index(fields=['test', 'granularity', 'period_start']),
+        ]
+
+    @property
+    def mean_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+
+class RollupWatermark(TimeStampedModel):
+    """How far a family of rollups has been built; the row is locked while building."""
+    name = models.CharField(max_length=50, unique=True)
+    built_until = models.DateTimeField(null=True, blank=True)  # history created up to here is rolled up; null = never built
+
+    def __str__(self):
+        return f"{self.name} built until {self.built_until}"
+
+
+class QuestionStats(TimeStampedModel):
+    """Classical item statistics for a question, pooled over every test that uses it."""
+    question = models.OneToOneField('content.Question', on_delete=models.CASCADE, related_name='stats')
+    response_count = models.PositiveIntegerField(default=0)
+    p_value = models.FloatField(null=True, blank=True)  # share of correct answers
+    point_biserial = models.FloatField(null=True, blank=True)  # item vs. rest-of-sheet correlation
+    discrimination_index = models.FloatField(null=True, blank=True)  # upper 27% minus lower 27% p-value
+    distractor_efficiency = models.FloatField(null=True, blank=True)  # share of distractors picked by >= 5%
+    option_counts = models.JSONField(default=dict)  # e.g., {"A": 120, "B": 14, "C": 3, "D": 0, "": 2}
+    flags = models.JSONField(default=list)  # e.g., ["too_hard", "possible_miskey"]
+    irt_model = models.CharField(max_length=3, blank=True, default='')  # '1PL' or '2PL'
+    irt_difficulty = models.FloatField(null=True, blank=True)  # b, on the ability scale (mean 0, sd 1)
+    irt_discrimination = models.FloatField(null=True, blank=True)  # a
+    calibrated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'question stats'
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import StudentProgress, TestAnalytics, TestAttemptHistory
+from .models import StudentProgress, TestAnalytics, TestAttemptHistory, TopicMastery
 from apps.content.models import Subject, Topic
 from apps.examination.models import Test
 
@@ -34,3 +34,15 @@ class TestAnalyticsSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestAnalytics
         fields = ['test', 'average_score', 'difficulty_distribution', 'question_analysis', 'anomalies']
+
+
+class TopicMasterySerializer(serializers.ModelSerializer):
+    topic = serializers.StringRelatedField()
+    topic_id = serializers.PrimaryKeyRelatedField(source='topic', read_only=True)
+    subject_id = serializers.IntegerField(source='topic.subject_id', read_only=True)
+    accuracy = serializers.FloatField(read_only=True)
+    avg_time = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TopicMastery
+        fields = ['topic', 'topic_id', 'subject_id', 'correct', 'total', 'accuracy', 'avg_time']
@@ -0,0 +1,288 @@
+# apps/analytics/services/analytics_delta_service.py
+from typing import Dict, Optional, Set
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from apps.analytics.models import TestAnalytics
+from apps.examination.models import TestAttempt, StudentResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsDeltaService:
+    """Incremental test analytics kept as running counters in Redis.
+
+    A completed attempt adds its per-question counts to the test's delta hash
+    (`test_analytics_delta:<test_id>`) in one Lua call, guarded by a per-attempt
+    key so replays are ignored. A periodic compaction folds the pending deltas
+    into the `TestAnalytics` document, so each attempt costs O(its questions)
+    instead of a rescan of every response ever given for the test. The ids of
+    the attempts behind a hash are kept in `test_analytics_pending:<test_id>`.
+
+    Compaction and the full recompute both hold the TestAnalytics row lock.
+    The recompute then marks the attempts it counted as applied, in the same
+    Lua call that drops the pending deltas, so neither a later delta nor a
+    compaction can add them a second time.
+
+    Delta fields: `score_sum`, `score_count`, `<qid>:c`, `<qid>:i`,
+    `<qid>:w:<answer>` and `<qid>:slow` (answers over `EXCESSIVE_TIME` seconds).
+    """
+
+    DELTA_PREFIX = "test_analytics_delta:"
+    PENDING_PREFIX = "test_analytics_pending:"
+    APPLIED_PREFIX = "test_analytics_applied:"
+    DIRTY_SET_KEY = "test_analytics_dirty"
+    APPLIED_TTL = 60 * 60 * 24 * 30
+    EXCESSIVE_TIME = 120
+    # Attempts that ended this long before a recompute have had their delta applied already
+    RECOMPUTE_GUARD_WINDOW = timedelta(days=1)
+    RECOMPUTE_RETRIES = 3
+
+    APPLY_SCRIPT = """
+    if redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) == false then
+        return 0
+    end
+    for i = 4, #ARGV, 2 do
+        redis.call('HINCRBYFLOAT', KEYS[2], ARGV[i], ARGV[i + 1])
+    end
+    redis.call('SADD', KEYS[3], ARGV[2])
+    redis.call('SADD', KEYS[4], ARGV[3])
+    return 1
+    """
+
+    # KEYS: delta, compacting delta, pending, compacting pending, dirty set, guards of the
+    # covered attempts. ARGV: test id, guard TTL, covered attempt ids (in KEYS order).
+    # Returns the pending attempts that are not covered; nothing is changed then.
+    RESET_SCRIPT = """
+    local covered = {}
+    for i = 3, #ARGV do
+        covered[ARGV[i]] = true
+    end
+    local uncovered = {}
+    for _, attempt_id in ipairs(redis.call('SUNION', KEYS[3], KEYS[4])) do
+        if not covered[attempt_id] then
+            table.insert(uncovered, attempt_id)
+        end
+    end
+    if #uncovered > 0 then
+        return uncovered
+    end
+    for i = 6, #KEYS do
+        redis.call('SET', KEYS[i], 1, 'EX', ARGV[2])
+    end
+    redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4])
+    redis.call('SREM', KEYS[5], ARGV[1])
+    return {}
+    """
+
+    # Move pending deltas aside unless a leftover of an interrupted compaction is there
+    BEGIN_COMPACT_SCRIPT = """
+    if redis.call('EXISTS', KEYS[2]) == 1 then
+        return 1
+    end
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return 0
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    if redis.call('EXISTS', KEYS[3]) == 1 then
+        redis.call('RENAME', KEYS[3], KEYS[4])
+    end
+    return 1
+    """
+
+    @staticmethod
+    def delta_key(test_id: int) -> str:
+        return f"{AnalyticsDeltaService.DELTA_PREFIX}{test_id}"
+
+    @staticmethod
+    def pending_key(test_id: int) -> str:
+        return f"{AnalyticsDeltaService.PENDING_PREFIX}{test_id}"
+
+    @staticmethod
+    def guard_key(attempt_id: int) -> str:
+        return f"{AnalyticsDeltaService.APPLIED_PREFIX}{attempt_id}"
+
+    @staticmethod
+    def apply_attempt(attempt_id: int) -> bool:
+        """Add a completed attempt to its test's running counters.
+
+        Returns:
+            True if the delta was recorded, False if the attempt is incomplete
+            or was already applied.
+
+        Raises:
+            TestAttempt.DoesNotExist: If the attempt does not exist.
+        """
+        attempt = TestAttempt.objects.only('id', 'test_id', 'score', 'end_time').get(pk=attempt_id)
+        if not attempt.end_time or attempt.score is None:
+            return False
+
+        increments: Dict[str, float] = {'score_sum': attempt.score, 'score_count': 1}
+        rows = StudentResponse.objects.filter(attempt_id=attempt_id).values_list(
+            'question_id', 'is_correct', 'selected_answer', 'time_taken'
+        )
+        for question_id, is_correct, answer, time_taken in rows:
+            fields = [f"{question_id}:c" if is_correct else f"{question_id}:i"]
+            if not is_correct and answer:
+                fields.append(f"{question_id}:w:{answer}")
+            if time_taken > AnalyticsDeltaService.EXCESSIVE_TIME:
+                fields.append(f"{question_id}:slow")
+            for field in fields:
+                increments[field] = increments.get(field, 0) + 1
+
+        args = [AnalyticsDeltaService.APPLIED_TTL, attempt.test_id, attempt_id]
+        for field, value in increments.items():
+            args.extend([field, value])
+        applied = get_redis_connection('default').eval(
+            AnalyticsDeltaService.APPLY_SCRIPT, 4,
+            AnalyticsDeltaService.guard_key(attempt_id),
+            AnalyticsDeltaService.delta_key(attempt.test_id),
+            AnalyticsDeltaService.DIRTY_SET_KEY,
+            AnalyticsDeltaService.pending_key(attempt.test_id),
+            *args
+        )
+        if not applied:
+            logger.debug(f"Analytics delta for attempt {attempt_id} already applied")
+        return bool(applied)
+
+    @staticmethod
+    def _reset(test_id: int, covered: Set[int]) -> Set[int]:
+        """Drop the pending deltas and mark `covered` as applied, unless an attempt outside it is pending.
+
+        Returns:
+            The pending attempt ids missing from `covered`; empty when the reset happened.
+        """
+        key = AnalyticsDeltaService.delta_key(test_id)
+        pending_key = AnalyticsDeltaService.pending_key(test_id)
+        covered = sorted(covered)
+        uncovered = get_redis_connection('default').eval(
+            AnalyticsDeltaService.RESET_SCRIPT, 5 + len(covered),
+            key, f"{key}:compacting", pending_key, f"{pending_key}:compacting",
+            AnalyticsDeltaService.DIRTY_SET_KEY,
+            *[AnalyticsDeltaService.guard_key(attempt_id) for attempt_id in covered],
+            test_id, AnalyticsDeltaService.APPLIED_TTL, *covered
+        )
+        return {int(attempt_id) for attempt_id in uncovered}
+
+    @staticmethod
+    def _recompute_once(test_id: int) -> bool:
+        with transaction.atomic():
+            analytics, _ = TestAnalytics.objects.select_for_update().get_or_create(test_id=test_id)
+            scored = TestAttempt.objects.filter(test_id=test_id, score__isnull=False)
+            # Older attempts were applied long ago; a pending delta of one is checked below
+            covered = set(scored.filter(
+                end_time__gte=timezone.now() - AnalyticsDeltaService.RECOMPUTE_GUARD_WINDOW
+            ).values_list('id', flat=True))
+            analytics.update_analytics()
+            uncovered = AnalyticsDeltaService._reset(test_id, covered)
+            if uncovered:
+                covered |= set(scored.filter(id__in=uncovered).values_list('id', flat=True))
+                uncovered = AnalyticsDeltaService._reset(test_id, covered)
+            if uncovered:
+                # Deltas of attempts committed after the recompute read: try again with them
+                transaction.set_rollback(True)
+                return False
+        return True
+
+    @staticmethod
+    def recompute(test_id: int) -> None:
+        """Rebuild a test's TestAnalytics from the database and drop the deltas it covers.
+
+        Runs under the TestAnalytics row lock, like `compact`. Deltas of the
+        counted attempts that arrive later are ignored; those of attempts the
+        recompute did not see are kept for the next compaction.
+
+        Raises:
+            RuntimeError: If attempts kept arriving during every try.
+        """
+        for _ in range(AnalyticsDeltaService.RECOMPUTE_RETRIES):
+            if AnalyticsDeltaService._recompute_once(test_id):
+                return
+        raise RuntimeError(f"Attempts kept arriving while recomputing analytics of test {test_id}")
+
+    @staticmethod
+    def _merge(analytics: TestAnalytics, delta: Dict[str, float]) -> None:
+        score_sum = delta.pop('score_sum', 0)
+        score_count = int(delta.pop('score_count', 0))
+        if score_count:
+            scored = analytics.scored_attempts
+            analytics.average_score = ((analytics.average_score or 0) * scored + score_sum) / (scored + score_count)
+            analytics.scored_attempts = scored + score_count
+
+        question_analysis = analytics.question_analysis or {}
+        anomalies = analytics.anomalies or {}
+        for field, value in delta.items():
+            question_id, kind, *rest = field.split(':')
+            value = int(value)
+            if kind == 'slow':
+                entry = anomalies.setdefault(question_id, {'excessive_time_count': 0})
+                entry['excessive_time_count'] += value
+                continue
+            entry = question_analysis.setdefault(
+                question_id, {'correct_count': 0, 'incorrect_count': 0, 'common_wrong_answers': {}}
+            )
+            if kind == 'c':
+                entry['correct_count'] += value
+            elif kind == 'i':
+                entry['incorrect_count'] += value
+            elif kind == 'w':
+                wrong = entry['common_wrong_answers']
+                wrong[rest[0]] = wrong.get(rest[0], 0) + value
+
+        for entry in question_analysis.values():
+            entry['common_wrong_answers'] = dict(
+                sorted(entry['common_wrong_answers'].items(), key=lambda item: -item[1])
+            )
+        analytics.question_analysis = question_analysis
+        analytics.anomalies = anomalies
+
+    @staticmethod
+    def compact(test_id: int) -> bool:
+        """Fold a test's pending deltas into its TestAnalytics row.
+
+        The delta hash is renamed first, so attempts finishing during the
+        compaction start a fresh hash instead of being lost.
+
+        Returns:
+            True if there was anything to merge.
+        """
+        redis = get_redis_connection('default')
+        key = AnalyticsDeltaService.delta_key(test_id)
+        pending_key = AnalyticsDeltaService.pending_key(test_id)
+        work_key = f"{key}:compacting"
+        with transaction.atomic():
+            # Same lock as `recompute`, taken before the hash is read
+            analytics, _ = TestAnalytics.objects.select_for_update().get_or_create(test_id=test_id)
+            redis.srem(AnalyticsDeltaService.DIRTY_SET_KEY, test_id)
+            if not redis.eval(
+                AnalyticsDeltaService.BEGIN_COMPACT_SCRIPT, 4,
+                key, work_key, pending_key, f"{pending_key}:compacting"
+            ):
+                return False
+            delta = {field.decode(): float(value) for field, value in redis.hgetall(work_key).items()}
+            AnalyticsDeltaService._merge(analytics, delta)
+            difficulties = list(analytics.test.questions.values_list('difficulty', flat=True))
+            analytics.difficulty_distribution = {
+                level: sum(1 for d in difficulties if d == level) for level in ('E', 'M', 'H')
+            }
+            analytics.save()
+        redis.delete(work_key, f"{pending_key}:compacting")
+        return True
+
+    @staticmethod
+    def compact_dirty(limit: Optional[int] = None) -> int:
+        """Compact every test with pending deltas; returns the number merged."""
+        redis = get_redis_connection('default')
+        test_ids = [int(t) for t in redis.smembers(AnalyticsDeltaService.DIRTY_SET_KEY)]
+        if limit:
+            test_ids = test_ids[:limit]
+        compacted = 0
+        for test_id in test_ids:
+            try:
+                compacted += AnalyticsDeltaService.compact(test_id)
+            except Exception as e:
+                logger.error(f"Failed to compact analytics for test {test_id}: {str(e)}")
+                redis.sadd(AnalyticsDeltaService.DIRTY_SET_KEY, test_id)  # retry on the next run
+        return compacted
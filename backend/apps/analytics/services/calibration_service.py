@@ -0,0 +1,229 @@
+# apps/analytics/services/calibration_service.py
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from django.utils import timezone
+from apps.analytics.models import QuestionStats
+from apps.common.services.upsert_service import UpsertService
+from apps.content.models import Question
+from apps.content.services.question_pool_service import QuestionPoolService
+from apps.examination.models import StudentResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CalibrationService:
+    """Fits 1PL/2PL IRT parameters for every question from StudentResponse.
+
+    Responses are kept as sparse coordinate arrays (attempt index, question
+    index, correct), never as a dense attempts x questions matrix, so memory
+    grows with the number of responses only. The fit is penalized joint
+    maximum likelihood: alternating one-dimensional Newton steps for
+    abilities, difficulties and (2PL) discriminations, each a `np.bincount`
+    over the response arrays. Normal priors keep all-correct and all-wrong
+    patterns finite and fix the ability scale; abilities are re-centred on 0
+    after every sweep.
+    """
+
+    MODELS = ('1PL', '2PL')
+    LOAD_BATCH_SIZE = 50000
+    BATCH_SIZE = 1000
+    MAX_ITER = 100
+    TOLERANCE = 1e-3
+    MAX_STEP = 1.0
+    THETA_PRIOR_SD = 1.0
+    DIFFICULTY_PRIOR_SD = 2.0
+    DISCRIMINATION_PRIOR_SD = 0.5  # centred on 1
+    DISCRIMINATION_RANGE = (0.1, 4.0)
+    DIFFICULTY_RANGE = (-6.0, 6.0)
+    MIN_RESPONSES = 30
+    BAND_EDGES = (-0.5, 0.5)  # difficulty cut points between E/M and M/H
+
+    @staticmethod
+    def load_responses() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Read responses of submitted attempts in primary-key batches.
+
+        Returns:
+            (attempt index, question index, correct, question ids), where the
+            indexes are contiguous positions into the unique attempts/questions.
+        """
+        queryset = StudentResponse.objects.filter(attempt__end_time__isnull=False).order_by('id')
+        attempt_chunks, question_chunks, correct_chunks = [], [], []
+        last_id = 0
+        while True:
+            batch = np.array(
+                queryset.filter(id__gt=last_id).values_list(
+                    'id', 'attempt_id', 'question_id', 'is_correct'
+                )[:CalibrationService.LOAD_BATCH_SIZE],
+                dtype=np.int64
+            )
+            if not len(batch):
+                break
+            attempt_chunks.append(batch[:, 1])
+            question_chunks.append(batch[:, 2])
+            correct_chunks.append(batch[:, 3].astype(np.int8))
+            last_id = int(batch[-1, 0])
+
+        if not attempt_chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.int8), empty
+        _, persons = np.unique(np.concatenate(attempt_chunks), return_inverse=True)
+        question_ids, items = np.unique(np.concatenate(question_chunks), return_inverse=True)
+        return persons, items, np.concatenate(correct_chunks), question_ids
+
+    @staticmethod
+    def _newton(grad: np.ndarray, hess: np.ndarray) -> np.ndarray:
+        """Newton step for a concave objective, clipped to keep early sweeps stable."""
+        return np.clip(-grad / hess, -CalibrationService.MAX_STEP, CalibrationService.MAX_STEP)
+
+    @staticmethod
+    def fit(
+        persons: np.ndarray,
+        items: np.ndarray,
+        correct: np.ndarray,
+        model: str = '2PL',
+        max_iter: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Fit item parameters on coordinate-format responses.
+
+        Args:
+            persons: Attempt index per response (0..n_persons-1).
+            items: Question index per response (0..n_items-1).
+            correct: 1 for a correct response, 0 otherwise.
+            model: '1PL' (common discrimination) or '2PL'.
+            max_iter: Sweep limit, defaults to MAX_ITER.
+
+        Returns:
+            A dict with `difficulty`, `discrimination` and `counts` per item,
+            `theta` per person, `iterations` and `converged`.
+
+        Raises:
+            ValueError: If the model is not supported.
+        """
+        if model not in CalibrationService.MODELS:
+            raise ValueError(f"model must be one of {', '.join(CalibrationService.MODELS)}")
+        service = CalibrationService
+        n_persons = int(persons.max()) + 1 if len(persons) else 0
+        n_items = int(items.max()) + 1 if len(items) else 0
+        y = correct.astype(np.float64)
+        counts = np.bincount(items, minlength=n_items)
+
+        # Start from the logit of the proportion correct, shrunk away from 0 and 1
+        p_item = (np.bincount(items, weights=y, minlength=n_items) + 0.5) / (counts + 1)
+        p_person = (np.bincount(persons, weights=y, minlength=n_persons) + 0.5) / (
+            np.bincount(persons, minlength=n_persons) + 1)
+        b = -np.log(p_item / (1 - p_item))
+        theta = np.log(p_person / (1 - p_person))
+        theta = (theta - theta.mean()) / (theta.std() or 1)
+        a = np.ones(n_items)
+
+        converged = False
+        iteration = 0
+        for iteration in range(1, (max_iter or service.MAX_ITER) + 1):
+            previous_a, previous_b = a.copy(), b.copy()
+
+            a_r = a[items]
+            prob = 1 / (1 + np.exp(-a_r * (theta[persons] - b[items])))
+            residual, info = y - prob, prob * (1 - prob)
+            grad = np.bincount(persons, weights=a_r * residual, minlength=n_persons) - theta / service.THETA_PRIOR_SD ** 2
+            hess = -np.bincount(persons, weights=a_r ** 2 * info, minlength=n_persons) - 1 / service.THETA_PRIOR_SD ** 2
+            theta = theta + service._newton(grad, hess)
+
+            prob = 1 / (1 + np.exp(-a_r * (theta[persons] - b[items])))
+            residual, info = y - prob, prob * (1 - prob)
+            grad = -np.bincount(items, weights=a_r * residual, minlength=n_items) - b / service.DIFFICULTY_PRIOR_SD ** 2
+            hess = -np.bincount(items, weights=a_r ** 2 * info, minlength=n_items) - 1 / service.DIFFICULTY_PRIOR_SD ** 2
+            b = np.clip(b + service._newton(grad, hess), *service.DIFFICULTY_RANGE)
+
+            if model == '2PL':
+                spread = theta[persons] - b[items]
+                prob = 1 / (1 + np.exp(-a[items] * spread))
+                residual, info = y - prob, prob * (1 - prob)
+                grad = np.bincount(items, weights=spread * residual, minlength=n_items) - (a - 1) / service.DISCRIMINATION_PRIOR_SD ** 2
+                hess = -np.bincount(items, weights=spread ** 2 * info, minlength=n_items) - 1 / service.DISCRIMINATION_PRIOR_SD ** 2
+                a = np.clip(a + service._newton(grad, hess), *service.DISCRIMINATION_RANGE)
+
+            # The ability prior fixes the scale; only the origin needs pinning
+            mean = theta.mean()
+            theta = theta - mean
+            b = b - mean
+
+            change = max(np.abs(a - previous_a).max(initial=0), np.abs(b - previous_b).max(initial=0))
+            if change < service.TOLERANCE:
+                converged = True
+                break
+
+        return {
+            'difficulty': b,
+            'discrimination': a,
+            'counts': counts,
+            'theta': theta,
+            'iterations': iteration,
+            'converged': converged,
+        }
+
+    @staticmethod
+    def difficulty_band(difficulty: Optional[float]) -> Optional[str]:
+        """Map a calibrated difficulty onto the E/M/H letters used for test building."""
+        if difficulty is None:
+            return None
+        low, high = CalibrationService.BAND_EDGES
+        if difficulty < low:
+            return 'E'
+        return 'M' if difficulty <= high else 'H'
+
+    @staticmethod
+    def calibrate(model: str = '2PL', max_iter: Optional[int] = None) -> Dict[str, Any]:
+        """Fit every question with enough responses and store the parameters in QuestionStats.
+
+        Question.difficulty, the label the author chose, is left alone; the
+        selection pools of the calibrated questions' topics are dropped so
+        QuestionPoolService re-stratifies them by the calibrated bands.
+
+        Returns:
+            Counts of responses and calibrated questions, the number of sweeps
+            and whether the fit converged.
+        """
+        persons, items, correct, question_ids = CalibrationService.load_responses()
+        stats = {'responses': int(len(correct)), 'questions': 0, 'iterations': 0, 'converged': True}
+        if not len(correct):
+            return stats
+        result = CalibrationService.fit(persons, items, correct, model=model, max_iter=max_iter)
+        stats['iterations'] = result['iterations']
+        stats['converged'] = result['converged']
+
+        keep = np.flatnonzero(result['counts'] >= CalibrationService.MIN_RESPONSES)
+        rows = {
+            int(question_ids[i]): (
+                round(float(result['difficulty'][i]), 4),
+                round(float(result['discrimination'][i]), 4),
+            )
+            for i in keep
+        }
+        stats['questions'] = CalibrationService.store(rows, model)
+        if rows:
+            QuestionPoolService.invalidate(
+                Question.topics.through.objects.filter(question_id__in=list(rows)).values_list('topic_id', flat=True)
+            )
+        logger.info(f"IRT {model} calibration: {stats}")
+        return stats
+
+    @staticmethod
+    def store(rows: Dict[int, Tuple[float, float]], model: str) -> int:
+        """Upsert the IRT fields only; classical statistics on existing rows are kept."""
+        now = timezone.now()
+        return UpsertService.upsert(
+            QuestionStats,
+            ['question_id'],
+            {
+                (question_id,): {
+                    'irt_model': model,
+                    'irt_difficulty': difficulty,
+                    'irt_discrimination': discrimination,
+                    'calibrated_at': now,
+                }
+                for question_id, (difficulty, discrimination) in rows.items()
+            },
+            ['irt_model', 'irt_difficulty', 'irt_discrimination', 'calibrated_at'],
+            batch_size=CalibrationService.BATCH_SIZE,
+        )
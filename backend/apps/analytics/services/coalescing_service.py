@@ -0,0 +1,78 @@
+# apps/analytics/services/coalescing_service.py
+from typing import Dict
+from django.conf import settings
+from django_redis import get_redis_connection
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingService:
+    """Collapses bursts of identical analytics recomputes into one task run.
+
+    Every trigger marks its key (e.g. a test id or `student:subject`) in the
+    kind's dirty set. Only the trigger that takes the per-key lock queues the
+    task, delayed by the coalescing window; later triggers just count as
+    coalesced. The task clears the dirty mark before it reads the database
+    and, when it finishes, re-queues itself if new triggers arrived mid-run,
+    so no update is lost and at most one run per key is queued or running.
+    """
+
+    DIRTY_PREFIX = "analytics_dirty:"
+    LOCK_PREFIX = "analytics_lock:"
+    METRICS_KEY = "analytics_coalescing_metrics"
+    LOCK_TIMEOUT = 300  # upper bound for a run, so a dead worker cannot hold a key forever
+
+    @staticmethod
+    def get_window() -> int:
+        return getattr(settings, 'ANALYTICS_COALESCE_WINDOW', 30)
+
+    @staticmethod
+    def _member(args) -> str:
+        return ':'.join(str(a) for a in args)
+
+    @staticmethod
+    def schedule(task, kind: str, *args) -> bool:
+        """Queue `task(*args)` unless a run for the same key is already queued or running.
+
+        Returns:
+            True if the task was queued, False if the trigger was coalesced.
+        """
+        redis = get_redis_connection('default')
+        member = CoalescingService._member(args)
+        window = CoalescingService.get_window()
+        redis.sadd(f"{CoalescingService.DIRTY_PREFIX}{kind}", member)
+        lock_key = f"{CoalescingService.LOCK_PREFIX}{kind}:{member}"
+        if not redis.set(lock_key, 1, nx=True, ex=window + CoalescingService.LOCK_TIMEOUT):
+            redis.hincrby(CoalescingService.METRICS_KEY, f"{kind}:coalesced", 1)
+            logger.debug(f"Coalesced {kind} trigger for {member}")
+            return False
+
+        redis.hincrby(CoalescingService.METRICS_KEY, f"{kind}:scheduled", 1)
+        task.apply_async(args=list(args), countdown=window)
+        logger.debug(f"Scheduled {task.name} for {member} in {window}s")
+        return True
+
+    @staticmethod
+    def begin(kind: str, *args) -> None:
+        """Mark the key clean; call before the task reads any data."""
+        get_redis_connection('default').srem(
+            f"{CoalescingService.DIRTY_PREFIX}{kind}", CoalescingService._member(args)
+        )
+
+    @staticmethod
+    def finish(task, kind: str, *args) -> bool:
+        """Release the key and re-queue the task if it was triggered during the run."""
+        redis = get_redis_connection('default')
+        member = CoalescingService._member(args)
+        redis.delete(f"{CoalescingService.LOCK_PREFIX}{kind}:{member}")
+        if redis.sismember(f"{CoalescingService.DIRTY_PREFIX}{kind}", member):
+            redis.hincrby(CoalescingService.METRICS_KEY, f"{kind}:rerun", 1)
+            return CoalescingService.schedule(task, kind, *args)
+        return False
+
+    @staticmethod
+    def get_metrics() -> Dict[str, int]:
+        """Return the counters, e.g. `{'test:scheduled': 3, 'test:coalesced': 497}`."""
+        raw = get_redis_connection('default').hgetall(CoalescingService.METRICS_KEY)
+        return {field.decode(): int(value) for field, value in raw.items()}
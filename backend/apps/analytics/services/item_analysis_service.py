@@ -0,0 +1,325 @@
+# apps/analytics/services/item_analysis_service.py
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from apps.analytics.models import QuestionStats
+from apps.common.services.upsert_service import UpsertService
+from apps.content.models import Question
+from apps.examination.models import Test, TestAttempt, StudentResponse
+from apps.examination.services.scoring_service import ScoringService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ItemAnalysisService:
+    """Classical item analysis, pooled over every test that uses a question.
+
+    Attempts are read one test at a time, ATTEMPT_BATCH_SIZE at a time, into a
+    dense uint8 block (attempts x that test's questions) encoded with
+    `ScoringService`. Each block only adds per-question sums to the running
+    totals: n, correct, rest, rest², correct·rest, and answer counts per
+    ability level (for the upper/lower groups and the miskey check). Memory
+    therefore grows with the number of questions, not attempts x questions,
+    and every statistic is a NumPy reduction over a block.
+    """
+
+    GROUP_FRACTION = 0.27  # Kelley's upper/lower groups
+    FUNCTIONAL_DISTRACTOR_RATE = 0.05
+    MIN_RESPONSES = 30  # below this, statistics are stored but items are not flagged
+    TOO_EASY = 0.9
+    TOO_HARD = 0.2
+    LOW_DISCRIMINATION = 0.2
+    WEAK_DISTRACTORS = 0.5
+    BATCH_SIZE = 1000
+    ATTEMPT_BATCH_SIZE = 5000
+    LABELS = len(ScoringService.LABELS) + 1  # 0 is blank
+
+    @staticmethod
+    def load_questions(question_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the encoded key and the number of options of `question_ids`, in that order."""
+        rows = {
+            question_id: (correct_answer, options)
+            for question_id, correct_answer, options in Question.objects.filter(
+                id__in=question_ids
+            ).values_list('id', 'correct_answer', 'options')
+        }
+        key = np.fromiter(
+            (ScoringService.encode(rows[q][0]) for q in question_ids), dtype=np.uint8, count=len(question_ids)
+        )
+        n_options = np.fromiter(
+            (len(rows[q][1] or {}) for q in question_ids), dtype=np.int64, count=len(question_ids)
+        )
+        return key, n_options
+
+    @staticmethod
+    def iter_blocks(test_id: int, question_ids: List[int]) -> Iterator[np.ndarray]:
+        """Yield the submitted answer sheets of a test as uint8 blocks (attempts x `question_ids`)."""
+        column = {question_id: i for i, question_id in enumerate(question_ids)}
+        attempts = TestAttempt.objects.filter(test_id=test_id, end_time__isnull=False).order_by('id')
+        last_id = 0
+        while True:
+            attempt_ids = list(
+                attempts.filter(id__gt=last_id).values_list('id', flat=True)[:ItemAnalysisService.ATTEMPT_BATCH_SIZE]
+            )
+            if not attempt_ids:
+                return
+            last_id = attempt_ids[-1]
+            row = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+            answers = np.zeros((len(attempt_ids), len(question_ids)), dtype=np.uint8)
+            responses = StudentResponse.objects.filter(
+                attempt_id__in=attempt_ids
+            ).values_list('attempt_id', 'question_id', 'selected_answer')
+            for attempt_id, question_id, answer in responses.iterator(chunk_size=ItemAnalysisService.BATCH_SIZE):
+                col = column.get(question_id)
+                if col is not None:
+                    answers[row[attempt_id], col] = ScoringService.encode(answer)
+            yield answers
+
+    @staticmethod
+    def new_totals(n_columns: int) -> Dict[str, Any]:
+        """Empty running sums for `n_columns` questions."""
+        totals = {
+            name: np.zeros(n_columns) for name in ('n', 'correct', 'rest', 'rest_sq', 'correct_rest')
+        }
+        # Per question: {ability: answer counts (LABELS,)} of the attempts asked it
+        totals['levels'] = [{} for _ in range(n_columns)]
+        return totals
+
+    @staticmethod
+    def accumulate(totals: Dict[str, Any], columns: np.ndarray, answers: np.ndarray,
+                   asked: np.ndarray, key: np.ndarray) -> None:
+        """Add one block of attempts to `totals`.
+
+        `columns` maps the block's columns to the totals' columns and `key` is
+        the block's key. Ability is the proportion correct on the questions
+        an attempt was asked; `rest` excludes the item itself so it does not
+        inflate its own discrimination.
+        """
+        asked = asked.astype(bool)
+        weight = asked.astype(np.float64)
+        correct = ((answers == key) & (answers != 0) & asked).astype(np.float64)
+        asked_count = weight.sum(axis=1, keepdims=True)
+        total = correct.sum(axis=1, keepdims=True)
+        rest = (total - correct) / np.maximum(asked_count - 1, 1)
+
+        np.add.at(totals['n'], columns, weight.sum(axis=0))
+        np.add.at(totals['correct'], columns, correct.sum(axis=0))
+        np.add.at(totals['rest'], columns, (rest * weight).sum(axis=0))
+        np.add.at(totals['rest_sq'], columns, (rest * rest * weight).sum(axis=0))
+        np.add.at(totals['correct_rest'], columns, (correct * rest).sum(axis=0))
+
+        # Answer counts per (column, ability level, answer code) in one bincount
+        labels = ItemAnalysisService.LABELS
+        ability = total[:, 0] / np.maximum(asked_count[:, 0], 1)
+        values, level = np.unique(ability, return_inverse=True)
+        cell = (np.arange(answers.shape[1]) * len(values) + level[:, None]) * labels + answers
+        counts = np.bincount(cell[asked], minlength=answers.shape[1] * len(values) * labels).reshape(
+            answers.shape[1], len(values), labels
+        )
+        for j, col in enumerate(columns):
+            histogram = totals['levels'][col]
+            for i in np.flatnonzero(counts[j].any(axis=1)):
+                value = float(values[i])
+                histogram[value] = histogram[value] + counts[j, i] if value in histogram else counts[j, i]
+
+    @staticmethod
+    def group_counts(histogram: Dict[float, np.ndarray], size: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Answer counts of the lowest and highest `size` attempts by ability.
+
+        A tie at a group boundary contributes pro rata, so the result does not
+        depend on the order of tied attempts.
+        """
+        labels = ItemAnalysisService.LABELS
+        if not histogram:
+            return np.zeros(labels), np.zeros(labels)
+        counts = np.array([histogram[value] for value in sorted(histogram)], dtype=np.float64)
+        asked = counts.sum(axis=1)
+        below = np.cumsum(asked) - asked
+        above = asked.sum() - np.cumsum(asked)
+        lower = np.clip(size - below, 0, asked) / np.maximum(asked, 1)
+        upper = np.clip(size - above, 0, asked) / np.maximum(asked, 1)
+        return (counts * lower[:, None]).sum(axis=0), (counts * upper[:, None]).sum(axis=0)
+
+    @staticmethod
+    def finalize(totals: Dict[str, Any], key: np.ndarray, n_options: np.ndarray) -> Dict[str, np.ndarray]:
+        """Turn running sums into per-item statistics; every array has one entry per column."""
+        n = totals['n']
+        safe_n = np.maximum(n, 1)
+        p_value = totals['correct'] / safe_n
+        mean_rest = totals['rest'] / safe_n
+        cov = totals['correct_rest'] / safe_n - p_value * mean_rest
+        var_rest = totals['rest_sq'] / safe_n - mean_rest ** 2
+        denominator = np.sqrt(np.clip(p_value * (1 - p_value), 0, None) * np.clip(var_rest, 0, None))
+        point_biserial = np.divide(cov, denominator, out=np.zeros_like(cov), where=denominator > 1e-12)
+
+        labels = ItemAnalysisService.LABELS
+        columns = np.arange(len(key))
+        group = np.maximum(np.rint(n * ItemAnalysisService.GROUP_FRACTION), 1)
+        counts = np.zeros((len(key), labels), dtype=np.int64)
+        lower_counts = np.zeros((len(key), labels))
+        upper_counts = np.zeros((len(key), labels))
+        for j, histogram in enumerate(totals['levels']):
+            if histogram:
+                counts[j] = sum(histogram.values())
+            lower_counts[j], upper_counts[j] = ItemAnalysisService.group_counts(histogram, group[j])
+        has_key = key != 0
+        discrimination = (upper_counts[columns, key] - lower_counts[columns, key]) * has_key / group
+
+        is_distractor = np.ones((len(key), labels), dtype=bool)
+        is_distractor[:, 0] = False
+        is_distractor[columns, key] = False
+        functional = (counts / safe_n[:, None] >= ItemAnalysisService.FUNCTIONAL_DISTRACTOR_RATE) & is_distractor
+        n_distractors = np.maximum(n_options - 1, 0)
+        distractor_efficiency = np.divide(
+            functional.sum(axis=1), n_distractors,
+            out=np.zeros(len(key)), where=n_distractors > 0
+        )
+        key_upper = upper_counts[columns, key]
+        possible_miskey = ((upper_counts * is_distractor).max(axis=1) > key_upper)
+
+        return {
+            'n': n.astype(np.int64),
+            'p_value': p_value,
+            'point_biserial': point_biserial,
+            'discrimination_index': discrimination,
+            'distractor_efficiency': distractor_efficiency,
+            'counts': counts,
+            'possible_miskey': possible_miskey,
+        }
+
+    @staticmethod
+    def compute(answers: np.ndarray, asked: np.ndarray, key: np.ndarray, n_options: np.ndarray) -> Dict[str, np.ndarray]:
+        """Compute per-item statistics of a single in-memory response matrix."""
+        totals = ItemAnalysisService.new_totals(len(key))
+        ItemAnalysisService.accumulate(totals, np.arange(len(key)), answers, asked, key)
+        return ItemAnalysisService.finalize(totals, key, n_options)
+
+    @staticmethod
+    def get_flags(stats: Dict[str, np.ndarray], i: int) -> List[str]:
+        """Return the quality flags of column `i`."""
+        if stats['n'][i] < ItemAnalysisService.MIN_RESPONSES:
+            return []
+        flags = []
+        if stats['p_value'][i] > ItemAnalysisService.TOO_EASY:
+            flags.append('too_easy')
+        elif stats['p_value'][i] < ItemAnalysisService.TOO_HARD:
+            flags.append('too_hard')
+        if stats['point_biserial'][i] < 0:
+            flags.append('negative_discrimination')
+        elif stats['point_biserial'][i] < ItemAnalysisService.LOW_DISCRIMINATION:
+            flags.append('low_discrimination')
+        if stats['possible_miskey'][i]:
+            flags.append('possible_miskey')
+        if stats['distractor_efficiency'][i] < ItemAnalysisService.WEAK_DISTRACTORS:
+            flags.append('weak_distractors')
+        return flags
+
+    @staticmethod
+    def to_rows(question_ids: Sequence[int], stats: Dict[str, np.ndarray],
+                only: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """Convert column statistics into {question_id: stats dict}."""
+        only = set(only) if only is not None else None
+        rows = {}
+        for i, question_id in enumerate(question_ids):
+            if only is not None and question_id not in only:
+                continue
+            counts = stats['counts'][i]
+            rows[question_id] = {
+                'response_count': int(stats['n'][i]),
+                'p_value': round(float(stats['p_value'][i]), 4),
+                'point_biserial': round(float(stats['point_biserial'][i]), 4),
+                'discrimination_index': round(float(stats['discrimination_index'][i]), 4),
+                'distractor_efficiency': round(float(stats['distractor_efficiency'][i]), 4),
+                'option_counts': {'': int(counts[0]), **{
+                    label: int(counts[code]) for label, code in ScoringService.CODES.items()
+                }},
+                'flags': ItemAnalysisService.get_flags(stats, i),
+            }
+        return rows
+
+    @staticmethod
+    def analyze(test_ids: Iterable[int], only: Optional[Sequence[int]] = None) -> Tuple[Dict[int, Dict[str, Any]], int]:
+        """Pool the submitted attempts of `test_ids`, one test and attempt batch at a time.
+
+        Returns:
+            A tuple of ({question_id: stats dict}, number of attempts read).
+        """
+        test_questions = defaultdict(list)
+        for test_id, question_id in Test.questions.through.objects.filter(
+            test_id__in=list(test_ids)
+        ).order_by('test_id', 'question_id').values_list('test_id', 'question_id'):
+            test_questions[test_id].append(question_id)
+        question_ids = sorted({q for questions in test_questions.values() for q in questions})
+        if not question_ids:
+            return {}, 0
+        column = {question_id: i for i, question_id in enumerate(question_ids)}
+        key, n_options = ItemAnalysisService.load_questions(question_ids)
+
+        totals = ItemAnalysisService.new_totals(len(question_ids))
+        attempts = 0
+        for test_id, questions_of_test in test_questions.items():
+            columns = np.fromiter((column[q] for q in questions_of_test), dtype=np.int64, count=len(questions_of_test))
+            for answers in ItemAnalysisService.iter_blocks(test_id, questions_of_test):
+                # Every attempt of a test is asked all of the test's questions
+                asked = np.ones(answers.shape, dtype=bool)
+                ItemAnalysisService.accumulate(totals, columns, answers, asked, key[columns])
+                attempts += answers.shape[0]
+        stats = ItemAnalysisService.finalize(totals, key, n_options)
+        return ItemAnalysisService.to_rows(question_ids, stats, only=only), attempts
+
+    @staticmethod
+    def analyze_test(test_id: int) -> Dict[int, Dict[str, Any]]:
+        """Item statistics for one test's attempts only (not stored)."""
+        return ItemAnalysisService.analyze([test_id])[0]
+
+    @staticmethod
+    def analyze_questions(question_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """Pool every test that uses `question_ids`, then store their QuestionStats.
+
+        Because all tests containing a target question are read, its pooled
+        statistics are complete; the other questions of those tests only feed
+        the ability estimates.
+        """
+        question_ids = list(question_ids)
+        test_ids = list(Test.questions.through.objects.filter(
+            question_id__in=question_ids
+        ).values_list('test_id', flat=True).distinct())
+        if not test_ids:
+            return {}
+        rows, attempts = ItemAnalysisService.analyze(test_ids, only=question_ids)
+        ItemAnalysisService.store(rows)
+        logger.info(
+            f"Item analysis stored for {len(rows)} questions from {len(test_ids)} tests ({attempts} attempts)"
+        )
+        return rows
+
+    @staticmethod
+    def analyze_since(since: Optional[datetime]) -> Dict[str, int]:
+        """Re-analyze the questions of every test with attempts submitted since `since`."""
+        attempts = TestAttempt.objects.filter(end_time__isnull=False)
+        if since is not None:
+            attempts = attempts.filter(end_time__gte=since)
+        test_ids = attempts.values_list('test_id', flat=True).distinct()
+        question_ids = list(Test.questions.through.objects.filter(
+            test_id__in=test_ids
+        ).values_list('question_id', flat=True).distinct())
+        rows = ItemAnalysisService.analyze_questions(question_ids) if question_ids else {}
+        return {
+            'questions': len(rows),
+            'flagged': sum(1 for row in rows.values() if row['flags']),
+        }
+
+    @staticmethod
+    def store(rows: Dict[int, Dict[str, Any]]) -> int:
+        """Upsert QuestionStats rows, one per question."""
+        fields = ['response_count', 'p_value', 'point_biserial', 'discrimination_index',
+                  'distractor_efficiency', 'option_counts', 'flags']
+        return UpsertService.upsert(
+            QuestionStats,
+            ['question_id'],
+            {(question_id,): {field: values[field] for field in fields} for question_id, values in rows.items()},
+            fields,
+            batch_size=ItemAnalysisService.BATCH_SIZE,
+        )
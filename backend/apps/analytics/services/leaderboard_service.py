@@ -0,0 +1,165 @@
+# apps/analytics/services/leaderboard_service.py
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from django.db.models import Max
+from django_redis import get_redis_connection
+from apps.accounts.models import User
+from apps.examination.models import TestAttempt
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderboardService:
+    """Per-test and per-subject leaderboards in Redis sorted sets.
+
+    `leaderboard:test:<id>` scores each student by their best attempt;
+    `leaderboard:subject:<id>` holds the sum of a student's per-test bests.
+    Both are updated together by one Lua call when an attempt is graded, and
+    rank, percentile and top-N are answered with O(log n) sorted-set lookups.
+    """
+
+    TEST_KEY = "leaderboard:test:{}"
+    SUBJECT_KEY = "leaderboard:subject:{}"
+    SCOPES = ('test', 'subject')
+    MAX_LIMIT = 100
+    REBUILD_BATCH = 1000
+
+    # Replace the student's best for the test (only if higher unless forced)
+    # and move their subject total by the same difference.
+    SET_BEST_SCRIPT = """
+    local old = redis.call('ZSCORE', KEYS[1], ARGV[1])
+    local new = tonumber(ARGV[2])
+    local diff = new
+    if old then
+        old = tonumber(old)
+        if ARGV[3] ~= '1' and new <= old then
+            return 0
+        end
+        diff = new - old
+    end
+    redis.call('ZADD', KEYS[1], new, ARGV[1])
+    if diff ~= 0 then
+        redis.call('ZINCRBY', KEYS[2], diff, ARGV[1])
+    end
+    return 1
+    """
+
+    @staticmethod
+    def get_key(scope: str, object_id: int) -> str:
+        if scope == 'test':
+            return LeaderboardService.TEST_KEY.format(object_id)
+        return LeaderboardService.SUBJECT_KEY.format(object_id)
+
+    @staticmethod
+    def record_score(test_id: int, subject_id: int, student_id: int, score: float, force: bool = False) -> bool:
+        """Record a graded score; returns True if it changed the student's best."""
+        changed = get_redis_connection('default').eval(
+            LeaderboardService.SET_BEST_SCRIPT, 2,
+            LeaderboardService.get_key('test', test_id),
+            LeaderboardService.get_key('subject', subject_id),
+            student_id, repr(float(score)), '1' if force else '0'
+        )
+        return bool(changed)
+
+    @staticmethod
+    def record_attempt(attempt_id: int) -> bool:
+        """Record a graded attempt on its test and subject leaderboards.
+
+        Raises:
+            TestAttempt.DoesNotExist: If the attempt does not exist.
+        """
+        attempt = TestAttempt.objects.select_related('test').only(
+            'id', 'student_id', 'score', 'end_time', 'test__id', 'test__subject_id'
+        ).get(pk=attempt_id)
+        if not attempt.end_time or attempt.score is None:
+            return False
+        return LeaderboardService.record_score(
+            attempt.test_id, attempt.test.subject_id, attempt.student_id, attempt.score
+        )
+
+    @staticmethod
+    def resync_test(test_id: int, subject_id: int) -> int:
+        """Force the test's bests back in line with the database (e.g. after a re-grade)."""
+        bests = TestAttempt.objects.filter(test_id=test_id, score__isnull=False).values('student_id').annotate(
+            best=Max('score')
+        ).order_by()
+        updated = 0
+        for row in bests:
+            updated += LeaderboardService.record_score(test_id, subject_id, row['student_id'], row['best'], force=True)
+        return updated
+
+    @staticmethod
+    def get_standing(scope: str, object_id: int, student_id: int) -> Optional[Dict[str, Any]]:
+        """Return the student's score, rank (ties share a rank) and percentile, or None if unranked."""
+        redis = get_redis_connection('default')
+        key = LeaderboardService.get_key(scope, object_id)
+        score = redis.zscore(key, student_id)
+        if score is None:
+            return None
+        pipe = redis.pipeline()
+        pipe.zcard(key)
+        pipe.zcount(key, f"({score}", '+inf')
+        pipe.zcount(key, '-inf', f"({score}")
+        total, above, below = pipe.execute()
+        return {
+            'score': score,
+            'rank': above + 1,
+            'total': total,
+            'percentile': round(below / total * 100, 2) if total else 0,
+        }
+
+    @staticmethod
+    def get_top(scope: str, object_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Return the top `limit` entries with usernames (one user query)."""
+        limit = max(1, min(limit, LeaderboardService.MAX_LIMIT))
+        entries = get_redis_connection('default').zrevrange(
+            LeaderboardService.get_key(scope, object_id), 0, limit - 1, withscores=True
+        )
+        student_ids = [int(member) for member, _ in entries]
+        names = dict(User.objects.filter(id__in=student_ids).values_list('id', 'username'))
+        top = []
+        previous, rank = None, 0
+        for position, (student_id, (_, score)) in enumerate(zip(student_ids, entries), start=1):
+            if score != previous:
+                rank, previous = position, score
+            top.append({'rank': rank, 'student_id': student_id, 'username': names.get(student_id), 'score': score})
+        return top
+
+    @staticmethod
+    def rebuild(test_ids: Optional[List[int]] = None) -> Dict[str, int]:
+        """Rebuild leaderboards from TestAttempt in one grouped query.
+
+        New sorted sets are written under temporary keys and renamed into
+        place, so readers never see a half-built board. Rebuilding a subset
+        of tests also rebuilds the subject boards those tests belong to.
+        """
+        attempts = TestAttempt.objects.filter(score__isnull=False)
+        if test_ids:
+            subject_ids = set(
+                TestAttempt.objects.filter(test_id__in=test_ids).values_list('test__subject_id', flat=True)
+            )
+            attempts = attempts.filter(test__subject_id__in=subject_ids)
+        rows = attempts.values('test_id', 'test__subject_id', 'student_id').annotate(
+            best=Max('score')
+        ).order_by().iterator(chunk_size=LeaderboardService.REBUILD_BATCH)
+
+        redis = get_redis_connection('default')
+        tests: Dict[int, Dict[int, float]] = defaultdict(dict)
+        subjects: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for row in rows:
+            tests[row['test_id']][row['student_id']] = row['best']
+            subjects[row['test__subject_id']][row['student_id']] += row['best']
+
+        for scope, boards in (('test', tests), ('subject', subjects)):
+            for object_id, scores in boards.items():
+                key = LeaderboardService.get_key(scope, object_id)
+                tmp_key = f"{key}:rebuild"
+                redis.delete(tmp_key)
+                items = list(scores.items())
+                for start in range(0, len(items), LeaderboardService.REBUILD_BATCH):
+                    redis.zadd(tmp_key, dict(items[start:start + LeaderboardService.REBUILD_BATCH]))
+                redis.rename(tmp_key, key)
+        stats = {'tests': len(tests), 'subjects': len(subjects)}
+        logger.info(f"Rebuilt leaderboards: {stats}")
+        return stats
@@ -0,0 +1,154 @@
+# apps/analytics/services/mastery_service.py
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django_redis import get_redis_connection
+from apps.analytics.models import TopicMastery
+from apps.examination.models import TestAttempt, StudentResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (student_id, topic_id) -> [correct, total, time_sum]
+MasteryDeltas = Dict[Tuple[int, int], List[int]]
+
+
+class MasteryService:
+    """Maintains the TopicMastery counters.
+
+    Each graded attempt is folded in with one grouped query over its responses
+    and one upsert batch, guarded by a per-attempt Redis key so a replayed
+    task is not counted twice. Readers get O(topics) rows instead of scanning
+    StudentResponse.
+    """
+
+    APPLIED_PREFIX = "topic_mastery_applied:"
+    APPLIED_TTL = 60 * 60 * 24 * 30
+    CLAIM_TTL = 60 * 10
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def upsert(deltas: MasteryDeltas) -> int:
+        """Add counter deltas to the mastery rows, creating missing rows.
+
+        Missing rows are first inserted with zero counters (conflicts ignored),
+        then every row gets one relative `SET correct = correct + delta` UPDATE
+        per batch. The additions happen in SQL under the row locks, so
+        concurrent attempts by the same student cannot lose increments, also
+        for rows neither of them has seen yet.
+        """
+        if not deltas:
+            return 0
+        keys = sorted(deltas)
+        with transaction.atomic():
+            TopicMastery.objects.bulk_create(
+                [TopicMastery(student_id=student_id, topic_id=topic_id) for student_id, topic_id in keys],
+                batch_size=MasteryService.BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            for i in range(0, len(keys), MasteryService.BATCH_SIZE):
+                batch = keys[i:i + MasteryService.BATCH_SIZE]
+                found = {
+                    (student_id, topic_id): pk for pk, student_id, topic_id in TopicMastery.objects.filter(
+                        student_id__in={key[0] for key in batch}, topic_id__in={key[1] for key in batch}
+                    ).values_list('id', 'student_id', 'topic_id')
+                }
+                ids = {key: found[key] for key in batch}
+                TopicMastery.objects.filter(id__in=ids.values()).update(
+                    updated_at=timezone.now(),
+                    **{
+                        field: Greatest(F(field) + Case(
+                            *[When(id=ids[key], then=Value(deltas[key][index])) for key in batch],
+                            default=Value(0), output_field=BigIntegerField(),
+                        ), Value(0))
+                        for index, field in enumerate(('correct', 'total', 'time_sum'))
+                    }
+                )
+        return len(keys)
+
+    @staticmethod
+    def _grouped_counts(responses) -> Iterable[dict]:
+        return responses.filter(question__topics__isnull=False).values(
+            'attempt__student_id', 'question__topics'
+        ).annotate(
+            total=Count('id'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            time_sum=Sum('time_taken'),
+        ).order_by()
+
+    @staticmethod
+    def apply_attempt(attempt_id: int) -> bool:
+        """Fold a graded attempt into its student's mastery rows.
+
+        Returns:
+            True if applied, False if the attempt is not graded yet or was already applied.
+
+        Raises:
+            TestAttempt.DoesNotExist: If the attempt does not exist.
+        """
+        attempt = TestAttempt.objects.only('id', 'student_id', 'end_time', 'score').get(pk=attempt_id)
+        if not attempt.end_time or attempt.score is None:
+            return False
+        redis = get_redis_connection('default')
+        guard = f"{MasteryService.APPLIED_PREFIX}{attempt_id}"
+        # A short claim keeps concurrent replays out; it only becomes the lasting
+        # "applied" marker once the counters are committed, so a rolled-back run can retry.
+        if not redis.set(guard, 0, nx=True, ex=MasteryService.CLAIM_TTL):
+            logger.debug(f"Topic mastery for attempt {attempt_id} already applied")
+            return False
+
+        try:
+            with transaction.atomic():
+                deltas = {
+                    (row['attempt__student_id'], row['question__topics']): [row['correct'], row['total'], row['time_sum'] or 0]
+                    for row in MasteryService._grouped_counts(StudentResponse.objects.filter(attempt_id=attempt_id))
+                }
+                MasteryService.upsert(deltas)
+                transaction.on_commit(lambda: redis.set(guard, 1, ex=MasteryService.APPLIED_TTL))
+        except Exception:
+            redis.delete(guard)
+            raise
+        logger.info(f"Applied attempt {attempt_id} to {len(deltas)} topic mastery rows")
+        return True
+
+    @staticmethod
+    def adjust_correct(topic_ids: Iterable[int], correct_by_student: Dict[int, int]) -> int:
+        """Shift correct counts after a re-grade flipped some responses."""
+        deltas = {
+            (student_id, topic_id): [delta, 0, 0]
+            for student_id, delta in correct_by_student.items() if delta
+            for topic_id in topic_ids
+        }
+        return MasteryService.upsert(deltas)
+
+    @staticmethod
+    def rebuild(student_ids: Optional[Iterable[int]] = None) -> int:
+        """Recompute mastery rows from stored responses (all students by default)."""
+        responses = StudentResponse.objects.filter(attempt__end_time__isnull=False, attempt__score__isnull=False)
+        existing = TopicMastery.objects.all()
+        if student_ids is not None:
+            student_ids = list(student_ids)
+            responses = responses.filter(attempt__student_id__in=student_ids)
+            existing = existing.filter(student_id__in=student_ids)
+
+        created = 0
+        with transaction.atomic():
+            existing.delete()
+            batch = []
+            for row in MasteryService._grouped_counts(responses).iterator(chunk_size=MasteryService.BATCH_SIZE):
+                batch.append(TopicMastery(
+                    student_id=row['attempt__student_id'],
+                    topic_id=row['question__topics'],
+                    correct=row['correct'],
+                    total=row['total'],
+                    time_sum=row['time_sum'] or 0,
+                ))
+                if len(batch) >= MasteryService.BATCH_SIZE:
+                    created += len(TopicMastery.objects.bulk_create(batch))
+                    batch = []
+            if batch:
+                created += len(TopicMastery.objects.bulk_create(batch))
+        logger.info(f"Rebuilt {created} topic mastery rows")
+        return created
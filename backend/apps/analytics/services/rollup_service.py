@@ -0,0 +1,264 @@
+# apps/analytics/services/rollup_service.py
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.db.models.functions import TruncDate, TruncWeek
+from apps.analytics.models import (
+    TestAttemptHistory, StudentSubjectRollup, TestRollup, RollupGranularity, RollupWatermark
+)
+from apps.common.services.upsert_service import UpsertService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RollupService:
+    """Builds and reads the daily/weekly TestAttemptHistory rollups.
+
+    History rows are append-only, so the nightly build only aggregates rows
+    created after the watermark (a RollupWatermark row) and adds them to the
+    existing buckets. Rows are only rolled up once they are SAFETY_LAG old:
+    ids and creation times of concurrent transactions commit out of order,
+    and a row that commits after the build has read past it would otherwise
+    be skipped for good. Building locks the watermark row, so builds and
+    regrade rebuilds of the same buckets run one at a time. Readers merge
+    the rollups with the rows created after the watermark, so charts stay
+    current while their size depends only on the requested range.
+    """
+
+    WATERMARK_NAME = "history"
+    SAFETY_LAG = timedelta(minutes=15)
+    BATCH_SIZE = 1000
+    RAW_MAX_DAYS = 14
+    DAILY_MAX_DAYS = 180
+    RAW_MAX_ROWS = 500
+    TRUNC = {RollupGranularity.DAY: TruncDate, RollupGranularity.WEEK: TruncWeek}
+
+    @staticmethod
+    def pick_granularity(days: Optional[int]) -> str:
+        """Raw rows for short ranges, daily buckets up to six months, weekly beyond."""
+        if days is not None and days <= RollupService.RAW_MAX_DAYS:
+            return 'raw'
+        if days is not None and days <= RollupService.DAILY_MAX_DAYS:
+            return RollupGranularity.DAY
+        return RollupGranularity.WEEK
+
+    @staticmethod
+    def period_start(value: datetime, granularity: str) -> date:
+        day = value.date()
+        if granularity == RollupGranularity.WEEK:
+            return day - timedelta(days=day.weekday())
+        return day
+
+    @staticmethod
+    def _as_date(value) -> date:
+        return value.date() if isinstance(value, datetime) else value
+
+    @staticmethod
+    def _add_bucket(row, bucket: Dict[str, Any]) -> None:
+        row.attempt_count += bucket['count']
+        row.score_sum += bucket['score_sum'] or 0
+        row.duration_sum += bucket['duration_sum'] or 0
+        if bucket['best'] is not None and (row.best_score is None or bucket['best'] > row.best_score):
+            row.best_score = bucket['best']
+
+    @staticmethod
+    def _upsert(model, key_fields: List[str], buckets: Dict[Tuple, Dict[str, Any]]) -> int:
+        """Add bucket counters to existing rows and insert the missing ones.
+
+        Only called with the watermark row locked, so no other build can
+        insert the same missing bucket concurrently.
+        """
+        return UpsertService.upsert(
+            model, key_fields, buckets,
+            ['attempt_count', 'score_sum', 'best_score', 'duration_sum'],
+            apply=RollupService._add_bucket,
+            batch_size=RollupService.BATCH_SIZE,
+        )
+
+    @staticmethod
+    def _aggregate(history, group_fields: List[str], granularity: str) -> Dict[Tuple, Dict[str, Any]]:
+        rows = history.annotate(
+            period=RollupService.TRUNC[granularity]('completed_at')
+        ).values(*group_fields, 'period').annotate(
+            count=Count('id'), score_sum=Sum('score'), best=Max('score'), duration_sum=Sum('duration')
+        ).order_by()
+        return {
+            tuple(row[f] for f in group_fields) + (granularity, RollupService._as_date(row['period'])): row
+            for row in rows
+        }
+
+    @staticmethod
+    def get_watermark() -> Optional[datetime]:
+        """Creation time up to which history is rolled up, or None before the first build."""
+        return RollupWatermark.objects.filter(
+            name=RollupService.WATERMARK_NAME
+        ).values_list('built_until', flat=True).first()
+
+    @staticmethod
+    def _lock_watermark() -> RollupWatermark:
+        """Lock (creating it if needed) the watermark row; call inside a transaction."""
+        RollupWatermark.objects.get_or_create(name=RollupService.WATERMARK_NAME)
+        return RollupWatermark.objects.select_for_update().get(name=RollupService.WATERMARK_NAME)
+
+    @staticmethod
+    def build(until: Optional[datetime] = None) -> Dict[str, int]:
+        """Fold history rows created since the last run into the rollup tables.
+
+        Args:
+            until: Roll up rows created up to this time; defaults to SAFETY_LAG ago.
+        """
+        until = until or timezone.now() - RollupService.SAFETY_LAG
+        stats = {'rows': 0, 'student_buckets': 0, 'test_buckets': 0}
+
+        with transaction.atomic():
+            watermark = RollupService._lock_watermark()
+            history = TestAttemptHistory.objects.filter(created_at__lte=until)
+            if watermark.built_until is None:
+                logger.warning("Rollup watermark missing; rebuilding rollups from scratch")
+                StudentSubjectRollup.objects.all().delete()
+                TestRollup.objects.all().delete()
+            elif until <= watermark.built_until:
+                return stats
+            else:
+                history = history.filter(created_at__gt=watermark.built_until)
+
+            stats['rows'] = history.count()
+            for granularity in (RollupGranularity.DAY, RollupGranularity.WEEK):
+                stats['student_buckets'] += RollupService._upsert(
+                    StudentSubjectRollup,
+                    ['student_id', 'subject_id', 'granularity', 'period_start'],
+                    RollupService._aggregate(history, ['student_id', 'test__subject_id'], granularity),
+                )
+                stats['test_buckets'] += RollupService._upsert(
+                    TestRollup,
+                    ['test_id', 'granularity', 'period_start'],
+                    RollupService._aggregate(history, ['test_id'], granularity),
+                )
+            watermark.built_until = until
+            watermark.save(update_fields=['built_until', 'updated_at'])
+        logger.info(f"Built history rollups up to {until.isoformat()}: {stats}")
+        return stats
+
+    @staticmethod
+    def _replace(model, key_fields: List[str], existing, buckets: Dict[Tuple, Dict[str, Any]]) -> int:
+        """Overwrite the `existing` rows whose key is in `buckets` with freshly aggregated values."""
+        stale = [
+            row.id for row in existing.select_for_update()
+            if tuple(getattr(row, field) for field in key_fields) in buckets
+        ]
+        model.objects.filter(id__in=stale).delete()
+        model.objects.bulk_create([
+            model(
+                **dict(zip(key_fields, key)), attempt_count=bucket['count'], score_sum=bucket['score_sum'] or 0,
+                best_score=bucket['best'], duration_sum=bucket['duration_sum'] or 0,
+            )
+            for key, bucket in buckets.items()
+        ], batch_size=RollupService.BATCH_SIZE)
+        return len(buckets)
+
+    @staticmethod
+    def rebuild_tests(test_ids: List[int]) -> Dict[str, int]:
+        """Recompute the built buckets that contain history of `test_ids` after scores were rewritten.
+
+        Only rows up to the watermark are in the rollups; newer ones are read
+        raw and need nothing. Student buckets also hold other tests of the same
+        subject, so they are re-aggregated over all of the student's history.
+        """
+        stats = {'student_buckets': 0, 'test_buckets': 0}
+        for test_id in test_ids:
+            with transaction.atomic():
+                built_until = RollupService._lock_watermark().built_until
+                if built_until is None:
+                    # The next build starts from scratch anyway
+                    return stats
+                built = TestAttemptHistory.objects.filter(created_at__lte=built_until)
+                history = built.filter(test_id=test_id)
+                student_ids = sorted(set(history.values_list('student_id', flat=True)))
+                if not student_ids:
+                    continue
+                for granularity in (RollupGranularity.DAY, RollupGranularity.WEEK):
+                    stats['test_buckets'] += RollupService._replace(
+                        TestRollup, ['test_id', 'granularity', 'period_start'],
+                        TestRollup.objects.filter(test_id=test_id, granularity=granularity),
+                        RollupService._aggregate(history, ['test_id'], granularity),
+                    )
+                    for i in range(0, len(student_ids), RollupService.BATCH_SIZE):
+                        students = student_ids[i:i + RollupService.BATCH_SIZE]
+                        affected = RollupService._aggregate(
+                            history.filter(student_id__in=students), ['student_id', 'test__subject_id'], granularity
+                        )
+                        subject_ids = {key[1] for key in affected}
+                        buckets = RollupService._aggregate(
+                            built.filter(student_id__in=students, test__subject_id__in=subject_ids),
+                            ['student_id', 'test__subject_id'], granularity,
+                        )
+                        stats['student_buckets'] += RollupService._replace(
+                            StudentSubjectRollup, ['student_id', 'subject_id', 'granularity', 'period_start'],
+                            StudentSubjectRollup.objects.filter(
+                                student_id__in=students, subject_id__in=subject_ids, granularity=granularity,
+                                period_start__in={key[3] for key in affected},
+                            ),
+                            {key: bucket for key, bucket in buckets.items() if key in affected},
+                        )
+        logger.info(f"Rebuilt history rollups of tests {test_ids}: {stats}")
+        return stats
+
+    @staticmethod
+    def student_series(student, since: Optional[datetime], granularity: str) -> List[Dict[str, Any]]:
+        """Return chart points (`subject`, `score`, `completed_at`, ...) for a student.
+
+        `score` is the mean score of the bucket (or the attempt score for raw rows).
+        """
+        history = TestAttemptHistory.objects.filter(student=student).select_related('test__subject')
+        if since is not None:
+            history = history.filter(completed_at__gte=since)
+
+        if granularity == 'raw':
+            rows = history.order_by('-completed_at')[:RollupService.RAW_MAX_ROWS]
+            return [
+                {
+                    'subject': row.test.subject.name,
+                    'subject_id': row.test.subject_id,
+                    'score': row.score,
+                    'best_score': row.score,
+                    'count': 1,
+                    'completed_at': row.completed_at.isoformat(),
+                }
+                for row in reversed(rows)
+            ]
+
+        watermark = RollupService.get_watermark()
+        rollups = StudentSubjectRollup.objects.filter(
+            student=student, granularity=granularity
+        ).select_related('subject')
+        if since is not None:
+            rollups = rollups.filter(period_start__gte=RollupService.period_start(since, granularity))
+
+        buckets: Dict[Tuple[int, date], Dict[str, Any]] = {}
+        for row in rollups:
+            buckets[(row.subject_id, row.period_start)] = {
+                'subject': row.subject.name, 'count': row.attempt_count,
+                'score_sum': row.score_sum, 'best': row.best_score,
+            }
+        # Rows recorded after the last nightly build are folded in on the fly
+        for row in (history.filter(created_at__gt=watermark) if watermark else history):
+            key = (row.test.subject_id, RollupService.period_start(row.completed_at, granularity))
+            bucket = buckets.setdefault(key, {'subject': row.test.subject.name, 'count': 0, 'score_sum': 0, 'best': None})
+            bucket['count'] += 1
+            bucket['score_sum'] += row.score
+            bucket['best'] = row.score if bucket['best'] is None else max(bucket['best'], row.score)
+
+        return [
+            {
+                'subject': bucket['subject'],
+                'subject_id': subject_id,
+                'score': bucket['score_sum'] / bucket['count'] if bucket['count'] else 0,
+                'best_score': bucket['best'],
+                'count': bucket['count'],
+                'completed_at': period.isoformat(),
+            }
+            for (subject_id, period), bucket in sorted(buckets.items(), key=lambda item: item[0][1])
+        ]
@@ -3,12 +3,22 @@ from .models import StudentProgress, TestAnalytics, TestAttemptHistory
 from apps.examination.models import TestAttempt
 import logging
 from apps.examination.models import Test
+from .services.analytics_delta_service import AnalyticsDeltaService
+from .services.coalescing_service import CoalescingService
+from .services.mastery_service import MasteryService
+from .services.leaderboard_service import LeaderboardService
+from .services.rollup_service import RollupService
+from .services.item_analysis_service import ItemAnalysisService
+from .services.calibration_service import CalibrationService
+from django.utils import timezone
+from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
 @shared_task
 def update_student_progress(student_id, subject_id):
     logger.info(f'Starting update_student_progress for student {student_id}, subject {subject_id}')
+    CoalescingService.begin('progress', student_id, subject_id)
     try:
         progress = StudentProgress.objects.get(student_id=student_id, subject_id=subject_id)
         logger.debug(f'Found StudentProgress: id={progress.id}, student={progress.student.email}, subject={progress.subject.name}')
@@ -19,15 +29,18 @@ def update_student_progress(student_id, subject_id):
     except Exception as e:
         logger.error(f'Error in update_student_progress for student {student_id}, subject {subject_id}: {str(e)}')
         raise
+    finally:
+        CoalescingService.finish(update_student_progress, 'progress', student_id, subject_id)
 
 @shared_task
 def update_test_analytics(test_id):
     logger.info(f'Starting update_test_analytics for test {test_id}')
+    CoalescingService.begin('test', test_id)
     try:
         test = Test.objects.get(id=test_id)
-        analytics, created = TestAnalytics.objects.get_or_create(test=test)
-        logger.debug(f'{"Created" if created else "Found"} TestAnalytics: id={analytics.id}, test={analytics.test.title}')
-        analytics.update_analytics()
+        # Drops the pending incremental deltas the full recompute covers, under the compaction lock
+        AnalyticsDeltaService.recompute(test.id)
+        analytics = TestAnalytics.objects.get(test=test)
         logger.info(f'Updated TestAnalytics {analytics.id}: average_score={analytics.average_score}, difficulty_distribution={analytics.difficulty_distribution}')
     except Test.DoesNotExist:
         logger.error(f'No Test found for test {test_id}')
@@ -35,6 +48,18 @@ def update_test_analytics(test_id):
     except Exception as e:
         logger.error(f'Error in update_test_analytics for test {test_id}: {str(e)}')
         raise
+    finally:
+        CoalescingService.finish(update_test_analytics, 'test', test_id)
+
+
+def schedule_student_progress(student_id, subject_id):
+    """Queue a progress recompute, coalescing triggers within the configured window."""
+    return CoalescingService.schedule(update_student_progress, 'progress', student_id, subject_id)
+
+
+def schedule_test_analytics(test_id):
+    """Queue a full analytics recompute, coalescing triggers within the configured window."""
+    return CoalescingService.schedule(update_test_analytics, 'test', test_id)
 
 
 @shared_task
@@ -56,3 +81,93 @@ def record_test_attempt_history(attempt_id):
     except Exception as e:
         logger.error(f'Error in record_test_attempt_history for attempt {attempt_id}: {str(e)}')
         raise
+
+
+@shared_task
+def apply_attempt_analytics(attempt_id):
+    logger.info(f'Starting apply_attempt_analytics for attempt {attempt_id}')
+    try:
+        applied = AnalyticsDeltaService.apply_attempt(attempt_id)
+        logger.info(f'Analytics delta for attempt {attempt_id} {"applied" if applied else "skipped"}')
+        return applied
+    except TestAttempt.DoesNotExist:
+        logger.warning(f'No TestAttempt found for attempt {attempt_id}')
+    except Exception as e:
+        logger.error(f'Error in apply_attempt_analytics for attempt {attempt_id}: {str(e)}')
+        raise
+
+
+@shared_task
+def compact_test_analytics():
+    logger.info('Starting compact_test_analytics')
+    try:
+        compacted = AnalyticsDeltaService.compact_dirty()
+        logger.info(f'Compacted analytics deltas for {compacted} tests')
+        return compacted
+    except Exception as e:
+        logger.error(f'Error in compact_test_analytics: {str(e)}')
+        raise
+
+
+@shared_task
+def apply_topic_mastery(attempt_id):
+    logger.info(f'Starting apply_topic_mastery for attempt {attempt_id}')
+    try:
+        applied = MasteryService.apply_attempt(attempt_id)
+        logger.info(f'Topic mastery for attempt {attempt_id} {"applied" if applied else "skipped"}')
+        return applied
+    except TestAttempt.DoesNotExist:
+        logger.warning(f'No TestAttempt found for attempt {attempt_id}')
+    except Exception as e:
+        logger.error(f'Error in apply_topic_mastery for attempt {attempt_id}: {str(e)}')
+        raise
+
+
+@shared_task
+def update_leaderboards(attempt_id):
+    logger.info(f'Starting update_leaderboards for attempt {attempt_id}')
+    try:
+        changed = LeaderboardService.record_attempt(attempt_id)
+        logger.info(f'Leaderboards for attempt {attempt_id} {"updated" if changed else "unchanged"}')
+        return changed
+    except TestAttempt.DoesNotExist:
+        logger.warning(f'No TestAttempt found for attempt {attempt_id}')
+    except Exception as e:
+        logger.error(f'Error in update_leaderboards for attempt {attempt_id}: {str(e)}')
+        raise
+
+
+@shared_task
+def build_history_rollups():
+    logger.info('Starting build_history_rollups')
+    try:
+        stats = RollupService.build()
+        logger.info(f'Built history rollups: {stats}')
+        return stats
+    except Exception as e:
+        logger.error(f'Error in build_history_rollups: {str(e)}')
+        raise
+
+
+@shared_task
+def analyze_item_statistics(days=1):
+    logger.info(f'Starting analyze_item_statistics for the last {days} days')
+    try:
+        stats = ItemAnalysisService.analyze_since(timezone.now() - timedelta(days=days))
+        logger.info(f'Analyzed item statistics: {stats}')
+        return stats
+    except Exception as e:
+        logger.error(f'Error in analyze_item_statistics: {str(e)}')
+        raise
+
+
+@shared_task
+def calibrate_items(model='2PL'):
+    logger.info(f'Starting calibrate_items ({model})')
+    try:
+        stats = CalibrationService.calibrate(model=model)
+        logger.info(f'Calibrated items: {stats}')
+        return stats
+    except Exception as e:
+        logger.error(f'Error in calibrate_items: {str(e)}')
+        raise
@@ -1,3 +1,609 @@
+from unittest import mock
+import numpy as np
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
 from django.test import TestCase
+from django.urls import reverse
+from django_redis import get_redis_connection
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.common.choices.role import Role
+from apps.content.models import Subject, Topic, Question
+from apps.content.services.question_pool_service import QuestionPoolService
+from apps.examination.models import Test, TestAttempt, StudentResponse
+from apps.examination.services.autosave_service import AutosaveService
+from .models import TestAnalytics, StudentProgress, TopicMastery, TestAttemptHistory, StudentSubjectRollup, TestRollup, RollupWatermark, QuestionStats
+from .services.analytics_delta_service import AnalyticsDeltaService
+from .services.coalescing_service import CoalescingService
+from .services.mastery_service import MasteryService
+from .services.leaderboard_service import LeaderboardService
+from .services.rollup_service import RollupService
+from .services.item_analysis_service import ItemAnalysisService
+from .services.calibration_service import CalibrationService
+from .tasks import update_test_analytics
 
-# Create your tests here.
+
+class AnalyticsTestMixin:
+    """Shared fixtures: a test with `question_count` questions and no attempts yet."""
+
+    question_count = 4
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='Test@1234', role=Role.STUDENT
+        )
+        self.subject = Subject.objects.create(name='Physics')
+        self.topic = Topic.objects.create(subject=self.subject, name='Motion')
+        self.questions = []
+        for i in range(self.question_count):
+            question = Question.objects.create(
+                question_text=f'Question number {i}',
+                difficulty='EMH'[i % 3],
+                options={'A': 'one', 'B': 'two', 'C': 'three', 'D': 'four'},
+                correct_answer='A',
+                created_by=self.teacher,
+            )
+            question.topics.add(self.topic)
+            self.questions.append(question)
+        self.test = Test.objects.create(
+            title='Kinematics', created_by=self.teacher, subject=self.subject,
+            scoring_scheme={'correct': 1, 'incorrect': 0}
+        )
+        self.test.questions.set(self.questions)
+
+    def add_attempt(self, answers, times=None, score=None):
+        """Create a submitted attempt answering `answers[i]` for question i."""
+        attempt = TestAttempt.objects.create(
+            student=self.student, test=self.test, start_time=timezone.now(),
+            end_time=timezone.now(), score=score if score is not None else answers.count('A')
+        )
+        StudentResponse.objects.bulk_create([
+            StudentResponse(
+                attempt=attempt, question=question, selected_answer=answer,
+                is_correct=answer == question.correct_answer,
+                time_taken=(times[i] if times else 30)
+            )
+            for i, (question, answer) in enumerate(zip(self.questions, answers))
+        ])
+        return attempt
+
+    def delete_attempt_keys(self, *prefixes):
+        """Delete `<prefix><attempt id>` Redis keys of this test's attempts; the DB is shared with the app."""
+        keys = [f'{prefix}{attempt_id}' for attempt_id in TestAttempt.objects.values_list('id', flat=True) for prefix in prefixes]
+        if keys:
+            get_redis_connection('default').delete(*keys)
+
+
+class TestAnalyticsTest(AnalyticsTestMixin, TestCase):
+    def test_update_analytics_document(self):
+        self.add_attempt(['A', 'B', 'B', ''], times=[30, 200, 30, 30])
+        self.add_attempt(['A', 'C', 'B', 'A'], times=[150, 30, 30, 30])
+        self.add_attempt(['B', 'C', 'A', 'A'])
+        analytics, _ = TestAnalytics.objects.get_or_create(test=self.test)
+        analytics.update_analytics()
+
+        q = [str(question.id) for question in self.questions]
+        self.assertEqual(analytics.difficulty_distribution, {'E': 2, 'M': 1, 'H': 1})
+        self.assertAlmostEqual(analytics.average_score, 5 / 3)
+        self.assertEqual(analytics.question_analysis[q[0]], {
+            'correct_count': 2, 'incorrect_count': 1, 'common_wrong_answers': {'B': 1}
+        })
+        self.assertEqual(analytics.question_analysis[q[1]], {
+            'correct_count': 0, 'incorrect_count': 3, 'common_wrong_answers': {'C': 2, 'B': 1}
+        })
+        self.assertEqual(list(analytics.question_analysis[q[1]]['common_wrong_answers']), ['C', 'B'])
+        # blank answers count as incorrect but are not listed as a wrong option
+        self.assertEqual(analytics.question_analysis[q[3]], {
+            'correct_count': 2, 'incorrect_count': 1, 'common_wrong_answers': {}
+        })
+        self.assertEqual(analytics.anomalies, {
+            q[0]: {'excessive_time_count': 1}, q[1]: {'excessive_time_count': 1}
+        })
+
+    def test_update_analytics_query_count_is_constant(self):
+        for _ in range(3):
+            self.add_attempt(['A', 'B', 'C', 'D'])
+        TestAnalytics.objects.get_or_create(test=self.test)
+        analytics = TestAnalytics.objects.select_related('test').get(test=self.test)
+        # average score, question difficulties, grouped responses and the save
+        with self.assertNumQueries(4):
+            analytics.update_analytics()
+
+        extra = Question.objects.create(
+            question_text='Another question', difficulty='H',
+            options={'A': 'one', 'B': 'two'}, correct_answer='A', created_by=self.teacher,
+        )
+        self.test.questions.add(extra)
+        with self.assertNumQueries(4):
+            analytics.update_analytics()
+
+
+class AnalyticsDeltaServiceTest(AnalyticsTestMixin, TestCase):
+    def tearDown(self):
+        self.delete_attempt_keys(AnalyticsDeltaService.APPLIED_PREFIX)
+        key, pending_key = AnalyticsDeltaService.delta_key(self.test.id), AnalyticsDeltaService.pending_key(self.test.id)
+        redis = get_redis_connection('default')
+        redis.delete(key, f"{key}:compacting", pending_key, f"{pending_key}:compacting")
+        redis.srem(AnalyticsDeltaService.DIRTY_SET_KEY, self.test.id)
+
+    def test_compacted_deltas_match_full_recompute(self):
+        attempts = [
+            self.add_attempt(['A', 'B', 'B', ''], times=[30, 200, 30, 30]),
+            self.add_attempt(['A', 'C', 'B', 'A'], times=[150, 30, 30, 30]),
+        ]
+        for attempt in attempts:
+            self.assertTrue(AnalyticsDeltaService.apply_attempt(attempt.id))
+        self.assertTrue(AnalyticsDeltaService.compact(self.test.id))
+        # a second batch goes through the running totals
+        late = self.add_attempt(['B', 'C', 'A', 'A'])
+        AnalyticsDeltaService.apply_attempt(late.id)
+        self.assertEqual(AnalyticsDeltaService.compact_dirty(), 1)
+
+        incremental = TestAnalytics.objects.get(test=self.test)
+        full = TestAnalytics.objects.get(test=self.test)
+        full.update_analytics()
+        self.assertAlmostEqual(incremental.average_score, full.average_score)
+        self.assertEqual(incremental.scored_attempts, 3)
+        self.assertEqual(incremental.question_analysis, full.question_analysis)
+        self.assertEqual(incremental.anomalies, full.anomalies)
+        self.assertEqual(incremental.difficulty_distribution, full.difficulty_distribution)
+
+    def test_replayed_attempt_is_counted_once(self):
+        attempt = self.add_attempt(['A', 'A', 'A', 'A'])
+        self.assertTrue(AnalyticsDeltaService.apply_attempt(attempt.id))
+        self.assertFalse(AnalyticsDeltaService.apply_attempt(attempt.id))
+        AnalyticsDeltaService.compact(self.test.id)
+        analytics = TestAnalytics.objects.get(test=self.test)
+        self.assertEqual(analytics.scored_attempts, 1)
+        self.assertEqual(analytics.question_analysis[str(self.questions[0].id)]['correct_count'], 1)
+        self.assertFalse(AnalyticsDeltaService.compact(self.test.id))
+
+    def test_recompute_drops_only_the_deltas_it_covers(self):
+        counted = self.add_attempt(['A', 'A', 'A', 'A'])
+        self.assertTrue(AnalyticsDeltaService.apply_attempt(counted.id))
+        # a compaction interrupted after moving the hash aside
+        redis = get_redis_connection('default')
+        key, pending_key = AnalyticsDeltaService.delta_key(self.test.id), AnalyticsDeltaService.pending_key(self.test.id)
+        redis.rename(key, f"{key}:compacting")
+        redis.rename(pending_key, f"{pending_key}:compacting")
+        late = self.add_attempt(['B', 'B', 'B', 'B'])
+
+        update_test_analytics(self.test.id)
+        analytics = TestAnalytics.objects.get(test=self.test)
+        self.assertEqual(analytics.scored_attempts, 2)
+        # the delivery of a counted attempt after the recompute is ignored
+        self.assertFalse(AnalyticsDeltaService.apply_attempt(late.id))
+        self.assertFalse(AnalyticsDeltaService.compact(self.test.id))
+        self.assertEqual(TestAnalytics.objects.get(test=self.test).scored_attempts, 2)
+
+    def test_recompute_retries_when_an_unseen_attempt_is_pending(self):
+        attempt = self.add_attempt(['A', 'A', 'A', 'A'])
+        AnalyticsDeltaService.apply_attempt(attempt.id)
+        # the delta of an attempt the recompute's read did not include is kept
+        with mock.patch.object(AnalyticsDeltaService, 'RECOMPUTE_RETRIES', 1), \
+                mock.patch.object(TestAttempt.objects, 'filter', return_value=TestAttempt.objects.none()):
+            with self.assertRaises(RuntimeError):
+                AnalyticsDeltaService.recompute(self.test.id)
+        self.assertTrue(AnalyticsDeltaService.compact(self.test.id))
+        self.assertEqual(TestAnalytics.objects.get(test=self.test).scored_attempts, 1)
+
+    def test_flushed_in_progress_attempt_is_counted_once(self):
+        self.add_attempt(['A', 'A', 'A', 'A'])
+        attempt = TestAttempt.objects.create(student=self.student, test=self.test, start_time=timezone.now())
+        AutosaveService.save_answers(attempt.id, self.student, [
+            {'question': question.id, 'selected_answer': 'B', 'time_taken': 10} for question in self.questions
+        ])
+        self.assertEqual(AutosaveService.flush(attempt), self.question_count)
+
+        AnalyticsDeltaService.recompute(self.test.id)
+        q0 = str(self.questions[0].id)
+        analytics = TestAnalytics.objects.get(test=self.test)
+        self.assertEqual(analytics.question_analysis[q0], {
+            'correct_count': 1, 'incorrect_count': 0, 'common_wrong_answers': {}
+        })
+
+        attempt = AutosaveService.submit(attempt)
+        self.assertTrue(AnalyticsDeltaService.apply_attempt(attempt.id))
+        self.assertTrue(AnalyticsDeltaService.compact(self.test.id))
+        analytics = TestAnalytics.objects.get(test=self.test)
+        self.assertEqual(analytics.scored_attempts, 2)
+        self.assertEqual(analytics.question_analysis[q0], {
+            'correct_count': 1, 'incorrect_count': 1, 'common_wrong_answers': {'B': 1}
+        })
+
+        full = TestAnalytics.objects.get(test=self.test)
+        full.update_analytics()
+        self.assertEqual(full.question_analysis, analytics.question_analysis)
+
+
+class CoalescingServiceTest(TestCase):
+    def tearDown(self):
+        redis = get_redis_connection('default')
+        redis.srem(f"{CoalescingService.DIRTY_PREFIX}test", 7)
+        redis.delete(f"{CoalescingService.LOCK_PREFIX}test:7", CoalescingService.METRICS_KEY)
+
+    def test_burst_collapses_into_one_run(self):
+        with mock.patch.object(update_test_analytics, 'apply_async') as apply_async:
+            queued = [CoalescingService.schedule(update_test_analytics, 'test', 7) for _ in range(5)]
+        self.assertEqual(queued, [True, False, False, False, False])
+        apply_async.assert_called_once_with(args=[7], countdown=CoalescingService.get_window())
+        self.assertEqual(CoalescingService.get_metrics(), {'test:scheduled': 1, 'test:coalesced': 4})
+
+    def test_trigger_during_run_requeues(self):
+        with mock.patch.object(update_test_analytics, 'apply_async') as apply_async:
+            CoalescingService.schedule(update_test_analytics, 'test', 7)
+            CoalescingService.begin('test', 7)
+            self.assertFalse(CoalescingService.schedule(update_test_analytics, 'test', 7))
+            self.assertTrue(CoalescingService.finish(update_test_analytics, 'test', 7))
+            self.assertEqual(apply_async.call_count, 2)
+
+            # a run with no new triggers releases the key and stays quiet
+            CoalescingService.begin('test', 7)
+            self.assertFalse(CoalescingService.finish(update_test_analytics, 'test', 7))
+            self.assertTrue(CoalescingService.schedule(update_test_analytics, 'test', 7))
+
+
+class StudentProgressTest(AnalyticsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.forces = Topic.objects.create(subject=self.subject, name='Forces')
+        for question in self.questions[2:]:
+            question.topics.set([self.forces])
+        # a topic from another subject must not leak into this subject's progress
+        other = Topic.objects.create(subject=Subject.objects.create(name='Maths'), name='Vectors')
+        self.questions[0].topics.add(other)
+        self.progress = StudentProgress.objects.create(student=self.student, subject=self.subject)
+
+    def tearDown(self):
+        self.delete_attempt_keys(MasteryService.APPLIED_PREFIX)
+
+    def test_update_progress(self):
+        for answers in (['A', 'A', 'B', 'B'], ['A', 'A', 'B', 'A']):
+            MasteryService.apply_attempt(self.add_attempt(answers).id)
+        self.progress.update_progress()
+
+        self.assertEqual(self.progress.total_attempts, 2)
+        self.assertEqual(self.progress.average_score, 2.5)
+        self.assertEqual(list(self.progress.strength_topics.all()), [self.topic])
+        self.assertEqual(list(self.progress.weakness_topics.all()), [self.forces])
+        self.assertIn('Review Forces (accuracy: 25%)', self.progress.feedback)
+
+    def test_update_progress_query_count_is_constant(self):
+        for _ in range(5):
+            MasteryService.apply_attempt(self.add_attempt(['A', 'A', 'B', 'B']).id)
+        progress = StudentProgress.objects.select_related('student', 'subject').get(pk=self.progress.pk)
+        # attempt totals, mastery rows, two clears, two bulk inserts and the save
+        with self.assertNumQueries(7):
+            progress.update_progress()
+
+
+class MasteryServiceTest(AnalyticsTestMixin, TestCase):
+    def tearDown(self):
+        self.delete_attempt_keys(MasteryService.APPLIED_PREFIX)
+
+    def mastery(self):
+        return {m.topic_id: (m.correct, m.total, m.time_sum) for m in TopicMastery.objects.filter(student=self.student)}
+
+    def test_attempts_accumulate_once_each(self):
+        first = self.add_attempt(['A', 'B', 'A', ''], times=[10, 20, 30, 40])
+        self.assertTrue(MasteryService.apply_attempt(first.id))
+        self.assertFalse(MasteryService.apply_attempt(first.id))
+        MasteryService.apply_attempt(self.add_attempt(['A', 'A', 'A', 'A']).id)
+        self.assertEqual(self.mastery(), {self.topic.id: (6, 8, 220)})
+
+        # the rebuild from raw responses agrees with the incremental counters
+        MasteryService.rebuild()
+        self.assertEqual(self.mastery(), {self.topic.id: (6, 8, 220)})
+
+    def test_upsert_adds_in_sql_and_clamps_at_zero(self):
+        key = (self.student.id, self.topic.id)
+        MasteryService.upsert({key: [2, 3, 30]})
+        MasteryService.upsert({key: [1, 1, 5]})
+        self.assertEqual(self.mastery(), {self.topic.id: (3, 4, 35)})
+        MasteryService.adjust_correct([self.topic.id], {self.student.id: -5})
+        self.assertEqual(self.mastery(), {self.topic.id: (0, 4, 35)})
+
+    def test_rolled_back_apply_can_be_retried(self):
+        attempt = self.add_attempt(['A', 'B', 'A', ''], times=[10, 20, 30, 40])
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.assertTrue(MasteryService.apply_attempt(attempt.id))
+                    raise DatabaseError("deadlock")
+            except DatabaseError:
+                pass
+        self.assertEqual(self.mastery(), {})
+        # the claim from the rolled-back run expires instead of marking the attempt applied
+        get_redis_connection('default').delete(f"{MasteryService.APPLIED_PREFIX}{attempt.id}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(MasteryService.apply_attempt(attempt.id))
+        self.assertEqual(get_redis_connection('default').get(f"{MasteryService.APPLIED_PREFIX}{attempt.id}"), b'1')
+        self.assertFalse(MasteryService.apply_attempt(attempt.id))
+        self.assertEqual(self.mastery(), {self.topic.id: (2, 4, 100)})
+
+    def test_in_progress_attempt_is_skipped(self):
+        attempt = self.add_attempt(['A', 'A', 'A', 'A'])
+        TestAttempt.objects.filter(pk=attempt.pk).update(end_time=None)
+        self.assertFalse(MasteryService.apply_attempt(attempt.id))
+        self.assertEqual(self.mastery(), {})
+
+
+class LeaderboardServiceTest(AnalyticsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = [self.student] + [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='Test@1234', role=Role.STUDENT
+            )
+            for i in range(1, 4)
+        ]
+
+    def tearDown(self):
+        self.delete_boards()
+
+    def delete_boards(self):
+        """Delete the boards of this test's tests and subjects; the Redis DB is shared with the app."""
+        keys = [LeaderboardService.get_key('test', test_id) for test_id in Test.objects.values_list('id', flat=True)]
+        keys += [LeaderboardService.get_key('subject', subject_id) for subject_id in Subject.objects.values_list('id', flat=True)]
+        get_redis_connection('default').delete(*keys)
+
+    def attempt_for(self, student, score, test=None):
+        return TestAttempt.objects.create(
+            student=student, test=test or self.test, start_time=timezone.now(), end_time=timezone.now(), score=score
+        )
+
+    def test_best_score_and_subject_sum(self):
+        for student, score in zip(self.students, [3, 4, 4, 1]):
+            LeaderboardService.record_attempt(self.attempt_for(student, score).id)
+        # a lower retake does not replace the best
+        self.assertFalse(LeaderboardService.record_attempt(self.attempt_for(self.students[0], 2).id))
+
+        other = Test.objects.create(title='Dynamics', created_by=self.teacher, subject=self.subject,
+                                    scoring_scheme={'correct': 1, 'incorrect': 0})
+        LeaderboardService.record_attempt(self.attempt_for(self.students[3], 5, test=other).id)
+
+        top = LeaderboardService.get_top('test', self.test.id, limit=3)
+        self.assertEqual([(e['rank'], e['score']) for e in top], [(1, 4.0), (1, 4.0), (3, 3.0)])
+        self.assertEqual(
+            LeaderboardService.get_standing('test', self.test.id, self.student.id),
+            {'score': 3.0, 'rank': 3, 'total': 4, 'percentile': 25.0}
+        )
+        self.assertEqual(LeaderboardService.get_standing('subject', self.subject.id, self.students[3].id)['score'], 6.0)
+        self.assertIsNone(LeaderboardService.get_standing('test', other.id, self.student.id))
+
+        # the rebuild from the database reproduces the live boards
+        redis = get_redis_connection('default')
+        live = redis.zrange(LeaderboardService.get_key('subject', self.subject.id), 0, -1, withscores=True)
+        self.delete_boards()
+        self.assertEqual(LeaderboardService.rebuild(), {'tests': 2, 'subjects': 1})
+        self.assertEqual(redis.zrange(LeaderboardService.get_key('subject', self.subject.id), 0, -1, withscores=True), live)
+
+    def test_resync_lowers_regraded_best(self):
+        attempt = self.attempt_for(self.student, 4)
+        LeaderboardService.record_attempt(attempt.id)
+        TestAttempt.objects.filter(pk=attempt.pk).update(score=2)
+        LeaderboardService.resync_test(self.test.id, self.subject.id)
+        self.assertEqual(LeaderboardService.get_standing('test', self.test.id, self.student.id)['score'], 2.0)
+        self.assertEqual(LeaderboardService.get_standing('subject', self.subject.id, self.student.id)['score'], 2.0)
+
+    def test_view_is_limited_to_owned_or_attempted_tests(self):
+        LeaderboardService.record_attempt(self.attempt_for(self.student, 3).id)
+        stranger = User.objects.create_user(
+            username='stranger', email='stranger@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        urls = [reverse('leaderboard', args=['test', self.test.id]), reverse('leaderboard', args=['subject', self.subject.id])]
+        for user, expected in ((self.teacher, 200), (self.student, 200), (self.students[1], 404), (stranger, 404)):
+            self.client.force_login(user)
+            for url in urls:
+                self.assertEqual(self.client.get(url, HTTP_ACCEPT='application/json').status_code, expected)
+        self.client.force_login(self.student)
+        response = self.client.get(urls[0], HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['me']['score'], 3.0)
+
+
+class RollupServiceTest(AnalyticsTestMixin, TestCase):
+    def add_history(self, score, completed_at, duration=600):
+        return TestAttemptHistory.objects.create(
+            student=self.student, test=self.test, score=score, completed_at=completed_at, duration=duration
+        )
+
+    def snapshot(self):
+        return {
+            'students': sorted(StudentSubjectRollup.objects.values_list(
+                'granularity', 'period_start', 'attempt_count', 'score_sum', 'best_score', 'duration_sum')),
+            'tests': sorted(TestRollup.objects.values_list(
+                'granularity', 'period_start', 'attempt_count', 'score_sum', 'best_score', 'duration_sum')),
+        }
+
+    def test_pick_granularity(self):
+        self.assertEqual(RollupService.pick_granularity(7), 'raw')
+        self.assertEqual(RollupService.pick_granularity(90), 'D')
+        self.assertEqual(RollupService.pick_granularity(365), 'W')
+        self.assertEqual(RollupService.pick_granularity(None), 'W')
+
+    def test_incremental_build_matches_rebuild(self):
+        monday = datetime(2025, 3, 3, 10, tzinfo=dt_timezone.utc)
+        self.add_history(40, monday)
+        self.add_history(60, monday + timedelta(hours=2))
+        self.assertEqual(RollupService.build(until=timezone.now())['rows'], 2)
+
+        self.add_history(80, monday + timedelta(days=2))
+        self.add_history(20, monday)
+        self.assertEqual(RollupService.build(until=timezone.now())['rows'], 2)
+        self.assertEqual(RollupService.build(until=timezone.now())['rows'], 0)
+        incremental = self.snapshot()
+
+        RollupWatermark.objects.all().delete()
+        RollupService.build(until=timezone.now())
+        self.assertEqual(self.snapshot(), incremental)
+
+        week = TestRollup.objects.get(granularity='W')
+        self.assertEqual((week.attempt_count, week.best_score, week.mean_score), (4, 80, 50))
+        day = StudentSubjectRollup.objects.get(granularity='D', period_start=monday.date())
+        self.assertEqual((day.attempt_count, day.duration_sum), (3, 1800))
+
+    def test_recent_rows_wait_for_the_safety_lag(self):
+        now = timezone.now()
+        self.add_history(40, now - timedelta(days=1))
+        # rows of still-open transactions may commit later with an older creation time
+        self.assertEqual(RollupService.build()['rows'], 0)
+        self.assertLess(RollupService.get_watermark(), TestAttemptHistory.objects.get().created_at)
+        series = RollupService.student_series(self.student, now - timedelta(days=90), 'D')
+        self.assertEqual([p['count'] for p in series], [1])
+
+        self.assertEqual(RollupService.build(until=timezone.now())['rows'], 1)
+        # the watermark row has moved past the built rows, so they are not added again
+        self.assertEqual(RollupService.build(until=timezone.now())['rows'], 0)
+        self.assertEqual(TestRollup.objects.get(granularity='D').attempt_count, 1)
+
+    def test_series_merges_rows_after_watermark(self):
+        now = timezone.now()
+        self.add_history(40, now - timedelta(days=30))
+        RollupService.build(until=timezone.now())
+        self.add_history(60, now - timedelta(days=30))
+        self.add_history(90, now - timedelta(days=1))
+
+        series = RollupService.student_series(self.student, now - timedelta(days=90), 'D')
+        self.assertEqual([(p['count'], p['score'], p['best_score']) for p in series], [(2, 50, 60), (1, 90, 90)])
+        self.assertEqual(series[0]['subject'], 'Physics')
+
+        raw = RollupService.student_series(self.student, now - timedelta(days=7), 'raw')
+        self.assertEqual([p['score'] for p in raw], [90])
+
+
+class ItemAnalysisServiceTest(AnalyticsTestMixin, TestCase):
+    def test_compute_matches_reference_formulas(self):
+        rng = np.random.default_rng(7)
+        ability = rng.normal(size=400)
+        key = np.array([1, 2, 3, 4, 1], dtype=np.uint8)
+        answers = np.where(
+            rng.normal(size=(400, 5)) < ability[:, None], key, rng.integers(0, 5, size=(400, 5))
+        ).astype(np.uint8)
+        asked = np.ones_like(answers, dtype=bool)
+        stats = ItemAnalysisService.compute(answers, asked, key, np.full(5, 4))
+
+        correct = (answers == key).astype(float)
+        np.testing.assert_allclose(stats['p_value'], correct.mean(axis=0))
+        rest = correct.sum(axis=1) - correct[:, 0]
+        self.assertAlmostEqual(stats['point_biserial'][0], np.corrcoef(correct[:, 0], rest)[0, 1])
+        self.assertTrue((stats['discrimination_index'] > 0).all())
+        self.assertEqual(stats['counts'].sum(), answers.size)
+
+        # a miskeyed item: strong students pick B while the key says D
+        answers[:, 4] = np.where(ability > 0, 2, 1)
+        key[4] = 4
+        stats = ItemAnalysisService.compute(answers, asked, key, np.full(5, 4))
+        flags = ItemAnalysisService.get_flags(stats, 4)
+        self.assertIn('possible_miskey', flags)
+        self.assertIn('too_hard', flags)
+
+    def test_blocks_add_up_to_the_pooled_matrix(self):
+        rng = np.random.default_rng(3)
+        key = np.array([1, 2, 3, 4, 1, 2], dtype=np.uint8)
+        answers = rng.integers(0, 5, size=(300, 6)).astype(np.uint8)
+        # two tests sharing questions 2 and 3, as the nightly job pools them
+        asked = np.zeros_like(answers, dtype=bool)
+        asked[:180, :4] = True
+        asked[180:, 2:] = True
+        expected = ItemAnalysisService.compute(answers, asked, key, np.full(6, 4))
+
+        totals = ItemAnalysisService.new_totals(6)
+        for rows, columns in ((slice(0, 90), [0, 1, 2, 3]), (slice(90, 180), [0, 1, 2, 3]), (slice(180, 300), [2, 3, 4, 5])):
+            block = answers[rows][:, columns]
+            ItemAnalysisService.accumulate(
+                totals, np.array(columns), block, np.ones(block.shape, dtype=bool), key[columns]
+            )
+        stats = ItemAnalysisService.finalize(totals, key, np.full(6, 4))
+        for name in expected:
+            np.testing.assert_allclose(stats[name], expected[name], err_msg=name)
+
+    def test_questions_are_pooled_across_tests(self):
+        self.add_attempt(['A', 'A', 'B', ''])
+        self.add_attempt(['B', 'A', 'A', 'A'])
+        other = Test.objects.create(title='Dynamics', created_by=self.teacher, subject=self.subject,
+                                    scoring_scheme={'correct': 1, 'incorrect': 0})
+        other.questions.set(self.questions[:2])
+        TestAttempt.objects.create(student=self.student, test=other, start_time=timezone.now(), end_time=timezone.now())
+        StudentResponse.objects.create(
+            attempt=TestAttempt.objects.filter(test=other).get(), question=self.questions[0],
+            selected_answer='A', is_correct=True, time_taken=10
+        )
+
+        self.assertEqual(ItemAnalysisService.analyze_test(self.test.id)[self.questions[0].id]['response_count'], 2)
+        with mock.patch.object(ItemAnalysisService, 'ATTEMPT_BATCH_SIZE', 1):
+            self.assertEqual(ItemAnalysisService.analyze_since(None), {'questions': 4, 'flagged': 0})
+        stats = QuestionStats.objects.get(question=self.questions[0])
+        self.assertEqual(stats.response_count, 3)
+        self.assertAlmostEqual(stats.p_value, 2 / 3, places=4)
+        self.assertEqual(stats.option_counts, {'': 0, 'A': 2, 'B': 1, 'C': 0, 'D': 0})
+        self.assertEqual(QuestionStats.objects.get(question=self.questions[3]).response_count, 2)
+
+
+class CalibrationServiceTest(AnalyticsTestMixin, TestCase):
+    def tearDown(self):
+        cache.delete_many([
+            QuestionPoolService.get_key(topic_id, difficulty)
+            for topic_id in Topic.objects.values_list('id', flat=True)
+            for difficulty in QuestionPoolService.DIFFICULTIES
+        ])
+
+    def simulate(self, n_persons=3000, n_items=30, seed=11):
+        rng = np.random.default_rng(seed)
+        theta = rng.normal(size=n_persons)
+        difficulty = np.linspace(-2, 2, n_items)
+        discrimination = rng.uniform(0.7, 1.8, size=n_items)
+        persons = np.repeat(np.arange(n_persons), n_items)
+        items = np.tile(np.arange(n_items), n_persons)
+        prob = 1 / (1 + np.exp(-discrimination[items] * (theta[persons] - difficulty[items])))
+        return persons, items, (rng.random(prob.size) < prob).astype(np.int8), difficulty, discrimination
+
+    def test_fit_recovers_parameters(self):
+        persons, items, correct, difficulty, discrimination = self.simulate()
+        result = CalibrationService.fit(persons, items, correct, model='2PL')
+        self.assertTrue(result['converged'])
+        self.assertGreater(np.corrcoef(result['difficulty'], difficulty)[0, 1], 0.98)
+        self.assertGreater(np.corrcoef(result['discrimination'], discrimination)[0, 1], 0.8)
+
+        rasch = CalibrationService.fit(persons, items, correct, model='1PL')
+        self.assertTrue((rasch['discrimination'] == 1).all())
+        self.assertGreater(np.corrcoef(rasch['difficulty'], difficulty)[0, 1], 0.98)
+        with self.assertRaises(ValueError):
+            CalibrationService.fit(persons, items, correct, model='3PL')
+
+    def test_calibrate_keeps_classical_stats(self):
+        QuestionStats.objects.create(question=self.questions[0], response_count=5, p_value=0.5)
+        with mock.patch.object(CalibrationService, 'MIN_RESPONSES', 2):
+            for i in range(6):
+                self.add_attempt(['A'] * (i % 4 + 1) + ['B'] * (3 - i % 4))
+            stats = CalibrationService.calibrate(model='1PL')
+
+        self.assertEqual((stats['responses'], stats['questions']), (24, 4))
+        calibrated = QuestionStats.objects.get(question=self.questions[0])
+        self.assertEqual((calibrated.response_count, calibrated.p_value, calibrated.irt_model), (5, 0.5, '1PL'))
+        # the first question is always answered correctly, the last one rarely
+        b_first = calibrated.irt_difficulty
+        b_last = QuestionStats.objects.get(question=self.questions[3]).irt_difficulty
+        self.assertLess(b_first, b_last)
+        self.assertEqual(CalibrationService.difficulty_band(b_first), 'E')
+        self.assertEqual(CalibrationService.difficulty_band(b_last), 'H')
+
+    def test_calibrated_bands_feed_question_selection(self):
+        # questions[3] is labeled Easy but answered correctly least often
+        self.assertEqual(QuestionPoolService.select({self.topic.id: 1}, {'H': 1}, count=1), [self.questions[2].id])
+        with mock.patch.object(CalibrationService, 'MIN_RESPONSES', 2), self.captureOnCommitCallbacks(execute=True):
+            for i in range(6):
+                self.add_attempt(['A'] * (i % 4 + 1) + ['B'] * (3 - i % 4))
+            CalibrationService.calibrate(model='1PL')
+
+        # the authored label is kept; only test building uses the band
+        self.questions[3].refresh_from_db()
+        self.assertEqual(self.questions[3].difficulty, 'E')
+        pools = QuestionPoolService.get_pools([self.topic.id], ['E', 'H'])
+        self.assertIn(self.questions[3].id, pools[(self.topic.id, 'H')])
+        self.assertNotIn(self.questions[3].id, pools[(self.topic.id, 'E')])
+        drawn = QuestionPoolService.select({self.topic.id: 1}, {'H': 1}, count=2)
+        self.assertIn(self.questions[3].id, drawn)
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import StudentProgressView, TestAnalyticsView
+from .views import StudentProgressView, TestAnalyticsView, LeaderboardView
 
 urlpatterns = [
     path('progress/', StudentProgressView.as_view(), name='student-progress'),
     path('test/<int:test_id>/', TestAnalyticsView.as_view(), name='test_analytics'),
+    path('leaderboard/<str:scope>/<int:object_id>/', LeaderboardView.as_view(), name='leaderboard'),
     
 ]
\ No newline at end of file
@@ -2,9 +2,11 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from apps.common.authentication import CookieTokenAuthentication
-from .models import StudentProgress, TestAnalytics, TestAttemptHistory
-from .serializers import StudentProgressSerializer, TestAnalyticsSerializer, TestAttemptHistorySerializer
-from apps.accounts.models import User
+from .models import StudentProgress, TestAnalytics, TestAttemptHistory, TopicMastery, TestRollup, RollupGranularity, QuestionStats
+from .services.rollup_service import RollupService
+from .services.leaderboard_service import LeaderboardService
+from .serializers import StudentProgressSerializer, TestAnalyticsSerializer, TestAttemptHistorySerializer, TopicMasterySerializer
+from apps.common.choices.role import Role
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 from apps.common.permissions import IsTeacher
@@ -14,6 +16,8 @@ from apps.common.throttles import CustomUserRateThrottle
 from django.contrib import messages
 from django.shortcuts import redirect
 from apps.examination.models import Test
+from django.utils import timezone
+from datetime import timedelta
 import logging
 import json
 
@@ -26,9 +30,11 @@ class StudentProgressView(APIView):
     authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
     renderer_classes = [TemplateHTMLRenderer, JSONRenderer]
     throttle_classes = [CustomUserRateThrottle]
+    DEFAULT_RANGE_DAYS = 90
+    HISTORY_TABLE_LIMIT = 50
 
     def get(self, request):
-        if request.user.role != User.Role.STUDENT:
+        if request.user.role != Role.STUDENT:
             logger.warning(f"Unauthorized access by {request.user.email} (role: {request.user.role})")
             if request.accepted_renderer.format == 'html':
                 messages.error(request, "Only students can view progress.")
@@ -37,24 +43,48 @@ class StudentProgressView(APIView):
 
         progress = StudentProgress.objects.filter(student=request.user)
         progress_serializer = StudentProgressSerializer(progress, many=True)
+
+        # One row per topic the student has answered, straight from the mastery counters
+        mastery = TopicMastery.objects.filter(student=request.user).select_related('topic').order_by('topic__name')
+        mastery_serializer = TopicMasterySerializer(mastery, many=True)
+        mastery_by_subject = {}
+        for row in mastery_serializer.data:
+            mastery_by_subject.setdefault(row['subject_id'], []).append(row)
         
-        history = TestAttemptHistory.objects.filter(student=request.user).order_by('completed_at')
+        # The chart range decides the granularity: raw attempts, daily or weekly rollups
+        range_param = request.query_params.get('range', str(self.DEFAULT_RANGE_DAYS))
+        try:
+            days = None if range_param == 'all' else max(1, int(range_param))
+        except ValueError:
+            return Response({"error": "range must be a number of days or 'all'"}, status=status.HTTP_400_BAD_REQUEST)
+        since = timezone.now() - timedelta(days=days) if days else None
+        granularity = RollupService.pick_granularity(days)
+        series = RollupService.student_series(request.user, since, granularity)
+
+        history = TestAttemptHistory.objects.filter(student=request.user).select_related(
+            'test__subject'
+        ).order_by('-completed_at')[:self.HISTORY_TABLE_LIMIT]
         history_serializer = TestAttemptHistorySerializer(history, many=True)
-        print("History:", history_serializer.data)
 
         if request.accepted_renderer.format == 'html':
             return Response(
                 {
                     'progress': progress_serializer.data,
                     'history': history_serializer.data,
-                    'history_json': json.dumps(history_serializer.data),  # Serialize to JSON string
+                    'history_json': json.dumps(series),  # Serialize to JSON string
+                    'granularity': granularity,
+                    'mastery': mastery_by_subject,
                     'user': request.user
                 },
                 template_name='analytics/student/progress.html'
             )
         return Response({
             'progress': progress_serializer.data,
-            'history': history_serializer.data
+            'history': history_serializer.data,
+            'series': series,
+            'granularity': granularity,
+            'range': range_param,
+            'mastery': mastery_serializer.data
         })
 
 
@@ -64,6 +94,7 @@ class TestAnalyticsView(APIView):
     authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
     renderer_classes = [TemplateHTMLRenderer, JSONRenderer]
     throttle_classes = [CustomUserRateThrottle]
+    TREND_WEEKS = 26
 
     def get(self, request, test_id):
         if not request.user.is_active or not request.user.is_verified:
@@ -92,16 +123,79 @@ class TestAnalyticsView(APIView):
             )
 
         serializer = TestAnalyticsSerializer(analytics)
+        data = serializer.data
+        trend = TestRollup.objects.filter(
+            test_id=test_id, granularity=RollupGranularity.WEEK
+        ).order_by('-period_start')[:self.TREND_WEEKS]
+        data['trend'] = [
+            {
+                'period_start': row.period_start.isoformat(),
+                'attempts': row.attempt_count,
+                'mean_score': row.mean_score,
+                'best_score': row.best_score,
+            }
+            for row in reversed(trend)
+        ]
+        # Item statistics pooled over every test that uses the question (nightly job)
+        data['item_stats'] = {
+            str(row['question_id']): row
+            for row in QuestionStats.objects.filter(question__in=analytics.test.questions.all()).values(
+                'question_id', 'response_count', 'p_value', 'point_biserial',
+                'discrimination_index', 'distractor_efficiency', 'flags',
+                'irt_model', 'irt_difficulty', 'irt_discrimination'
+            )
+        }
         logger.info(f"Analytics for test {test_id} retrieved by {request.user.email}")
 
         if request.accepted_renderer.format == 'html':
             return Response(
                 {
-                    'analytics': serializer.data,
+                    'analytics': data,
                     'test': analytics.test,
                     'user': request.user
                 },
                 template_name='analytics/teacher/test_analytics.html'
             )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class LeaderboardView(APIView):
+    """Top-N and the caller's standing for a test or subject leaderboard.
+
+    GET /leaderboard/<test|subject>/<id>/?limit=10
+
+    Teachers see the boards of their own tests and of the subjects they
+    have tests in; students those of tests and subjects they attempted.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    renderer_classes = [JSONRenderer]
+    throttle_classes = [CustomUserRateThrottle]
+
+    def get(self, request, scope, object_id):
+        if scope not in LeaderboardService.SCOPES:
+            return Response({"error": "Unknown leaderboard"}, status=status.HTTP_404_NOT_FOUND)
+        if request.user.role == Role.TEACHER:
+            tests = Test.objects.filter(created_by=request.user)
+        elif request.user.role == Role.STUDENT:
+            tests = Test.objects.filter(attempts__student=request.user)
+        else:
+            return Response({"error": "Invalid user role"}, status=status.HTTP_403_FORBIDDEN)
+        lookup = {'id': object_id} if scope == 'test' else {'subject_id': object_id}
+        if not tests.filter(**lookup).exists():
+            logger.warning(f"Leaderboard {scope}:{object_id} not found or not accessible to {request.user.email}")
+            return Response({"error": "Leaderboard not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
+        data = {
+            'scope': scope,
+            'id': object_id,
+            'top': LeaderboardService.get_top(scope, object_id, limit),
+        }
+        if request.user.role == Role.STUDENT:
+            data['me'] = LeaderboardService.get_standing(scope, object_id, request.user.id)
+        logger.debug(f"Leaderboard {scope}:{object_id} served to {request.user.email}")
+        return Response(data, status=status.HTTP_200_OK)
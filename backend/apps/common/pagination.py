@@ -0,0 +1,154 @@
+# apps/common/pagination.py
+from typing import Any, Dict, List, Optional
+import base64
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KeysetPaginator:
+    """Cursor pagination over (created_at, id), newest first.
+
+    Each page is `WHERE (created_at, id) < cursor ORDER BY created_at DESC, id DESC
+    LIMIT n + 1`, so page 5,000 costs the same as page 1 given an index ending in
+    (created_at, id) — InnoDB appends the primary key to every secondary index.
+    The cursor is an opaque base64 token of the boundary row; `previous` links
+    walk the same index backwards. Totals are opt-in (`?include_total=1`) and
+    come from a count cached per query for COUNT_TIMEOUT seconds, so they may
+    lag behind recent writes.
+    """
+
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    COUNT_TIMEOUT = 300
+    COUNT_KEY_PREFIX = "keyset_count"
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, queryset: QuerySet, request, page_size: int = PAGE_SIZE, count: Optional[int] = None):
+        """
+        Args:
+            queryset: Filtered, unordered queryset of a TimeStampedModel.
+            request: The DRF request; supplies the cursor and builds the links.
+            page_size: Default page size when `?page_size=` is absent.
+            count: Exact total already known to the caller (e.g. from an index).
+        """
+        self.queryset = queryset
+        self.request = request
+        self.page_size = page_size
+        self.count = count
+        self.has_next = False
+        self.has_previous = False
+        self.page: List[Any] = []
+
+    @staticmethod
+    def encode_cursor(created_at, pk: int, reverse: bool = False) -> str:
+        payload = {'c': created_at.isoformat(), 'i': pk}
+        if reverse:
+            payload['r'] = 1
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Any]:
+        """Raises ValueError for a malformed or tampered cursor."""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(payload['c'])
+            pk = int(payload['i'])
+        except (TypeError, KeyError, ValueError, AttributeError):
+            raise ValueError("Invalid cursor")
+        if created_at is None:
+            raise ValueError("Invalid cursor")
+        return {'created_at': created_at, 'id': pk, 'reverse': bool(payload.get('r'))}
+
+    def get_page_size(self) -> int:
+        value = self.request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        if not str(value).isdigit() or int(value) < 1:
+            raise ValueError("page_size must be a positive integer")
+        return min(int(value), self.MAX_PAGE_SIZE)
+
+    def paginate(self) -> List[Any]:
+        """Return the rows of the requested page.
+
+        Raises:
+            ValueError: If the cursor or page size is invalid.
+        """
+        page_size = self.get_page_size()
+        cursor = self.request.query_params.get(self.cursor_query_param)
+        position = self.decode_cursor(cursor) if cursor else None
+        reverse = bool(position and position['reverse'])
+
+        queryset = self.queryset
+        if position is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        elif reverse:
+            queryset = queryset.filter(
+                Q(created_at__gt=position['created_at']) |
+                Q(created_at=position['created_at'], id__gt=position['id'])
+            ).order_by('created_at', 'id')
+        else:
+            queryset = queryset.filter(
+                Q(created_at__lt=position['created_at']) |
+                Q(created_at=position['created_at'], id__lt=position['id'])
+            ).order_by('-created_at', '-id')
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_total(self) -> int:
+        """Exact count when known, else a cached COUNT(*) of the filtered query."""
+        if self.count is not None:
+            return self.count
+        try:
+            sql = str(self.queryset.query)
+        except EmptyResultSet:
+            # e.g. `id__in` an empty set: Django knows nothing matches and builds no SQL
+            return 0
+        key = f"{self.COUNT_KEY_PREFIX}:{hashlib.sha1(sql.encode()).hexdigest()}"
+        return cache.get_or_set(key, self.queryset.count, timeout=self.COUNT_TIMEOUT)
+
+    def _link(self, row, reverse: bool) -> str:
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(row.created_at, row.pk, reverse)
+        )
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_data(self, results: List[Any]) -> Dict[str, Any]:
+        """Response body for the serialized `results` of the current page."""
+        data = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': results,
+        }
+        if self.request.query_params.get('include_total') in ('1', 'true', 'True'):
+            data['count'] = self.get_total()
+        return data
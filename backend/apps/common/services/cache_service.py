@@ -0,0 +1,76 @@
+# apps/common/services/cache_service.py
+from typing import Any, Mapping, Optional
+import hashlib
+import json
+import time
+from django.core.cache import cache
+from django.db import transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CacheService:
+    """Versioned cache keys with generation-counter invalidation.
+
+    A key is `<scope>:g<generation>:<sha1 of the canonical parts>`. The parts
+    are serialized with sorted keys and sorted multi-values, so the same
+    request produces the same key in every worker and after restarts (unlike
+    the per-process randomized `hash()`). Invalidating a scope is a single
+    INCR of its generation counter: entries of older generations are never
+    read again and simply expire, so no SCAN/`delete_pattern` is needed.
+    """
+
+    GENERATION_PREFIX = "cache_gen"
+
+    @staticmethod
+    def _generation_key(scope: str) -> str:
+        return f"{CacheService.GENERATION_PREFIX}:{scope}"
+
+    @staticmethod
+    def get_generation(scope: str) -> int:
+        key = CacheService._generation_key(scope)
+        generation = cache.get(key)
+        if generation is None:
+            # Seed from the clock so an evicted counter never revives old entries
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+            generation = cache.get(key)
+        return int(generation)
+
+    @staticmethod
+    def canonicalize(params: Optional[Mapping[str, Any]]) -> str:
+        """Stable JSON for a dict or QueryDict; list values are sorted, empty values dropped."""
+        if not params:
+            return ''
+        normalized = {}
+        for name in params:
+            values = params.getlist(name) if hasattr(params, 'getlist') else params[name]
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            values = sorted(str(value) for value in values if value not in (None, ''))
+            if values:
+                normalized[name] = values
+        return json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+
+    @staticmethod
+    def make_key(scope: str, *parts: Any, params: Optional[Mapping[str, Any]] = None) -> str:
+        """Build the current key for `parts` and request `params` within `scope`."""
+        raw = json.dumps([str(part) for part in parts], separators=(',', ':')) + CacheService.canonicalize(params)
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"{scope}:g{CacheService.get_generation(scope)}:{digest}"
+
+    @staticmethod
+    def bump(scope: str) -> None:
+        """Invalidate every entry of `scope` with one INCR."""
+        key = CacheService._generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Missing counter: seed it, entries under any earlier seed are orphaned
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+        logger.debug(f"Bumped cache generation for {scope}")
+
+    @staticmethod
+    def bump_on_commit(scope: str) -> None:
+        """Bump once the current transaction commits, so readers never re-cache stale rows."""
+        transaction.on_commit(lambda: CacheService.bump(scope))
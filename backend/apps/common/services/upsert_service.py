@@ -0,0 +1,85 @@
+# apps/common/services/upsert_service.py
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from django.db import connection, transaction
+from django.db.models import Model
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UpsertService:
+    """Insert-or-update of many rows keyed by a unique constraint.
+
+    The existing rows are locked and read once, every row is set in Python,
+    and all of them are written by `bulk_create(update_conflicts=True)`: one
+    INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE statement per batch
+    instead of a SELECT and an UPDATE or INSERT per row.
+
+    The row locks only cover keys that already have a row. Two concurrent
+    upserts of a missing key both build it from scratch, and the second
+    write overwrites the first. That is harmless when the new values do not
+    depend on the stored ones; read-modify-write callers (counters added to
+    the stored value) must run one at a time under a lock of their own, or
+    add in SQL instead (see MasteryService.upsert).
+    """
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def set_fields(row: Model, values: Dict[str, Any]) -> None:
+        for field, value in values.items():
+            setattr(row, field, value)
+
+    @staticmethod
+    def upsert(
+        model,
+        key_fields: List[str],
+        rows: Dict[Tuple, Any],
+        update_fields: List[str],
+        apply: Optional[Callable[[Model, Any], None]] = None,
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """Create or update one `model` row per key of `rows`.
+
+        Args:
+            model: Model with a unique constraint over `key_fields`.
+            key_fields: Field attnames of the constraint, e.g. ['question_id'].
+            rows: Key tuples (in `key_fields` order) mapped to the new values.
+            update_fields: Fields written on conflict; `updated_at` is added
+                when the model has it.
+            apply: Called as `apply(row, value)` to update a locked existing
+                row or a new one built from its key. Defaults to setting the
+                fields of a `{field: value}` dict. Callers whose `apply` reads
+                the row must serialize themselves (see the class docstring).
+            batch_size: Rows per statement, BATCH_SIZE by default.
+
+        Returns:
+            Number of rows written.
+        """
+        if not rows:
+            return 0
+        apply = apply or UpsertService.set_fields
+        filters = {f"{field}__in": {key[i] for key in rows} for i, field in enumerate(key_fields)}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            update_fields = list(update_fields) + ['updated_at']
+        with transaction.atomic():
+            existing = {
+                tuple(getattr(row, field) for field in key_fields): row
+                for row in model.objects.select_for_update().filter(**filters)
+            }
+            objs = []
+            for key, value in rows.items():
+                row = existing.get(key) or model(**dict(zip(key_fields, key)))
+                apply(row, value)
+                objs.append(row)
+            # MySQL upserts on any unique key and rejects an explicit conflict target
+            unique_fields = key_fields if connection.features.supports_update_conflicts_with_target else None
+            model.objects.bulk_create(
+                objs,
+                batch_size=batch_size or UpsertService.BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=update_fields,
+            )
+        logger.debug(f"Upserted {len(objs)} {model.__name__} rows")
+        return len(objs)
@@ -0,0 +1,21 @@
+# apps/common/testing.py
+from django_redis import get_redis_connection
+
+
+def delete_redis_keys(*patterns: str) -> int:
+    """Delete the keys matching the glob `patterns` from the default Redis DB.
+
+    Tests run against the Redis DB the app uses, so they drop only the keys
+    they wrote instead of flushing it. Cache-framework keys are stored under
+    the cache's own prefix and version; use `cache.delete_pattern` for those.
+
+    Returns:
+        The number of keys deleted.
+    """
+    redis = get_redis_connection('default')
+    deleted = 0
+    for pattern in patterns:
+        keys = list(redis.scan_iter(match=pattern, count=1000))
+        if keys:
+            deleted += redis.delete(*keys)
+    return deleted
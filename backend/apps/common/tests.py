@@ -1,3 +1,82 @@
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
 from django.test import TestCase
+from apps.analytics.models import QuestionStats
+from apps.content.models import Question
+from .services.cache_service import CacheService
+from .services.upsert_service import UpsertService
 
-# Create your tests here.
+
+class CacheServiceTest(TestCase):
+    def test_keys_are_canonical(self):
+        first = CacheService.make_key('question_list', 7, 'TE', params=QueryDict('topic=3&difficulty=E&subject='))
+        second = CacheService.make_key('question_list', 7, 'TE', params={'difficulty': 'E', 'topic': '3'})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, CacheService.make_key('question_list', 8, 'TE', params={'difficulty': 'E', 'topic': '3'}))
+        self.assertNotEqual(first, CacheService.make_key('question_list', 7, 'TE', params={'difficulty': 'M', 'topic': '3'}))
+
+    def test_bump_moves_every_key_to_a_new_generation(self):
+        key = CacheService.make_key('question_list', 7)
+        other_scope = CacheService.make_key('subject_topic_context', 7)
+        cache.set(key, 'stale')
+        self.addCleanup(cache.delete, key)
+        CacheService.bump('question_list')
+        self.assertNotEqual(CacheService.make_key('question_list', 7), key)
+        self.assertIsNone(cache.get(CacheService.make_key('question_list', 7)))
+        self.assertEqual(CacheService.make_key('subject_topic_context', 7), other_scope)
+
+        cache.delete(f"{CacheService.GENERATION_PREFIX}:question_list")
+        CacheService.bump('question_list')
+        self.assertNotEqual(CacheService.make_key('question_list', 7), key)
+
+    def test_question_without_creator_invalidates_lists(self):
+        key = CacheService.make_key('question_list', 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(
+                question_text='Orphaned question', difficulty='E',
+                options={'A': 'one', 'B': 'two'}, correct_answer='A', created_by=None,
+            )
+        self.assertNotEqual(CacheService.make_key('question_list', 7), key)
+
+
+class UpsertServiceTest(TestCase):
+    def setUp(self):
+        self.questions = [
+            Question.objects.create(question_text=f'Upsert question {i}', options={'A': 'a', 'B': 'b'}, correct_answer='A')
+            for i in range(3)
+        ]
+        QuestionStats.objects.create(question=self.questions[0], response_count=5, p_value=0.5)
+
+    def test_updates_existing_rows_and_inserts_missing_ones(self):
+        written = UpsertService.upsert(
+            QuestionStats, ['question_id'],
+            {(question.id,): {'response_count': 10 + i} for i, question in enumerate(self.questions)},
+            ['response_count'],
+        )
+        self.assertEqual(written, 3)
+        self.assertEqual(
+            dict(QuestionStats.objects.values_list('question_id', 'response_count')),
+            {question.id: 10 + i for i, question in enumerate(self.questions)}
+        )
+        # fields outside update_fields are kept on existing rows
+        self.assertEqual(QuestionStats.objects.get(question=self.questions[0]).p_value, 0.5)
+
+    def test_apply_reads_the_locked_row(self):
+        def add(row, count):
+            row.response_count += count
+
+        UpsertService.upsert(QuestionStats, ['question_id'], {(self.questions[0].id,): 3}, ['response_count'], apply=add)
+        self.assertEqual(QuestionStats.objects.get(question=self.questions[0]).response_count, 8)
+
+    def test_conflict_target_is_dropped_where_unsupported(self):
+        with mock.patch.object(
+            type(connection.features), 'supports_update_conflicts_with_target',
+            new_callable=mock.PropertyMock, return_value=False
+        ), mock.patch.object(QuestionStats.objects, 'bulk_create') as bulk_create:
+            UpsertService.upsert(QuestionStats, ['question_id'], {(self.questions[1].id,): {'response_count': 1}},
+                                 ['response_count'])
+        kwargs = bulk_create.call_args.kwargs
+        self.assertIsNone(kwargs['unique_fields'])
+        self.assertEqual(kwargs['update_fields'], ['response_count', 'updated_at'])
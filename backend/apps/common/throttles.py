@@ -5,4 +5,7 @@ class CustomAnonRateThrottle(AnonRateThrottle):
     scope = 'anon'
 
 class CustomUserRateThrottle(UserRateThrottle):
-    scope = 'user'
\ No newline at end of file
+    scope = 'user'
+
+class AutosaveRateThrottle(UserRateThrottle):
+    scope = 'autosave'
@@ -1,6 +1,6 @@
 from django.utils import timezone
 from django.contrib import admin
-from .models import Subject, Topic, Question, QuestionApproval
+from .models import Subject, Topic, Question, QuestionApproval, QuestionImportJob
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
@@ -54,4 +54,11 @@ class QuestionApprovalAdmin(admin.ModelAdmin):
             elif obj.status == 'REJECTED':
                 obj.question.is_active = False
                 obj.question.save()
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+@admin.register(QuestionImportJob)
+class QuestionImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_by', 'file_format', 'status', 'processed_rows', 'created_count', 'error_count', 'created_at')
+    list_filter = ('status', 'file_format', 'created_at')
+    search_fields = ('created_by__email',)
+    readonly_fields = ('processed_rows', 'created_count', 'error_count', 'errors', 'message', 'started_at', 'finished_at')
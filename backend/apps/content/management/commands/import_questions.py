@@ -0,0 +1,37 @@
+# apps/content/management/commands/import_questions.py
+import os
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.models import User
+from apps.content.models import QuestionImportJob, JobStatus
+from apps.content.services.import_service import QuestionImportService
+
+
+class Command(BaseCommand):
+    help = 'Imports questions from a CSV/JSON/NDJSON/XLSX file in batches, as the given teacher'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--email', required=True, help='Owner of the imported questions')
+        parser.add_argument('--format', choices=QuestionImportService.FORMATS, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+        file_format = options['format'] or QuestionImportService.detect_format(options['path'])
+        if file_format is None:
+            raise CommandError("Cannot tell the file format; pass --format")
+
+        with open(options['path'], 'rb') as handle:
+            job = QuestionImportJob.objects.create(
+                created_by=user, file_format=file_format, file=File(handle, name=os.path.basename(options['path']))
+            )
+        job = QuestionImportService.run(job, progress=lambda job: self.stdout.write(
+            f"{job.processed_rows} rows read, {job.created_count} imported, {job.error_count} rejected"
+        ))
+        for error in job.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['errors']}"))
+        style = self.style.SUCCESS if job.status == JobStatus.COMPLETED else self.style.ERROR
+        self.stdout.write(style(job.message))
@@ -0,0 +1,24 @@
+# apps/content/management/commands/load_spellcheck_vocabulary.py
+from django.core.management.base import BaseCommand
+from apps.content.models import Subject, Topic, Question
+from apps.content.services.spellcheck_service import SpellCheckService
+
+
+class Command(BaseCommand):
+    help = 'Seeds the shared spell-check vocabulary from subject/topic names, active questions and optional word files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', action='append', default=[], help='Word list, one word per line (repeatable)')
+
+    def handle(self, *args, **options):
+        added = 0
+        for name in Subject.objects.values_list('name', flat=True).iterator():
+            added += SpellCheckService.add_text(name)
+        for name in Topic.objects.values_list('name', flat=True).iterator():
+            added += SpellCheckService.add_text(name)
+        for text in Question.objects.filter(is_active=True).values_list('question_text', flat=True).iterator(chunk_size=1000):
+            added += SpellCheckService.add_text(text)
+        for path in options['file']:
+            with open(path, encoding='utf-8') as handle:
+                added += SpellCheckService.add_vocabulary(line.strip() for line in handle if line.strip())
+        self.stdout.write(self.style.SUCCESS(f"Added {added} words to the spell-check vocabulary"))
@@ -0,0 +1,15 @@
+# apps/content/management/commands/rebuild_duplicate_index.py
+import time
+from django.core.management.base import BaseCommand
+from apps.content.services.duplicate_index_service import DuplicateIndexService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the MinHash/LSH near-duplicate index of question texts (run once before relying on it)'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = DuplicateIndexService.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} question texts in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,15 @@
+# apps/content/management/commands/rebuild_question_index.py
+import time
+from django.core.management.base import BaseCommand
+from apps.content.services.question_index_service import QuestionIndexService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the Redis inverted index of question attributes (topic, subject, difficulty, status, creator)'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = QuestionIndexService.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} questions in {time.perf_counter() - start:.1f}s"
+        ))
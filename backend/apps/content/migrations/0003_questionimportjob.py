@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_alter_question_created_by_alter_question_topics_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('file', models.FileField(upload_to='imports/questions/')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('json', 'JSON'), ('ndjson', 'NDJSON'), ('xlsx', 'Excel')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['created_by', 'difficulty'], name='content_que_created_7dcbba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['created_by', 'created_at'], name='content_que_created_a78f6b_idx'),
+        ),
+        migrations.AddField(
+            model_name='questionimportjob',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_imports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='questionimportjob',
+            index=models.Index(fields=['created_by', 'created_at'], name='content_que_created_150e6d_idx'),
+        ),
+    ]
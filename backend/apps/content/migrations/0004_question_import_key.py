@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_questionimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+import apps.content.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0004_question_import_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='questionimportjob',
+            name='file',
+            field=models.FileField(storage=apps.content.storage.ImportStorage(), upload_to=apps.content.storage.import_upload_path),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from apps.common.models import TimeStampedModel
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from apps.content.storage import import_storage, import_upload_path
 from apps.content.utils.validations import validate_subject_name, validate_topic_name,validate_options as  external_validate_options
 
 
@@ -72,6 +73,8 @@ class Question(TimeStampedModel):
     version = models.PositiveIntegerField(default=1)
     is_active = models.BooleanField(default=True)
     source = models.CharField(max_length=50, default='manual')  # options: 'manual', 'auto_nlp'
+    # Set per row by bulk imports, to find the rows again where bulk_create returns no ids (MySQL)
+    import_key = models.CharField(max_length=32, null=True, blank=True, unique=True, editable=False)
 
 
     class Meta:
@@ -114,4 +117,38 @@ class QuestionApproval(TimeStampedModel):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"Approval for Question {self.question.id} ({self.status})"
\ No newline at end of file
+        return f"Approval for Question {self.question.id} ({self.status})"
+
+class JobStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    COMPLETED = 'COMPLETED', 'Completed'
+    FAILED = 'FAILED', 'Failed'
+
+
+class QuestionImportJob(TimeStampedModel):
+    """A bulk question upload, processed in batches by a Celery task."""
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('json', 'JSON'),
+        ('ndjson', 'NDJSON'),
+        ('xlsx', 'Excel'),
+    )
+    created_by = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='question_imports')
+    file = models.FileField(upload_to=import_upload_path, storage=import_storage)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.PENDING)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # [{'row': n, 'errors': {field: message}}], capped; error_count has the full number
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_by', 'created_at'])]
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
@@ -1,11 +1,13 @@
 import logging
+from django.db import transaction
 from rest_framework import serializers
-from .models import Subject, Topic, Question, QuestionApproval
+from .models import Subject, Topic, Question, QuestionApproval, QuestionImportJob
 from apps.content.utils.validations import (
     validate_question_text, validate_question_type, validate_difficulty,
     validate_options, validate_source, validate_topic_subject_consistency,
     check_duplicate_question, log_validation_error
 )
+from apps.examination.tasks import regrade_question
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +80,7 @@ class QuestionSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         topics = validated_data.pop('topics', None)
+        previous_answer = instance.correct_answer
         instance.version += 1
         instance.is_active = False
         approval = instance.approval
@@ -93,9 +96,24 @@ class QuestionSerializer(serializers.ModelSerializer):
         instance.save()
         if topics is not None:
             instance.topics.set(topics)
+        if instance.correct_answer != previous_answer:
+            # Stored responses and scores were graded against the old key
+            question_id = instance.id
+            transaction.on_commit(lambda: regrade_question.delay(question_id))
+            logger.info(f"Question {instance.id} answer changed from {previous_answer} to {instance.correct_answer}; re-grade queued")
         if not all(validated_data.get('options', instance.options).values()):
             approval.flagged_by_system = True
             approval.flag_reason = "Empty option values detected"
             approval.save()
         logger.info(f"Question {instance.id} updated by {instance.created_by.email}")
         return instance
+
+
+class QuestionImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuestionImportJob
+        fields = [
+            'id', 'file_format', 'status', 'processed_rows', 'created_count', 'error_count',
+            'errors', 'message', 'started_at', 'finished_at', 'created_at'
+        ]
+        read_only_fields = fields
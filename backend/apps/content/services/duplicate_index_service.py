@@ -0,0 +1,237 @@
+# apps/content/services/duplicate_index_service.py
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import re
+import zlib
+from collections import Counter, defaultdict
+import numpy as np
+from django.db import transaction
+from django_redis import get_redis_connection
+from fuzzywuzzy import fuzz
+from apps.content.models import Question
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DuplicateIndexService:
+    """MinHash/LSH index of question texts for near-duplicate detection.
+
+    A text is normalized, cut into character shingles and reduced to a
+    MinHash signature of NUM_PERM values; the signature is split into BANDS
+    bands and each band hashes to a Redis SET bucket scoped by subject
+    (`qdup:<subject_id>:<band>:<hash>`). Texts with a high shingle Jaccard
+    similarity share at least one bucket with high probability, so a lookup
+    reads BANDS buckets instead of the whole bank. Candidates are ranked by
+    the number of shared buckets and only the best MAX_CANDIDATES are checked
+    with `fuzz.ratio`. Each question keeps its bucket keys in `qdup:q:<id>`
+    so updates and deletes are diffs. Until `rebuild` has run (`qdup:ready`)
+    `find_duplicate` scans the topics like before.
+    """
+
+    PREFIX = "qdup"
+    READY_KEY = "qdup:ready"
+    SHINGLE_SIZE = 5
+    NUM_PERM = 128
+    # 2 rows per band. Requiring MIN_SHARED_BANDS shared buckets, a pair with shingle
+    # Jaccard 0.3 becomes a candidate with ~98.2% probability (99.98% at 0.4, ~100% at
+    # 0.5); one shared bucket would give 99.8% at 0.3 but lets chance collisions through.
+    # Edits clustered in a few words keep Jaccard far above 0.3; only texts with many
+    # scattered one-letter edits near SIMILARITY_THRESHOLD fall into the ~2% gap.
+    BANDS = 64
+    MIN_SHARED_BANDS = 2
+    MAX_CANDIDATES = 100
+    SIMILARITY_THRESHOLD = 90
+    BATCH_SIZE = 1000
+    _PRIME = (1 << 61) - 1
+    # Fixed seed: signatures must match across processes and deploys
+    _rng = np.random.RandomState(20240601)
+    _A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+    _B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', '', (text or '').lower())).strip()
+
+    @staticmethod
+    def signature(text: str) -> np.ndarray:
+        """MinHash signature (uint64, NUM_PERM values) of the text's character shingles."""
+        service = DuplicateIndexService
+        text = service.normalize(text)
+        k = service.SHINGLE_SIZE
+        shingles = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p stays below 2**64 because x < 2**32 and a, b < 2**31
+        return ((np.outer(hashes, service._A) + service._B) % service._PRIME).min(axis=0)
+
+    @staticmethod
+    def band_keys(text: str, subject_ids: Iterable[int]) -> Set[str]:
+        service = DuplicateIndexService
+        signature = service.signature(text)
+        rows = service.NUM_PERM // service.BANDS
+        bands = [
+            f"{band}:{zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()):08x}"
+            for band in range(service.BANDS)
+        ]
+        return {f"{service.PREFIX}:{subject_id}:{band}" for subject_id in subject_ids for band in bands}
+
+    @staticmethod
+    def _member_key(question_id: int) -> str:
+        return f"{DuplicateIndexService.PREFIX}:q:{question_id}"
+
+    @staticmethod
+    def is_ready() -> bool:
+        return bool(get_redis_connection('default').exists(DuplicateIndexService.READY_KEY))
+
+    @staticmethod
+    def compute_keys(question_ids: Iterable[int]) -> Dict[int, Set[str]]:
+        """Bucket keys of each existing question, under every subject of its topics."""
+        question_ids = list(question_ids)
+        subjects = defaultdict(set)
+        for question_id, subject_id in Question.topics.through.objects.filter(
+            question_id__in=question_ids
+        ).values_list('question_id', 'topic__subject_id'):
+            subjects[question_id].add(subject_id)
+        return {
+            question_id: DuplicateIndexService.band_keys(text, subjects[question_id])
+            for question_id, text in Question.objects.filter(id__in=question_ids).values_list('id', 'question_text')
+        }
+
+    @staticmethod
+    def reindex(question_ids: Iterable[int]) -> int:
+        """Bring the buckets of `question_ids` in line with the database; deleted questions are removed."""
+        question_ids = list(set(question_ids))
+        if not question_ids:
+            return 0
+        redis = get_redis_connection('default')
+        current = DuplicateIndexService.compute_keys(question_ids)
+        pipe = redis.pipeline()
+        for question_id in question_ids:
+            pipe.smembers(DuplicateIndexService._member_key(question_id))
+        previous = pipe.execute()
+
+        pipe = redis.pipeline(transaction=True)
+        for question_id, old in zip(question_ids, previous):
+            old = {k.decode() for k in old}
+            new = current.get(question_id, set())
+            for k in old - new:
+                pipe.srem(k, question_id)
+            for k in new - old:
+                pipe.sadd(k, question_id)
+            member_key = DuplicateIndexService._member_key(question_id)
+            pipe.delete(member_key)
+            if new:
+                pipe.sadd(member_key, *new)
+        pipe.execute()
+        return len(question_ids)
+
+    @staticmethod
+    def schedule_reindex(question_ids: Iterable[int]) -> None:
+        question_ids = list(question_ids)
+        if question_ids:
+            transaction.on_commit(lambda: DuplicateIndexService.reindex(question_ids))
+
+    @staticmethod
+    def rebuild() -> int:
+        """Drop and rebuild every bucket from the database."""
+        service = DuplicateIndexService
+        redis = get_redis_connection('default')
+        redis.delete(service.READY_KEY)
+        stale = list(redis.scan_iter(match=f"{service.PREFIX}:*", count=service.BATCH_SIZE))
+        for i in range(0, len(stale), service.BATCH_SIZE):
+            redis.delete(*stale[i:i + service.BATCH_SIZE])
+
+        question_ids = list(Question.objects.order_by('id').values_list('id', flat=True))
+        for i in range(0, len(question_ids), service.BATCH_SIZE):
+            buckets: Dict[str, List[int]] = defaultdict(list)
+            pipe = redis.pipeline()
+            for question_id, keys in service.compute_keys(question_ids[i:i + service.BATCH_SIZE]).items():
+                if keys:
+                    pipe.sadd(service._member_key(question_id), *keys)
+                for k in keys:
+                    buckets[k].append(question_id)
+            for k, ids in buckets.items():
+                pipe.sadd(k, *ids)
+            pipe.execute()
+        redis.set(service.READY_KEY, 1)
+        logger.info(f"Rebuilt duplicate index for {len(question_ids)} questions")
+        return len(question_ids)
+
+    @staticmethod
+    def candidates(text: str, subject_ids: Iterable[int], exclude_id: Optional[int] = None) -> List[int]:
+        """Indexed questions sharing at least MIN_SHARED_BANDS buckets, most shared first."""
+        keys = sorted(DuplicateIndexService.band_keys(text, subject_ids))
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline()
+        for k in keys:
+            pipe.smembers(k)
+        shared = Counter(int(m) for members in pipe.execute() for m in members)
+        shared.pop(exclude_id, None)
+        return [
+            question_id for question_id, hits in shared.most_common(DuplicateIndexService.MAX_CANDIDATES)
+            if hits >= DuplicateIndexService.MIN_SHARED_BANDS
+        ]
+
+    @staticmethod
+    def find_duplicate(question_text: str, topics: Sequence, exclude_id: Optional[int] = None) -> Optional[int]:
+        """Id of a question in any of `topics` whose text is too similar, else None."""
+        text = question_text.lower()
+        queryset = Question.objects.filter(topics__in=topics)
+        if exclude_id:
+            queryset = queryset.exclude(id=exclude_id)
+        if DuplicateIndexService.is_ready():
+            candidate_ids = DuplicateIndexService.candidates(
+                question_text, {topic.subject_id for topic in topics}, exclude_id
+            )
+            if not candidate_ids:
+                return None
+            queryset = queryset.filter(id__in=candidate_ids)
+        else:
+            logger.debug("Duplicate index not built; scanning topics")
+
+        for question_id, existing_text in queryset.values_list('id', 'question_text').distinct():
+            if fuzz.ratio(text, existing_text.lower()) > DuplicateIndexService.SIMILARITY_THRESHOLD:
+                return question_id
+        return None
+
+    @staticmethod
+    def find_duplicates(items: Sequence[Tuple[str, Sequence]]) -> List[Optional[int]]:
+        """Batch form of `find_duplicate` for (question_text, topics) pairs.
+
+        With the index built, all buckets are read in one pipeline and all
+        candidate texts with one query, whatever the batch size.
+        """
+        service = DuplicateIndexService
+        if not service.is_ready():
+            return [service.find_duplicate(text, topics) for text, topics in items]
+
+        item_keys = [sorted(service.band_keys(text, {t.subject_id for t in topics})) for text, topics in items]
+        unique_keys = sorted({k for keys in item_keys for k in keys})
+        pipe = get_redis_connection('default').pipeline()
+        for k in unique_keys:
+            pipe.smembers(k)
+        buckets = {k: [int(m) for m in members] for k, members in zip(unique_keys, pipe.execute())}
+
+        item_candidates = []
+        for keys in item_keys:
+            shared = Counter(m for k in keys for m in buckets[k])
+            item_candidates.append([
+                question_id for question_id, hits in shared.most_common(service.MAX_CANDIDATES)
+                if hits >= service.MIN_SHARED_BANDS
+            ])
+        candidate_ids = {q for candidates in item_candidates for q in candidates}
+        texts, topic_sets = {}, defaultdict(set)
+        for question_id, topic_id, text in Question.topics.through.objects.filter(
+            question_id__in=candidate_ids
+        ).values_list('question_id', 'topic_id', 'question__question_text'):
+            texts[question_id] = text.lower()
+            topic_sets[question_id].add(topic_id)
+
+        results = []
+        for (text, topics), candidates in zip(items, item_candidates):
+            topic_ids = {t.id for t in topics}
+            text = text.lower()
+            results.append(next((
+                q for q in candidates
+                if topic_sets[q] & topic_ids and fuzz.ratio(text, texts[q]) > service.SIMILARITY_THRESHOLD
+            ), None))
+        return results
@@ -0,0 +1,322 @@
+# apps/content/services/import_service.py
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
+import os
+import uuid
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from apps.common.services.cache_service import CacheService
+from apps.content.models import Topic, Question, QuestionApproval, QuestionImportJob, JobStatus
+from apps.content.services.duplicate_index_service import DuplicateIndexService
+from apps.content.services.question_index_service import QuestionIndexService
+from apps.content.services.question_pool_service import QuestionPoolService
+from apps.content.utils.validations import (
+    validate_difficulty, validate_options, validate_question_type, validate_source,
+    validate_topic_subject_consistency, MAX_QUESTION_TEXT_LENGTH
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionImportService:
+    """Bulk question import from CSV, JSON, NDJSON or XLSX files.
+
+    Records are parsed as a stream (JSON arrays excepted, which `json` can
+    only load whole) and handled BATCH_SIZE at a time: each batch is
+    validated with in-memory topic lookups and one batched duplicate check,
+    then its questions, topic links and pending approvals are written with
+    three `bulk_create` calls in one transaction. bulk_create skips model
+    signals, so the attribute/duplicate indexes, question pools and list
+    cache are refreshed explicitly for every committed batch.
+
+    Record fields: `question_text`, `difficulty` (E/M/H or Easy/Medium/Hard),
+    `options` (object) or `option_a`..`option_d`, `correct_answer`, `topics`
+    (ids or names, list or `;`-separated) with `subject` (name) when topics
+    are given by name, and optional `question_type`, `source`, `metadata`.
+    """
+
+    FORMATS = ('csv', 'json', 'ndjson', 'xlsx')
+    BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 500
+    OPTION_KEYS = ('A', 'B', 'C', 'D')
+    DIFFICULTY_NAMES = {'easy': 'E', 'medium': 'M', 'hard': 'H'}
+
+    @staticmethod
+    def detect_format(filename: str) -> Optional[str]:
+        extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+        extension = {'jsonl': 'ndjson'}.get(extension, extension)
+        return extension if extension in QuestionImportService.FORMATS else None
+
+    @staticmethod
+    def iter_records(handle: IO[bytes], file_format: str) -> Iterator[Dict[str, Any]]:
+        """Yield one dict per record of a binary file handle.
+
+        Raises:
+            ValueError: If the format is unknown or the file cannot be parsed.
+        """
+        if file_format == 'csv':
+            yield from csv.DictReader(io.TextIOWrapper(handle, encoding='utf-8-sig', newline=''))
+        elif file_format == 'ndjson':
+            for line in io.TextIOWrapper(handle, encoding='utf-8-sig'):
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == 'json':
+            records = json.load(io.TextIOWrapper(handle, encoding='utf-8-sig'))
+            if not isinstance(records, list):
+                raise ValueError("A JSON import must be an array of question objects")
+            yield from records
+        elif file_format == 'xlsx':
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise ValueError("XLSX import requires the openpyxl package")
+            workbook = load_workbook(handle, read_only=True, data_only=True)
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+            for values in rows:
+                if any(value not in (None, '') for value in values):
+                    yield {name: value for name, value in zip(header, values) if name}
+            workbook.close()
+        else:
+            raise ValueError(f"Format must be one of {', '.join(QuestionImportService.FORMATS)}")
+
+    @staticmethod
+    def load_topics() -> Dict[str, Dict]:
+        """Topic lookups by id and by (subject name, topic name), lowercased."""
+        by_id, by_name = {}, {}
+        for topic in Topic.objects.select_related('subject'):
+            by_id[topic.id] = topic
+            by_name[(topic.subject.name.lower(), topic.name.lower())] = topic
+        return {'by_id': by_id, 'by_name': by_name}
+
+    @staticmethod
+    def _text(value) -> str:
+        return '' if value is None else str(value).strip()
+
+    @staticmethod
+    def parse_record(record: Dict[str, Any], topics: Dict[str, Dict]) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """Validate one record; returns (question fields, {}) or (None, {field: error})."""
+        service = QuestionImportService
+        record = {service._text(k).lower(): v for k, v in record.items() if k is not None}
+        errors: Dict[str, str] = {}
+        text = service._text(record.get('question_text'))
+        if not text:
+            errors['question_text'] = "Question text is required"
+        elif len(text) > MAX_QUESTION_TEXT_LENGTH:
+            errors['question_text'] = f"Must be under {MAX_QUESTION_TEXT_LENGTH} characters"
+
+        difficulty = service._text(record.get('difficulty'))
+        difficulty = service.DIFFICULTY_NAMES.get(difficulty.lower(), difficulty.upper())
+        options = record.get('options')
+        if isinstance(options, str) and options:
+            try:
+                options = json.loads(options)
+            except ValueError:
+                options = None
+        if not options:
+            options = {key: service._text(record.get(f'option_{key.lower()}')) for key in service.OPTION_KEYS}
+        elif isinstance(options, dict):
+            options = {service._text(k).upper(): service._text(v) for k, v in options.items()}
+        correct_answer = service._text(record.get('correct_answer')).upper()
+        question_type = service._text(record.get('question_type')) or 'MCQ'
+        source = service._text(record.get('source')) or 'manual'
+        checks = (
+            ('difficulty', validate_difficulty, difficulty),
+            ('options', validate_options, options),
+            ('question_type', validate_question_type, question_type),
+            ('source', validate_source, source),
+        )
+        for field, validator, value in checks:
+            try:
+                validator(value)
+            except (ValidationError, AttributeError) as e:
+                errors[field] = e.messages[0] if isinstance(e, ValidationError) else "Invalid value"
+        if 'options' not in errors and correct_answer not in options:
+            errors['correct_answer'] = "Correct answer must be one of the option keys (A, B, C, D)"
+
+        metadata = record.get('metadata') or {}
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                errors['metadata'] = "Metadata must be a JSON object"
+        if not isinstance(metadata, dict):
+            errors['metadata'] = "Metadata must be a JSON object"
+
+        raw_topics = record.get('topics')
+        if isinstance(raw_topics, (int, float)):
+            raw_topics = [int(raw_topics)]
+        elif not isinstance(raw_topics, list):
+            raw_topics = [t for t in service._text(raw_topics).replace('|', ';').split(';') if t.strip()]
+        subject = service._text(record.get('subject')).lower()
+        resolved, missing = [], []
+        for value in raw_topics:
+            value = service._text(value)
+            topic = topics['by_id'].get(int(value)) if value.isdigit() else topics['by_name'].get((subject, value.lower()))
+            (resolved if topic else missing).append(topic or value)
+        if not raw_topics:
+            errors['topics'] = "At least one topic is required"
+        elif missing:
+            errors['topics'] = f"Unknown topics: {', '.join(missing)}"
+        else:
+            try:
+                validate_topic_subject_consistency(resolved)
+            except ValidationError as e:
+                errors['topics'] = e.messages[0]
+
+        if errors:
+            return None, errors
+        return {
+            'question_text': text,
+            'difficulty': difficulty,
+            'options': options,
+            'correct_answer': correct_answer,
+            'question_type': question_type,
+            'source': source,
+            'metadata': metadata,
+            'topics': resolved,
+        }, {}
+
+    @staticmethod
+    def _assign_pks(questions: List[Question]) -> None:
+        """Recover primary keys after bulk_create on backends that do not return them (MySQL).
+
+        Every row of the batch carries its own `import_key`, so the ids are read
+        back by key rather than by text or id range.
+        """
+        ids = dict(Question.objects.filter(
+            import_key__in=[question.import_key for question in questions]
+        ).values_list('import_key', 'id'))
+        for question in questions:
+            question.pk = ids[question.import_key]
+
+    @staticmethod
+    def insert_batch(rows: List[Dict[str, Any]], user_id: int) -> List[int]:
+        """Write one validated batch in a transaction; returns the new question ids."""
+        with transaction.atomic():
+            questions = Question.objects.bulk_create([
+                Question(
+                    question_text=row['question_text'], difficulty=row['difficulty'], options=row['options'],
+                    correct_answer=row['correct_answer'], question_type=row['question_type'],
+                    source=row['source'], metadata=row['metadata'], created_by_id=user_id, is_active=False,
+                    import_key=uuid.uuid4().hex,
+                )
+                for row in rows
+            ], batch_size=QuestionImportService.BATCH_SIZE)
+            if questions and questions[0].pk is None:
+                QuestionImportService._assign_pks(questions)
+
+            Through = Question.topics.through
+            Through.objects.bulk_create([
+                Through(question_id=question.pk, topic_id=topic.id)
+                for question, row in zip(questions, rows) for topic in row['topics']
+            ], batch_size=QuestionImportService.BATCH_SIZE)
+            QuestionApproval.objects.bulk_create(
+                [QuestionApproval(question_id=question.pk) for question in questions],
+                batch_size=QuestionImportService.BATCH_SIZE
+            )
+
+            question_ids = [question.pk for question in questions]
+            QuestionIndexService.schedule_reindex(question_ids)
+            DuplicateIndexService.schedule_reindex(question_ids)
+            QuestionPoolService.invalidate({topic.id for row in rows for topic in row['topics']})
+            CacheService.bump_on_commit('question_list')
+        return question_ids
+
+    @staticmethod
+    def process_batch(
+        batch: List[Tuple[int, Dict[str, Any]]],
+        topics: Dict[str, Dict],
+        seen: set,
+        user_id: int,
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """Validate and insert (row number, record) pairs; returns (ids, row errors)."""
+        valid, errors = [], []
+        for number, record in batch:
+            row, row_errors = QuestionImportService.parse_record(record, topics)
+            if row is not None:
+                key = (row['topics'][0].subject_id, DuplicateIndexService.normalize(row['question_text']))
+                if key in seen:
+                    row, row_errors = None, {'question_text': "Duplicate of an earlier row in this file"}
+                else:
+                    seen.add(key)
+            if row is None:
+                errors.append({'row': number, 'errors': row_errors})
+            else:
+                valid.append((number, row))
+
+        duplicates = DuplicateIndexService.find_duplicates([(row['question_text'], row['topics']) for _, row in valid])
+        rows = []
+        for (number, row), duplicate_id in zip(valid, duplicates):
+            if duplicate_id is not None:
+                errors.append({'row': number, 'errors': {
+                    'question_text': f"Too similar to existing question {duplicate_id}"
+                }})
+            else:
+                rows.append(row)
+        question_ids = QuestionImportService.insert_batch(rows, user_id) if rows else []
+        return question_ids, errors
+
+    @staticmethod
+    def run(job: QuestionImportJob, progress: Optional[Callable[[QuestionImportJob], None]] = None) -> QuestionImportJob:
+        """Process the job's file; per-row errors are collected, the job is saved after every batch.
+
+        Row numbers count records from 1 (the CSV/XLSX header is not a record). The uploaded
+        file is deleted afterwards, including when the import fails.
+        """
+        service = QuestionImportService
+        job.status = JobStatus.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+        topics = service.load_topics()
+        seen: set = set()
+
+        def flush(batch):
+            question_ids, errors = service.process_batch(batch, topics, seen, job.created_by_id)
+            job.processed_rows += len(batch)
+            job.created_count += len(question_ids)
+            job.error_count += len(errors)
+            job.errors.extend(errors[:max(service.MAX_REPORTED_ERRORS - len(job.errors), 0)])
+            job.save(update_fields=['processed_rows', 'created_count', 'error_count', 'errors', 'updated_at'])
+            if progress:
+                progress(job)
+
+        parse_error = None
+        try:
+            with job.file.open('rb') as handle:
+                records = service.iter_records(handle, job.file_format)
+                batch = []
+                while True:
+                    try:
+                        record = next(records)
+                    except StopIteration:
+                        break
+                    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+                        parse_error = e
+                        break
+                    batch.append((job.processed_rows + len(batch) + 1, record if isinstance(record, dict) else {}))
+                    if len(batch) >= service.BATCH_SIZE:
+                        flush(batch)
+                        batch = []
+                if batch:
+                    flush(batch)
+        finally:
+            # The upload holds full answer keys; it is not kept once read, whatever the outcome
+            job.file.delete(save=False)
+            QuestionImportJob.objects.filter(pk=job.pk).update(file='')
+
+        if parse_error is not None:
+            # Batches already committed stay imported; the message says where parsing stopped
+            job.status = JobStatus.FAILED
+            job.message = f"Could not read the file after {job.processed_rows} rows: {str(parse_error)}"
+        else:
+            job.status = JobStatus.COMPLETED
+            job.message = f"Imported {job.created_count} of {job.processed_rows} rows ({job.error_count} rejected)"
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'finished_at', 'updated_at'])
+        logger.info(f"Question import {job.id}: {job.message}")
+        return job
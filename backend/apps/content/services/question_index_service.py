@@ -0,0 +1,195 @@
+# apps/content/services/question_index_service.py
+from typing import Dict, Iterable, List, Optional, Set
+import uuid
+from collections import defaultdict
+from django.db import transaction
+from django_redis import get_redis_connection
+from apps.content.models import Question, QuestionApproval
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionIndexService:
+    """Redis inverted index from question attributes to sets of question ids.
+
+    Every attribute value owns a SET (`qidx:topic:<id>`, `qidx:subject:<id>`,
+    `qidx:difficulty:<E|M|H>`, `qidx:status:<approval status>`,
+    `qidx:creator:<id>`, `qidx:active`), so filter combinations are SINTER
+    calls and single-attribute counts are SCARD. Each question also keeps
+    the set of index keys it belongs to (`qidx:q:<id>`), which turns a
+    re-index into a diff against its previous memberships. The content
+    signals re-index questions after commit; until `rebuild` has run (the
+    `qidx:ready` marker) callers fall back to SQL.
+    """
+
+    PREFIX = "qidx"
+    READY_KEY = "qidx:ready"
+    ACTIVE_KEY = "qidx:active"
+    BATCH_SIZE = 1000
+    # Above this many ids callers filter with the SQL subquery instead of a literal IN list
+    MAX_IN_IDS = 5000
+
+    @staticmethod
+    def get_key(field: str, value) -> str:
+        return f"{QuestionIndexService.PREFIX}:{field}:{value}"
+
+    @staticmethod
+    def _member_key(question_id: int) -> str:
+        return f"{QuestionIndexService.PREFIX}:q:{question_id}"
+
+    @staticmethod
+    def is_ready() -> bool:
+        return bool(get_redis_connection('default').exists(QuestionIndexService.READY_KEY))
+
+    @staticmethod
+    def compute_keys(question_ids: Iterable[int]) -> Dict[int, Set[str]]:
+        """Return the index keys each existing question belongs to (three queries)."""
+        key = QuestionIndexService.get_key
+        question_ids = list(question_ids)
+        memberships: Dict[int, Set[str]] = {}
+        for question_id, difficulty, creator_id, is_active in Question.objects.filter(
+            id__in=question_ids
+        ).values_list('id', 'difficulty', 'created_by_id', 'is_active'):
+            keys = {key('difficulty', difficulty)}
+            if creator_id:
+                keys.add(key('creator', creator_id))
+            if is_active:
+                keys.add(QuestionIndexService.ACTIVE_KEY)
+            memberships[question_id] = keys
+        for question_id, topic_id, subject_id in Question.topics.through.objects.filter(
+            question_id__in=question_ids
+        ).values_list('question_id', 'topic_id', 'topic__subject_id'):
+            memberships[question_id] |= {key('topic', topic_id), key('subject', subject_id)}
+        for question_id, status in QuestionApproval.objects.filter(
+            question_id__in=question_ids
+        ).values_list('question_id', 'status'):
+            memberships[question_id].add(key('status', status))
+        return memberships
+
+    @staticmethod
+    def reindex(question_ids: Iterable[int]) -> int:
+        """Bring the index entries of `question_ids` in line with the database.
+
+        Questions that no longer exist are removed from every set.
+        """
+        question_ids = list(set(question_ids))
+        if not question_ids:
+            return 0
+        redis = get_redis_connection('default')
+        current = QuestionIndexService.compute_keys(question_ids)
+        pipe = redis.pipeline()
+        for question_id in question_ids:
+            pipe.smembers(QuestionIndexService._member_key(question_id))
+        previous = pipe.execute()
+
+        pipe = redis.pipeline(transaction=True)
+        for question_id, old in zip(question_ids, previous):
+            old = {k.decode() for k in old}
+            new = current.get(question_id, set())
+            for k in old - new:
+                pipe.srem(k, question_id)
+            for k in new - old:
+                pipe.sadd(k, question_id)
+            member_key = QuestionIndexService._member_key(question_id)
+            pipe.delete(member_key)
+            if new:
+                pipe.sadd(member_key, *new)
+        pipe.execute()
+        return len(question_ids)
+
+    @staticmethod
+    def schedule_reindex(question_ids: Iterable[int]) -> None:
+        """Re-index after the surrounding transaction commits, so committed rows are read."""
+        question_ids = list(question_ids)
+        if question_ids:
+            transaction.on_commit(lambda: QuestionIndexService.reindex(question_ids))
+
+    @staticmethod
+    def rebuild() -> int:
+        """Drop and rebuild the whole index from the database."""
+        redis = get_redis_connection('default')
+        redis.delete(QuestionIndexService.READY_KEY)
+        stale = list(redis.scan_iter(match=f"{QuestionIndexService.PREFIX}:*", count=QuestionIndexService.BATCH_SIZE))
+        for i in range(0, len(stale), QuestionIndexService.BATCH_SIZE):
+            redis.delete(*stale[i:i + QuestionIndexService.BATCH_SIZE])
+
+        question_ids = list(Question.objects.order_by('id').values_list('id', flat=True))
+        for i in range(0, len(question_ids), QuestionIndexService.BATCH_SIZE):
+            batch = question_ids[i:i + QuestionIndexService.BATCH_SIZE]
+            sets: Dict[str, List[int]] = defaultdict(list)
+            pipe = redis.pipeline()
+            for question_id, keys in QuestionIndexService.compute_keys(batch).items():
+                pipe.sadd(QuestionIndexService._member_key(question_id), *keys)
+                for k in keys:
+                    sets[k].append(question_id)
+            for k, ids in sets.items():
+                pipe.sadd(k, *ids)
+            pipe.execute()
+        redis.set(QuestionIndexService.READY_KEY, 1)
+        logger.info(f"Rebuilt question index for {len(question_ids)} questions")
+        return len(question_ids)
+
+    @staticmethod
+    def _keys_for(
+        subject_id: Optional[int] = None,
+        difficulty: Optional[str] = None,
+        status: Optional[str] = None,
+        creator_id: Optional[int] = None,
+        active: Optional[bool] = None,
+    ) -> List[str]:
+        key = QuestionIndexService.get_key
+        keys = []
+        if subject_id is not None:
+            keys.append(key('subject', subject_id))
+        if difficulty:
+            keys.append(key('difficulty', difficulty))
+        if status:
+            keys.append(key('status', status))
+        if creator_id is not None:
+            keys.append(key('creator', creator_id))
+        if active:
+            keys.append(QuestionIndexService.ACTIVE_KEY)
+        return keys
+
+    @staticmethod
+    def query(topic_ids: Optional[Iterable[int]] = None, **filters) -> Optional[Set[int]]:
+        """Ids of questions matching every filter (any of `topic_ids`).
+
+        Filters: `subject_id`, `difficulty`, `status`, `creator_id`, `active`.
+        Returns None when the index is not built, so the caller can use SQL.
+        Callers should also use SQL when more than MAX_IN_IDS ids come back.
+        """
+        redis = get_redis_connection('default')
+        if not redis.exists(QuestionIndexService.READY_KEY):
+            return None
+        keys = QuestionIndexService._keys_for(**filters)
+        topic_ids = list(topic_ids or [])
+        if not keys and not topic_ids:
+            raise ValueError("At least one filter is required")
+
+        if len(topic_ids) > 1:
+            # Union the topics server-side into a scratch key, intersect, then drop it
+            scratch = f"{QuestionIndexService.PREFIX}:tmp:{uuid.uuid4().hex}"
+            pipe = redis.pipeline()
+            pipe.sunionstore(scratch, [QuestionIndexService.get_key('topic', t) for t in topic_ids])
+            pipe.sinter([scratch] + keys)
+            pipe.delete(scratch)
+            members = pipe.execute()[1]
+        else:
+            keys += [QuestionIndexService.get_key('topic', t) for t in topic_ids]
+            members = redis.sinter(keys) if len(keys) > 1 else redis.smembers(keys[0])
+        return {int(m) for m in members}
+
+    @staticmethod
+    def count(topic_ids: Optional[Iterable[int]] = None, **filters) -> Optional[int]:
+        """Number of matching questions; a single SCARD for one-attribute filters."""
+        keys = QuestionIndexService._keys_for(**filters)
+        topic_ids = list(topic_ids or [])
+        if len(keys) + len(topic_ids) == 1:
+            redis = get_redis_connection('default')
+            if not redis.exists(QuestionIndexService.READY_KEY):
+                return None
+            return redis.scard(keys[0] if keys else QuestionIndexService.get_key('topic', topic_ids[0]))
+        ids = QuestionIndexService.query(topic_ids, **filters)
+        return None if ids is None else len(ids)
@@ -0,0 +1,214 @@
+# apps/content/services/question_pool_service.py
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import random
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import transaction
+from apps.content.models import Question
+from apps.content.services.question_index_service import QuestionIndexService
+import logging
+
+logger = logging.getLogger(__name__)
+
+Stratum = Tuple[int, str]
+
+
+class QuestionPoolService:
+    """Random question selection from cached (topic, difficulty) id pools.
+
+    Each pool is the list of active question ids for one topic and one
+    difficulty, cached under `question_pool:<topic_id>:<difficulty>`. A
+    calibrated question is pooled under the band of its IRT difficulty
+    (QuestionStats), any other under its authored Question.difficulty. A test
+    build reads all pools it needs with one `get_many`, splits the requested
+    count across the strata by weight and samples each pool uniformly in
+    memory, so neither `ORDER BY RAND()` nor a scan of the question bank is
+    needed. Pools are dropped when a question or its topics change and are
+    rebuilt lazily from the Redis attribute index, or with a single query
+    while the index is not built.
+    """
+
+    KEY_PREFIX = "question_pool"
+    POOL_TIMEOUT = 86400
+    DIFFICULTIES = ('E', 'M', 'H')
+    DIFFICULTY_NAMES = {'Easy': 'E', 'Medium': 'M', 'Hard': 'H'}
+    DEFAULT_COUNT = 5
+    MAX_COUNT = 100
+
+    @staticmethod
+    def get_key(topic_id: int, difficulty: str) -> str:
+        return f"{QuestionPoolService.KEY_PREFIX}:{topic_id}:{difficulty}"
+
+    @staticmethod
+    def get_pools(topic_ids: Iterable[int], difficulties: Iterable[str]) -> Dict[Stratum, List[int]]:
+        """Return {(topic_id, difficulty): [question ids]}, filling cache misses with two queries."""
+        strata = [(topic_id, difficulty) for topic_id in topic_ids for difficulty in difficulties]
+        keys = {QuestionPoolService.get_key(*stratum): stratum for stratum in strata}
+        cached = cache.get_many(list(keys))
+        pools = {keys[key]: ids for key, ids in cached.items()}
+
+        # A calibrated question can change stratum, so a topic's pools are built together
+        missing = [
+            (topic_id, difficulty)
+            for topic_id in {stratum[0] for stratum in strata if stratum not in pools}
+            for difficulty in QuestionPoolService.DIFFICULTIES
+        ]
+        if missing:
+            built = QuestionPoolService._build_from_index(missing)
+            if built is None:
+                built = {stratum: [] for stratum in missing}
+                rows = Question.topics.through.objects.filter(
+                    topic_id__in={topic_id for topic_id, _ in missing},
+                    question__is_active=True,
+                ).values_list('topic_id', 'question__difficulty', 'question_id').order_by('question_id')
+                for topic_id, difficulty, question_id in rows:
+                    if (topic_id, difficulty) in built:
+                        built[(topic_id, difficulty)].append(question_id)
+            built = QuestionPoolService._apply_bands(built)
+            cache.set_many(
+                {QuestionPoolService.get_key(*stratum): ids for stratum, ids in built.items()},
+                timeout=QuestionPoolService.POOL_TIMEOUT
+            )
+            pools.update((stratum, built[stratum]) for stratum in strata if stratum not in pools)
+            logger.debug(f"Built {len(missing)} question pools")
+        return pools
+
+    @staticmethod
+    def _build_from_index(strata: List[Stratum]) -> Optional[Dict[Stratum, List[int]]]:
+        """Pools as SINTERs of the Redis attribute index, or None when it is not built."""
+        if not QuestionIndexService.is_ready():
+            return None
+        return {
+            (topic_id, difficulty): sorted(
+                QuestionIndexService.query([topic_id], difficulty=difficulty, active=True) or ()
+            )
+            for topic_id, difficulty in strata
+        }
+
+    @staticmethod
+    def _apply_bands(pools: Dict[Stratum, List[int]]) -> Dict[Stratum, List[int]]:
+        """Move calibrated questions into the stratum of their IRT difficulty band.
+
+        Questions without a calibration stay under their authored difficulty.
+        """
+        from apps.analytics.models import QuestionStats
+        from apps.analytics.services.calibration_service import CalibrationService
+        question_ids = {q for ids in pools.values() for q in ids}
+        bands = {
+            question_id: CalibrationService.difficulty_band(difficulty)
+            for question_id, difficulty in QuestionStats.objects.filter(
+                question_id__in=question_ids, irt_difficulty__isnull=False
+            ).values_list('question_id', 'irt_difficulty')
+        } if question_ids else {}
+        if not bands:
+            return pools
+        banded = {stratum: [] for stratum in pools}
+        for (topic_id, difficulty), ids in pools.items():
+            for question_id in ids:
+                banded[(topic_id, bands.get(question_id, difficulty))].append(question_id)
+        return {stratum: sorted(ids) for stratum, ids in banded.items()}
+
+    @staticmethod
+    def invalidate(topic_ids: Iterable[int]) -> None:
+        """Drop the pools of `topic_ids` once the current transaction commits."""
+        keys = [
+            QuestionPoolService.get_key(topic_id, difficulty)
+            for topic_id in set(topic_ids) for difficulty in QuestionPoolService.DIFFICULTIES
+        ]
+        if keys:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+    @staticmethod
+    def seen_question_ids(student_ids: Iterable[int]) -> Set[int]:
+        """Questions of every test the given students have attempted."""
+        from apps.examination.models import Test
+        return set(Test.questions.through.objects.filter(
+            test__attempts__student_id__in=list(student_ids)
+        ).values_list('question_id', flat=True).distinct())
+
+    @staticmethod
+    def allocate(weights: Mapping[Stratum, float], capacity: Mapping[Stratum, int], count: int) -> Dict[Stratum, int]:
+        """Split `count` across strata in proportion to `weights` (largest remainder).
+
+        A stratum never gets more than its capacity; the shortfall is spread
+        over the strata that still have questions left.
+        """
+        allocation = {stratum: 0 for stratum in weights}
+        remaining = count
+        active = [s for s in weights if weights[s] > 0 and capacity.get(s, 0) > 0]
+        while remaining > 0 and active:
+            total = sum(weights[s] for s in active)
+            quotas = {s: remaining * weights[s] / total for s in active}
+            given = {s: min(int(quotas[s]), capacity[s] - allocation[s]) for s in active}
+            leftover = remaining - sum(given.values())
+            for s in sorted(active, key=lambda s: quotas[s] - int(quotas[s]), reverse=True):
+                if leftover == 0:
+                    break
+                if given[s] < capacity[s] - allocation[s]:
+                    given[s] += 1
+                    leftover -= 1
+            handed_out = sum(given.values())
+            if not handed_out:
+                break
+            for s, k in given.items():
+                allocation[s] += k
+            remaining -= handed_out
+            active = [s for s in active if allocation[s] < capacity[s]]
+        return allocation
+
+    @staticmethod
+    def select(
+        topic_weights: Mapping[int, float],
+        difficulty_mix: Optional[Mapping[str, float]] = None,
+        count: int = DEFAULT_COUNT,
+        exclude: Iterable[int] = (),
+        rng: Optional[random.Random] = None
+    ) -> List[int]:
+        """Draw `count` distinct question ids.
+
+        Args:
+            topic_weights: {topic_id: weight}; weights need not sum to 1.
+            difficulty_mix: {'E'|'M'|'H': weight}; when omitted each topic's
+                difficulties are weighted by their pool sizes, which is a
+                uniform draw over the topic.
+            count: Number of questions to draw.
+            exclude: Question ids that must not be drawn (e.g. already seen).
+            rng: Random generator, for reproducible draws.
+
+        Raises:
+            ValueError: If fewer than `count` questions are eligible.
+        """
+        rng = rng or random.SystemRandom()
+        exclude = set(exclude)
+        difficulties = [d for d in QuestionPoolService.DIFFICULTIES if not difficulty_mix or difficulty_mix.get(d, 0) > 0]
+        pools = QuestionPoolService.get_pools(topic_weights, difficulties)
+        candidates = {stratum: [q for q in ids if q not in exclude] for stratum, ids in pools.items()}
+
+        topic_sizes = defaultdict(int)
+        for (topic_id, _), ids in candidates.items():
+            topic_sizes[topic_id] += len(ids)
+        weights = {}
+        for (topic_id, difficulty), ids in candidates.items():
+            if difficulty_mix:
+                share = difficulty_mix[difficulty]
+            else:
+                share = len(ids) / topic_sizes[topic_id] if topic_sizes[topic_id] else 0
+            weights[(topic_id, difficulty)] = topic_weights[topic_id] * share
+
+        available = len({q for ids in candidates.values() for q in ids})
+        if available < count:
+            raise ValueError(f"Need {count} questions, found {available}")
+
+        allocation = QuestionPoolService.allocate(weights, {s: len(ids) for s, ids in candidates.items()}, count)
+        chosen: List[int] = []
+        taken: Set[int] = set()
+        for stratum, k in allocation.items():
+            # a question tagged with several topics may already have been drawn
+            ids = [q for q in candidates[stratum] if q not in taken]
+            for question_id in rng.sample(ids, min(k, len(ids))):
+                chosen.append(question_id)
+                taken.add(question_id)
+        if len(chosen) < count:
+            rest = sorted({q for ids in candidates.values() for q in ids} - taken)
+            chosen.extend(rng.sample(rest, count - len(chosen)))
+        return chosen
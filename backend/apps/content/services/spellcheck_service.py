@@ -0,0 +1,85 @@
+# apps/content/services/spellcheck_service.py
+from typing import Iterable, List, Optional
+import re
+import string
+import threading
+from functools import lru_cache
+from django_redis import get_redis_connection
+from spellchecker import SpellChecker
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SpellCheckService:
+    """Typo detection for question text with a shared dictionary.
+
+    The pyspellchecker frequency dictionary is loaded once per process, on
+    first use, and dictionary lookups are memoized in an LRU. Subject-specific
+    terms the dictionary lacks live in one Redis SET (`spellcheck:vocabulary`),
+    so every worker sees the same vocabulary; a validation checks all its
+    unknown words with a single SMISMEMBER and the set is grown with SADD.
+    """
+
+    VOCABULARY_KEY = "spellcheck:vocabulary"
+    MIN_WORD_LENGTH = 4  # shorter words are never reported
+    LRU_SIZE = 50000
+    BATCH_SIZE = 1000
+
+    _checker: Optional[SpellChecker] = None
+    _lock = threading.Lock()
+    _punctuation = str.maketrans('', '', string.punctuation)
+
+    @classmethod
+    def get_checker(cls) -> SpellChecker:
+        if cls._checker is None:
+            with cls._lock:
+                if cls._checker is None:
+                    cls._checker = SpellChecker()
+                    logger.info("Loaded spell-check dictionary")
+        return cls._checker
+
+    @staticmethod
+    @lru_cache(maxsize=LRU_SIZE)
+    def in_dictionary(word: str) -> bool:
+        return word in SpellCheckService.get_checker()
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return text.translate(SpellCheckService._punctuation).split()
+
+    @staticmethod
+    def find_typos(text: str) -> List[str]:
+        """Words of `text` found neither in the dictionary nor in the domain vocabulary."""
+        unknown = [
+            word for word in SpellCheckService.tokenize(text)
+            if len(word) >= SpellCheckService.MIN_WORD_LENGTH and not word.isdigit()
+            and not SpellCheckService.in_dictionary(word.lower())
+        ]
+        if not unknown:
+            return []
+        known = get_redis_connection('default').smismember(
+            SpellCheckService.VOCABULARY_KEY, [word.lower() for word in unknown]
+        )
+        return [word for word, is_known in zip(unknown, known) if not is_known]
+
+    @staticmethod
+    def add_vocabulary(words: Iterable[str]) -> int:
+        """Add words (lowercased, letters only) to the shared vocabulary; returns how many were new."""
+        words = {word.lower() for word in words if re.fullmatch(r'[A-Za-z][A-Za-z\-]*', word)}
+        words = list(words)
+        if not words:
+            return 0
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline()
+        for i in range(0, len(words), SpellCheckService.BATCH_SIZE):
+            pipe.sadd(SpellCheckService.VOCABULARY_KEY, *words[i:i + SpellCheckService.BATCH_SIZE])
+        return sum(pipe.execute())
+
+    @staticmethod
+    def add_text(text: str) -> int:
+        """Add the words of `text` the dictionary does not know."""
+        return SpellCheckService.add_vocabulary(
+            word for word in SpellCheckService.tokenize(text)
+            if not SpellCheckService.in_dictionary(word.lower())
+        )
@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from .models import Subject, Topic, Question, QuestionApproval
 from django.core.cache import cache
+from apps.common.services.cache_service import CacheService
+from .services.question_pool_service import QuestionPoolService
+from .services.question_index_service import QuestionIndexService
+from .services.duplicate_index_service import DuplicateIndexService
+from .services.spellcheck_service import SpellCheckService
 
 import logging
 logger = logging.getLogger(__name__)
@@ -14,20 +19,85 @@ logger = logging.getLogger(__name__)
 @receiver(post_delete, sender=Question)
 def invalidate_question_cache(sender, instance, **kwargs):
     """Invalidate question list cache on save/delete."""
-    cache.delete_pattern(f"question_list:{instance.created_by.id}:*")
-    logger.debug(f"Invalidated question cache for user {instance.created_by.id}")
+    # Teachers list the whole bank, so every cached list page is affected
+    CacheService.bump_on_commit('question_list')
+    logger.debug(f"Invalidated question list cache for question {instance.id}")
+
+@receiver(m2m_changed, sender=Question.topics.through)
+def invalidate_question_topics_cache(sender, instance, action, **kwargs):
+    """Invalidate question list cache when question topics change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        CacheService.bump_on_commit('question_list')
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def reindex_question(sender, instance, **kwargs):
+    """Sync the question's entries in the attribute and duplicate indexes (removed if deleted)."""
+    QuestionIndexService.schedule_reindex([instance.pk])
+    DuplicateIndexService.schedule_reindex([instance.pk])
 
 @receiver(post_save, sender=QuestionApproval)
+@receiver(post_delete, sender=QuestionApproval)
+def reindex_approved_question(sender, instance, **kwargs):
+    QuestionIndexService.schedule_reindex([instance.question_id])
+
+@receiver(post_save, sender=Topic)
+def reindex_topic_questions(sender, instance, created, **kwargs):
+    """A topic moved to another subject changes the subject sets of its questions."""
+    if not created:
+        question_ids = list(instance.questions.values_list('id', flat=True))
+        QuestionIndexService.schedule_reindex(question_ids)
+        DuplicateIndexService.schedule_reindex(question_ids)
+
+@receiver(m2m_changed, sender=Question.topics.through)
+def reindex_question_topics(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        question_ids = [instance.pk]
+    elif action == 'pre_clear':
+        question_ids = list(instance.questions.values_list('id', flat=True))
+    else:
+        question_ids = list(pk_set or [])
+    # Topics decide the subjects a question's duplicate buckets live under
+    QuestionIndexService.schedule_reindex(question_ids)
+    DuplicateIndexService.schedule_reindex(question_ids)
+
+@receiver(post_save, sender=Question)
+@receiver(pre_delete, sender=Question)
+def invalidate_question_pools(sender, instance, **kwargs):
+    """Drop the selection pools of the question's topics (its difficulty or status may have changed)."""
+    topic_ids = list(instance.topics.values_list('id', flat=True)) if instance.pk else []
+    QuestionPoolService.invalidate(topic_ids)
+
+@receiver(m2m_changed, sender=Question.topics.through)
+def invalidate_topic_pools(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the selection pools of topics gaining or losing questions."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        topic_ids = [instance.pk]
+    elif action == 'pre_clear':
+        topic_ids = list(instance.topics.values_list('id', flat=True))
+    else:
+        topic_ids = pk_set or []
+    QuestionPoolService.invalidate(topic_ids)
+    logger.debug(f"Invalidated question pools for topics {list(topic_ids)}")
+
+@receiver(post_save, sender=QuestionApproval)
+@receiver(post_delete, sender=QuestionApproval)
 def invalidate_approval_cache(sender, instance, **kwargs):
     """Invalidate question list cache on approval change."""
-    cache.delete_pattern(f"question_list:{instance.question.created_by.id}:*")
-    logger.debug(f"Invalidated approval cache for user {instance.question.created_by.id}")
+    CacheService.bump_on_commit('question_list')
+    logger.debug(f"Invalidated question list cache for approval of question {instance.question_id}")
 
 @receiver(post_save, sender=Subject)
 @receiver(post_delete, sender=Subject)
 def invalidate_subject_cache(sender, instance, **kwargs):
     """Invalidate subject cache on save/delete."""
     cache.delete('subjects_all')
+    CacheService.bump_on_commit('subject_topic_context')
+    CacheService.bump_on_commit('question_list')
     logger.debug("Invalidated subject cache")
 
 @receiver(post_save, sender=Topic)
@@ -35,8 +105,22 @@ def invalidate_subject_cache(sender, instance, **kwargs):
 def invalidate_topic_cache(sender, instance, **kwargs):
     """Invalidate topic cache on save/delete."""
     cache.delete('topics_all')
+    CacheService.bump_on_commit('subject_topic_context')
+    CacheService.bump_on_commit('question_list')
     logger.debug("Invalidated topic cache")
 
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Topic)
+def learn_name_vocabulary(sender, instance, **kwargs):
+    """Subject and topic names are domain terms the spell check should accept."""
+    SpellCheckService.add_text(instance.name)
+
+@receiver(post_save, sender=QuestionApproval)
+def learn_approved_vocabulary(sender, instance, **kwargs):
+    """Terms in approved questions were reviewed, so they stop being reported as typos."""
+    if instance.status == 'APPROVED':
+        SpellCheckService.add_text(instance.question.question_text)
+
 @receiver(post_save, sender=Subject)
 def log_subject_save(sender, instance, created, **kwargs):
     action = "created" if created else "updated"
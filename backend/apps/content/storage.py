@@ -0,0 +1,35 @@
+# apps/content/storage.py
+import os
+import uuid
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+
+class ImportStorage(FileSystemStorage):
+    """Uploaded question banks, kept under settings.IMPORT_ROOT rather than MEDIA_ROOT.
+
+    The files carry full answer keys, so they get no URL and are deleted once
+    the import has read them.
+    """
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'IMPORT_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.IMPORT_ROOT)
+
+    def url(self, name):
+        raise ValueError("Question import uploads are not served")
+
+
+import_storage = ImportStorage()
+
+
+def import_upload_path(instance, filename):
+    """Store each upload under a random name; only the extension of the original is kept."""
+    return f"questions/{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}"
@@ -2,7 +2,10 @@ from celery import shared_task
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from apps.content.models import Question, QuestionApproval
+from apps.content.models import Question, QuestionApproval, QuestionImportJob, JobStatus
+from apps.content.services.question_index_service import QuestionIndexService
+from apps.content.services.import_service import QuestionImportService
+from apps.notifications.models import Notification
 from apps.accounts.models import User, ApprovalRequest
 from apps.common.choices.role import Role
 from apps.common.services.email_service import EmailService
@@ -121,6 +124,53 @@ def send_approval_request_notification(approval_request_id):
     except Exception as e:
         logger.error(f"Failed to send approval request email for ApprovalRequest ID {approval_request_id}: {str(e)}")
 
+@shared_task
+def rebuild_question_index():
+    """Rebuild the Redis question attribute index, repairing any drift from missed signals."""
+    logger.info("Starting question index rebuild")
+    try:
+        count = QuestionIndexService.rebuild()
+        logger.info(f"Question index rebuilt for {count} questions")
+        return count
+    except Exception as e:
+        logger.error(f"Error in rebuild_question_index: {str(e)}")
+        raise
+
+@shared_task(bind=True)
+def import_questions(self, job_id):
+    """Run a bulk question import, reporting progress through the job row and the task state."""
+    logger.info(f"Starting import_questions for job {job_id}")
+    try:
+        job = QuestionImportJob.objects.get(pk=job_id)
+    except QuestionImportJob.DoesNotExist:
+        logger.warning(f"No QuestionImportJob found for job {job_id}")
+        return None
+
+    def report(job):
+        if not self.request.id:
+            return
+        self.update_state(state='PROGRESS', meta={
+            'processed_rows': job.processed_rows,
+            'created_count': job.created_count,
+            'error_count': job.error_count,
+        })
+
+    try:
+        job = QuestionImportService.run(job, progress=report)
+    except Exception as e:
+        logger.error(f"Error in import_questions for job {job_id}: {str(e)}")
+        QuestionImportJob.objects.filter(pk=job_id).update(
+            status=JobStatus.FAILED, message=f"Import failed: {str(e)}", finished_at=timezone.now()
+        )
+        raise
+
+    Notification.objects.create(
+        user_id=job.created_by_id,
+        message=f"Question import {job.id} finished: {job.message}",
+        notification_type=Notification.NotificationType.GENERAL
+    )
+    return job.created_count
+
 # from celery import shared_task
 # from django.core.mail import send_mail
 # from django.utils import timezone
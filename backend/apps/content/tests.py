@@ -1,3 +1,450 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+from unittest import mock
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django_redis import get_redis_connection
+from django.utils import timezone
+from apps.accounts.models import User
+from apps.common.choices.role import Role
+from apps.common.testing import delete_redis_keys
+from apps.examination.models import Test, TestAttempt
+from apps.examination.serializers import TestSerializer
+from .models import Subject, Topic, Question, QuestionApproval, QuestionImportJob, JobStatus
+from .services.duplicate_index_service import DuplicateIndexService
+from .services.import_service import QuestionImportService
+from .services.question_index_service import QuestionIndexService
+from .services.question_pool_service import QuestionPoolService
+from .services.spellcheck_service import SpellCheckService
+from .utils.validations import validate_question_text
+from .tasks import import_questions
+from .views import QuestionFilter
 
-# Create your tests here.
+
+class QuestionPoolServiceTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        self.subject = Subject.objects.create(name='Physics')
+        self.motion = Topic.objects.create(subject=self.subject, name='Motion')
+        self.waves = Topic.objects.create(subject=self.subject, name='Waves')
+        self.questions = {}
+        for topic in (self.motion, self.waves):
+            for i, difficulty in enumerate('EEEEMMMMHH'):
+                question = Question.objects.create(
+                    question_text=f'{topic.name} question {i}', difficulty=difficulty,
+                    options={'A': 'one', 'B': 'two', 'C': 'three', 'D': 'four'},
+                    correct_answer='A', created_by=self.teacher,
+                )
+                question.topics.add(topic)
+                self.questions.setdefault((topic.id, difficulty), []).append(question.id)
+
+    def tearDown(self):
+        # the cache's Redis DB is shared with the app: drop only the pools built here
+        cache.delete_many([
+            QuestionPoolService.get_key(topic_id, difficulty)
+            for topic_id in (self.motion.id, self.waves.id) for difficulty in QuestionPoolService.DIFFICULTIES
+        ])
+
+    def test_allocate_respects_weights_and_capacity(self):
+        weights = {(1, 'E'): 3, (1, 'M'): 1, (2, 'E'): 0}
+        self.assertEqual(
+            QuestionPoolService.allocate(weights, {(1, 'E'): 10, (1, 'M'): 10, (2, 'E'): 10}, 8),
+            {(1, 'E'): 6, (1, 'M'): 2, (2, 'E'): 0}
+        )
+        # the short stratum gives its share to the others
+        self.assertEqual(
+            QuestionPoolService.allocate(weights, {(1, 'E'): 2, (1, 'M'): 10, (2, 'E'): 10}, 8),
+            {(1, 'E'): 2, (1, 'M'): 6, (2, 'E'): 0}
+        )
+
+    def test_select_uses_cached_pools(self):
+        QuestionPoolService.get_pools([self.motion.id, self.waves.id], QuestionPoolService.DIFFICULTIES)
+        with self.assertNumQueries(0):
+            chosen = QuestionPoolService.select(
+                {self.motion.id: 1, self.waves.id: 1}, {'E': 1, 'H': 1}, count=8, rng=random.Random(3)
+            )
+        self.assertEqual(len(set(chosen)), 8)
+        by_stratum = {s: len(set(chosen) & set(ids)) for s, ids in self.questions.items()}
+        self.assertEqual(by_stratum[(self.motion.id, 'E')] + by_stratum[(self.waves.id, 'E')], 4)
+        self.assertEqual(by_stratum[(self.motion.id, 'H')], 2)
+        self.assertEqual(by_stratum[(self.motion.id, 'M')], 0)
+
+        excluded = self.questions[(self.motion.id, 'H')]
+        chosen = QuestionPoolService.select({self.motion.id: 1}, {'H': 1, 'E': 1}, count=4, exclude=excluded)
+        self.assertFalse(set(chosen) & set(excluded))
+        with self.assertRaises(ValueError):
+            QuestionPoolService.select({self.motion.id: 1}, {'H': 1}, count=1, exclude=excluded)
+
+    def test_pools_refresh_on_question_changes(self):
+        QuestionPoolService.get_pools([self.motion.id], ['H'])
+        question = Question.objects.get(pk=self.questions[(self.motion.id, 'E')][0])
+        with self.captureOnCommitCallbacks(execute=True):
+            question.difficulty = 'H'
+            question.save()
+        self.assertIn(question.id, QuestionPoolService.get_pools([self.motion.id], ['H'])[(self.motion.id, 'H')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.topics.remove(self.motion)
+        self.assertNotIn(question.id, QuestionPoolService.get_pools([self.motion.id], ['H'])[(self.motion.id, 'H')])
+
+    def test_serializer_draws_count_and_skips_seen_questions(self):
+        student = User.objects.create_user(
+            username='student', email='student@example.com', password='Test@1234', role=Role.STUDENT
+        )
+        seen = Test.objects.create(title='Seen', created_by=self.teacher, subject=self.subject,
+                                   scoring_scheme={'correct': 1, 'incorrect': 0})
+        seen.questions.set(self.questions[(self.motion.id, 'E')])
+        TestAttempt.objects.create(student=student, test=seen, start_time=timezone.now())
+
+        serializer = TestSerializer(data={
+            'title': 'Auto', 'subject': self.subject.id, 'duration': 10,
+            'scoring_scheme': {'correct': 1, 'incorrect': 0},
+            'question_filters': {
+                'topic': [self.motion.id], 'count': 4,
+                'difficulty_mix': {'Easy': 1, 'Medium': 1}, 'exclude_seen_by': [student.id],
+            },
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        test = serializer.save(created_by=self.teacher)
+        chosen = set(test.questions.values_list('id', flat=True))
+        # every easy question was seen, so the medium pool covers the whole draw
+        self.assertEqual(chosen, set(self.questions[(self.motion.id, 'M')]))
+
+        serializer = TestSerializer(data={**serializer.initial_data, 'question_filters': {
+            'topic': [self.motion.id], 'count': 5, 'difficulty': 'Hard',
+        }})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Need 5 questions, found 2', str(serializer.errors['question_filters']))
+
+    def test_update_keeps_drawn_questions_until_filters_change(self):
+        data = {
+            'title': 'Auto', 'subject': self.subject.id, 'duration': 10,
+            'scoring_scheme': {'correct': 1, 'incorrect': 0},
+            'question_filters': {'topic': [str(self.motion.id)], 'difficulty_mix': {'Easy': 1, 'Medium': 1}, 'count': 3},
+        }
+        serializer = TestSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        test = serializer.save(created_by=self.teacher)
+        drawn = set(test.questions.values_list('id', flat=True))
+
+        with mock.patch.object(QuestionPoolService, 'select', wraps=QuestionPoolService.select) as select:
+            serializer = TestSerializer(test, data={**data, 'title': 'Renamed'})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+            select.assert_not_called()
+            self.assertEqual(set(test.questions.values_list('id', flat=True)), drawn)
+            self.assertEqual(Test.objects.get(pk=test.pk).title, 'Renamed')
+
+            serializer = TestSerializer(test, data={**data, 'redraw': True})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+            self.assertEqual(select.call_count, 1)
+
+            serializer = TestSerializer(test, data={**data, 'question_filters': {**data['question_filters'], 'count': 2}})
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            serializer.save()
+            self.assertEqual(select.call_count, 2)
+        self.assertEqual(test.questions.count(), 2)
+
+
+class QuestionIndexServiceTest(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        self.physics = Subject.objects.create(name='Physics')
+        self.chemistry = Subject.objects.create(name='Chemistry')
+        self.motion = Topic.objects.create(subject=self.physics, name='Motion')
+        self.waves = Topic.objects.create(subject=self.physics, name='Waves')
+        self.bonds = Topic.objects.create(subject=self.chemistry, name='Bonds')
+        self.questions = {}
+        for topic in (self.motion, self.waves, self.bonds):
+            for i, difficulty in enumerate('EEMH'):
+                question = Question.objects.create(
+                    question_text=f'{topic.name} question {i}', difficulty=difficulty,
+                    options={'A': 'one', 'B': 'two'}, correct_answer='A', created_by=self.teacher,
+                )
+                question.topics.add(topic)
+                self.questions.setdefault((topic.id, difficulty), []).append(question.id)
+
+    def tearDown(self):
+        delete_redis_keys(f'{QuestionIndexService.PREFIX}:*')
+
+    def test_query_intersects_attribute_sets(self):
+        self.assertIsNone(QuestionIndexService.query(difficulty='E'))
+        self.assertEqual(QuestionIndexService.rebuild(), 12)
+
+        self.assertEqual(
+            QuestionIndexService.query([self.motion.id], difficulty='E'),
+            set(self.questions[(self.motion.id, 'E')])
+        )
+        self.assertEqual(
+            QuestionIndexService.query([self.motion.id, self.bonds.id], difficulty='H'),
+            set(self.questions[(self.motion.id, 'H')] + self.questions[(self.bonds.id, 'H')])
+        )
+        self.assertEqual(QuestionIndexService.count(subject_id=self.physics.id), 8)
+        self.assertEqual(QuestionIndexService.count(subject_id=self.chemistry.id, difficulty='E'), 2)
+        self.assertEqual(QuestionIndexService.count(creator_id=self.teacher.id), 12)
+
+    def test_signals_keep_index_in_sync(self):
+        QuestionIndexService.rebuild()
+        question = Question.objects.get(pk=self.questions[(self.motion.id, 'E')][0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.difficulty = 'H'
+            question.save()
+            question.topics.add(self.bonds)
+        self.assertIn(question.id, QuestionIndexService.query([self.bonds.id], difficulty='H'))
+        self.assertNotIn(question.id, QuestionIndexService.query(difficulty='E'))
+        self.assertIn(question.id, QuestionIndexService.query(subject_id=self.chemistry.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            QuestionApproval.objects.update_or_create(question=question, defaults={'status': 'APPROVED'})
+        self.assertEqual(QuestionIndexService.query(status='APPROVED'), {question.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bonds.questions.clear()
+        self.assertEqual(QuestionIndexService.count(topic_ids=[self.bonds.id]), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.delete()
+        self.assertNotIn(question.id, QuestionIndexService.query(subject_id=self.physics.id))
+        redis = get_redis_connection('default')
+        self.assertFalse(redis.exists(QuestionIndexService._member_key(question.id)))
+
+    def test_question_filter_uses_index_and_falls_back_to_sql(self):
+        params = {'subject': str(self.physics.id), 'difficulty': 'E'}
+        expected = set(self.questions[(self.motion.id, 'E')] + self.questions[(self.waves.id, 'E')])
+
+        question_filter = QuestionFilter(Question.objects.all(), params, self.teacher)
+        self.assertEqual(set(question_filter.apply().values_list('id', flat=True)), expected)
+        self.assertIsNone(question_filter.count)
+
+        QuestionIndexService.rebuild()
+        question_filter = QuestionFilter(Question.objects.all(), params, self.teacher)
+        self.assertEqual(set(question_filter.apply().values_list('id', flat=True)), expected)
+        self.assertEqual(question_filter.count, 4)
+
+        # too many ids for an IN list: the subquery runs, the index still gives the count
+        with mock.patch.object(QuestionIndexService, 'MAX_IN_IDS', 3):
+            question_filter = QuestionFilter(Question.objects.all(), params, self.teacher)
+            queryset = question_filter.apply()
+        self.assertTrue(queryset.query.distinct)
+        self.assertEqual(set(queryset.values_list('id', flat=True)), expected)
+        self.assertEqual(question_filter.count, 4)
+
+        with self.assertRaises(ValueError):
+            QuestionFilter(Question.objects.all(), {'topic': 'x'}, self.teacher).apply()
+
+
+class DuplicateIndexServiceTest(TestCase):
+    TEXTS = [
+        'What is the acceleration of a body falling freely near the surface of the earth?',
+        'Which law states that every action has an equal and opposite reaction?',
+        'How does the frequency of a wave change when its wavelength doubles?',
+        'What is the SI unit of electric charge and how is it defined?',
+    ]
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        self.physics = Subject.objects.create(name='Physics')
+        self.chemistry = Subject.objects.create(name='Chemistry')
+        self.motion = Topic.objects.create(subject=self.physics, name='Motion')
+        self.bonds = Topic.objects.create(subject=self.chemistry, name='Bonds')
+        self.questions = [self.create_question(text, self.motion) for text in self.TEXTS]
+
+    def tearDown(self):
+        delete_redis_keys(f'{DuplicateIndexService.PREFIX}:*')
+
+    def create_question(self, text, topic):
+        question = Question.objects.create(
+            question_text=text, difficulty='E', options={'A': 'one', 'B': 'two'},
+            correct_answer='A', created_by=self.teacher,
+        )
+        question.topics.add(topic)
+        return question
+
+    def test_finds_near_duplicates_from_candidates_only(self):
+        near = 'What is the acceleration of a body falling freely near the surface of earth?'
+        self.assertEqual(DuplicateIndexService.find_duplicate(near, [self.motion]), self.questions[0].id)
+
+        self.assertEqual(DuplicateIndexService.rebuild(), 4)
+        self.assertEqual(DuplicateIndexService.candidates(near, [self.physics.id])[0], self.questions[0].id)
+        with self.assertNumQueries(1):
+            self.assertEqual(DuplicateIndexService.find_duplicate(near, [self.motion]), self.questions[0].id)
+        self.assertIsNone(DuplicateIndexService.find_duplicate(
+            'Name the noble gas with the smallest atomic radius in the periodic table.', [self.motion]
+        ))
+        self.assertIsNone(DuplicateIndexService.find_duplicate(self.TEXTS[0], [self.motion], self.questions[0].id))
+        # buckets are per subject
+        self.assertEqual(DuplicateIndexService.candidates(near, [self.chemistry.id]), [])
+
+    def test_signals_update_buckets(self):
+        DuplicateIndexService.rebuild()
+        text = 'Which element has the highest electronegativity in the periodic table?'
+        with self.captureOnCommitCallbacks(execute=True):
+            question = self.create_question(text, self.bonds)
+        self.assertEqual(DuplicateIndexService.find_duplicate(text.lower(), [self.bonds]), question.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.question_text = 'Describe the shape of a water molecule and explain why it is bent.'
+            question.save()
+        self.assertIsNone(DuplicateIndexService.find_duplicate(text, [self.bonds]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.delete()
+        self.assertEqual(DuplicateIndexService.candidates(question.question_text, [self.chemistry.id]), [])
+
+
+class SpellCheckServiceTest(TestCase):
+    ADDED_WORDS = ['hexokinase', 'phosphorylates', 'glycogenolysis', 'biochemistry']
+
+    def tearDown(self):
+        # the vocabulary set is shared with the app: remove only the words added here
+        get_redis_connection('default').srem(SpellCheckService.VOCABULARY_KEY, *self.ADDED_WORDS)
+
+    def test_vocabulary_is_shared_through_redis(self):
+        text = 'Explain how a glycolysis enzyme like hexokinase phosphorylates glucose.'
+        self.assertIs(SpellCheckService.get_checker(), SpellCheckService.get_checker())
+        self.assertEqual(SpellCheckService.find_typos(text), ['hexokinase', 'phosphorylates'])
+        with self.assertRaises(ValidationError):
+            validate_question_text(text)
+
+        SpellCheckService.add_vocabulary(['Hexokinase', 'phosphorylates'])
+        with self.assertNumQueries(0):
+            self.assertEqual(SpellCheckService.find_typos(text), [])
+        self.assertEqual(validate_question_text(text), text)
+
+    def test_topic_names_join_the_vocabulary(self):
+        subject = Subject.objects.create(name='Biochemistry')
+        Topic.objects.create(subject=subject, name='Glycogenolysis')
+        self.assertEqual(SpellCheckService.find_typos('Describe glycogenolysis in the liver.'), [])
+
+
+class QuestionImportServiceTest(TestCase):
+    CSV = (
+        'question_text,difficulty,option_a,option_b,option_c,option_d,correct_answer,subject,topics\n'
+        'What is the unit of force in the SI system?,Easy,Newton,Joule,Watt,Pascal,A,Physics,Motion\n'
+        'Which quantity is conserved in an elastic collision?,M,Mass only,Kinetic energy,Heat,Charge,B,Physics,Motion;Waves\n'
+        'What travels faster than light in a vacuum?,Impossible,Sound,Nothing,Water,Air,B,Physics,Motion\n'
+        'What carries energy in a transverse wave?,H,Crest,Trough,Oscillation,Medium,C,Physics,Optics\n'
+        'What is the unit of force in the SI system?,E,Newton,Joule,Watt,Pascal,A,Physics,Motion\n'
+        'What is the acceleration of a body falling freely near the surface of earth?,E,9.8,10,8,12,A,Physics,Motion\n'
+    )
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.imports = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, IMPORT_ROOT=self.imports.name)
+        self.settings_override.enable()
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER, is_verified=True
+        )
+        self.subject = Subject.objects.create(name='Physics')
+        self.motion = Topic.objects.create(subject=self.subject, name='Motion')
+        self.waves = Topic.objects.create(subject=self.subject, name='Waves')
+        existing = Question.objects.create(
+            question_text='What is the acceleration of a body falling freely near the surface of the earth?',
+            difficulty='E', options={'A': 'a', 'B': 'b', 'C': 'c', 'D': 'd'}, correct_answer='A',
+            created_by=self.teacher,
+        )
+        existing.topics.add(self.motion)
+        QuestionIndexService.rebuild()
+        DuplicateIndexService.rebuild()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+        self.imports.cleanup()
+        delete_redis_keys(f'{QuestionIndexService.PREFIX}:*', f'{DuplicateIndexService.PREFIX}:*')
+
+    def make_job(self, content, file_format):
+        return QuestionImportJob.objects.create(
+            created_by=self.teacher, file_format=file_format, file=ContentFile(content.encode(), name=f'bank.{file_format}')
+        )
+
+    def test_valid_rows_are_imported_and_errors_reported_per_row(self):
+        job = self.make_job(self.CSV, 'csv')
+        with self.captureOnCommitCallbacks(execute=True):
+            import_questions(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.message)
+        self.assertEqual((job.processed_rows, job.created_count, job.error_count), (6, 2, 4))
+        self.assertEqual(
+            {error['row']: list(error['errors']) for error in job.errors},
+            {3: ['difficulty'], 4: ['topics'], 5: ['question_text'], 6: ['question_text']}
+        )
+        imported = Question.objects.filter(created_by=self.teacher, is_active=False)
+        self.assertEqual(imported.count(), 2)
+        self.assertFalse(QuestionApproval.objects.filter(question__in=imported).exclude(status='PENDING').exists())
+        collision = imported.get(difficulty='M')
+        self.assertEqual(set(collision.topics.all()), {self.motion, self.waves})
+        # bulk_create skips signals, so the import refreshes the index itself
+        self.assertIn(collision.id, QuestionIndexService.query([self.waves.id], difficulty='M'))
+        self.assertIn('finished', self.teacher.notifications.get().message)
+
+    def test_pks_are_recovered_when_the_backend_does_not_return_them(self):
+        records = [
+            {'question_text': f'Which vector quantity describes motion number {i} here?', 'difficulty': 'E',
+             'options': {'A': 'a', 'B': 'b', 'C': 'c', 'D': 'd'}, 'correct_answer': 'A', 'topics': [self.motion.id]}
+            for i in range(3)
+        ]
+        job = self.make_job('\n'.join(json.dumps(record) for record in records), 'ndjson')
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock, return_value=False
+        ):
+            QuestionImportService.run(job)
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(Question.topics.through.objects.filter(topic=self.motion).count(), 4)
+        imported = Question.objects.filter(import_key__isnull=False)
+        self.assertEqual(QuestionApproval.objects.filter(question__in=imported).count(), 3)
+
+    def test_upload_is_stored_privately_and_deleted_after_the_run(self):
+        job = self.make_job(self.CSV, 'csv')
+        path = job.file.path
+        self.assertTrue(path.startswith(self.imports.name))
+        self.assertNotIn('bank', os.path.basename(path))
+        self.assertTrue(os.path.exists(path))
+
+        QuestionImportService.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.message)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(job.file)
+
+        failed = self.make_job('{"question_text": ', 'ndjson')
+        failed_path = failed.file.path
+        QuestionImportService.run(failed)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, JobStatus.FAILED)
+        self.assertFalse(os.path.exists(failed_path))
+        self.assertFalse(failed.file)
+
+    def test_upload_queues_job_and_reports_status(self):
+        self.client.force_login(self.teacher)
+        with mock.patch.object(import_questions, 'delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/questions/import/', {
+                'file': ContentFile(self.CSV.encode(), name='bank.csv'),
+            })
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        delay.assert_called_once_with(job_id)
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['status'], JobStatus.PENDING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_questions(job_id)
+        status_data = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((status_data['status'], status_data['created_count']), ('COMPLETED', 2))
+
+        response = self.client.post('/api/questions/import/', {'file': ContentFile(b'x', name='bank.txt')})
+        self.assertEqual(response.status_code, 400)
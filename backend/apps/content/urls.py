@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     
-    QuestionCreateView,QuestionListView,QuestionDeleteView,QuestionUpdateView
+    QuestionCreateView,QuestionListView,QuestionDeleteView,QuestionUpdateView,QuestionImportView
 )
 #SubjectCreateView, SubjectListView, TopicCreateView, TopicListView,
 urlpatterns = [
@@ -10,5 +10,7 @@ urlpatterns = [
     path('questions/create/', QuestionCreateView.as_view(), name='question_create'),
     path('questions/<int:pk>/update/', QuestionUpdateView.as_view(), name='question_update'),
     path('questions/<int:pk>/delete/', QuestionDeleteView.as_view(), name='question_delete'),
+    path('questions/import/', QuestionImportView.as_view(), name='question_import'),
+    path('questions/import/<int:pk>/', QuestionImportView.as_view(), name='question_import_status'),
     
 ]
\ No newline at end of file
@@ -2,10 +2,6 @@ import re
 import logging
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from fuzzywuzzy import fuzz
-from spellchecker import SpellChecker
-from django.core.cache import cache
-import string
 
 
 
@@ -70,19 +66,11 @@ def validate_question_text(value: str) -> str:
             raise ValidationError(_('Question text appears invalid or inappropriate'))
     
     # Typo check
-    spell = SpellChecker()
-    cache_key = "spellchecker_common_words"
-    common_words = cache.get(cache_key, set())
-    words = value.translate(str.maketrans('', '', string.punctuation)).split()
-    typos = [
-        word for word in words
-        if word.lower() not in spell and word not in common_words and not word.isdigit() and len(word) > 3
-    ]
+    from apps.content.services.spellcheck_service import SpellCheckService
+    typos = SpellCheckService.find_typos(value)
     if typos:
         log_validation_error("question_text", value, f"Potential typos: {', '.join(typos)}")
         raise ValidationError(_('Potential typos detected: %(typos)s') % {'typos': ', '.join(typos)})
-    common_words.update(words)
-    cache.set(cache_key, common_words, timeout=86400)  # 24 hours
     
     return value
 
@@ -131,25 +119,11 @@ def validate_topic_subject_consistency(topics):
     return topics
 
 def check_duplicate_question(question_text, topics, instance=None):
-    from apps.content.models import Question
-    """Check for duplicate questions based on text similarity."""
+    """Check for duplicate questions based on text similarity (MinHash/LSH candidates, fuzzy check)."""
+    from apps.content.services.duplicate_index_service import DuplicateIndexService
     if not topics:
         return
-    cache_key = f"question_text_hash:{':'.join(str(t.id) for t in topics)}"
-    cached_hashes = cache.get(cache_key, [])
-    question_hash = hash(question_text.lower())
-    if question_hash in cached_hashes:
-        log_validation_error("question_text", question_text, "Duplicate question detected via cache")
+    duplicate_id = DuplicateIndexService.find_duplicate(question_text, topics, instance.id if instance else None)
+    if duplicate_id is not None:
+        log_validation_error("question_text", question_text, f"Too similar to existing question {duplicate_id}")
         raise ValidationError(_('Question is too similar to an existing one'))
-    
-    existing_questions = Question.objects.filter(topics__in=topics).values('question_text').distinct()
-    if instance:
-        existing_questions = existing_questions.exclude(id=instance.id)
-    
-    for existing_text in existing_questions:
-        if fuzz.ratio(question_text.lower(), existing_text['question_text'].lower()) > 90:
-            log_validation_error("question_text", question_text, "Too similar to existing question")
-            raise ValidationError(_('Question is too similar to an existing one'))
-    
-    cached_hashes.append(question_hash)
-    cache.set(cache_key, cached_hashes, timeout=86400)  # 24 hours
\ No newline at end of file
@@ -4,19 +4,27 @@ from rest_framework import status, permissions
 from apps.common.authentication import CookieTokenAuthentication
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.renderers import TemplateHTMLRenderer, JSONRenderer
-from .models import Subject, Topic, Question
-from .serializers import QuestionSerializer
+from .models import Subject, Topic, Question, QuestionImportJob
+from .services.question_index_service import QuestionIndexService
+from .serializers import QuestionSerializer, QuestionImportJobSerializer
+from .services.import_service import QuestionImportService
 from apps.common.throttles import CustomUserRateThrottle
 from apps.common.permissions import IsTeacher
-from .tasks import send_question_notification_task, notify_admin_approval_task
+from apps.common.pagination import KeysetPaginator
+from apps.common.services.cache_service import CacheService
+from .tasks import send_question_notification_task, notify_admin_approval_task, import_questions
 from django.core.paginator import Paginator, EmptyPage
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.contrib import messages
 from django.shortcuts import redirect, get_object_or_404
+from django.urls import reverse
 from apps.content.utils.utils import process_question_form_data, get_subject_topic_context
 from django.db.models import Prefetch
 from django.core.cache import cache
+from django.conf import settings
+from django.db import transaction
+from rest_framework.parsers import MultiPartParser, FormParser
 from datetime import datetime
 import json
 import logging
@@ -26,7 +34,7 @@ logger = logging.getLogger(__name__)
 
 
 def get_subject_topic_context(user):
-    cache_key = f"subject_topic_context:{user.id}"
+    cache_key = CacheService.make_key('subject_topic_context', user.id)
     context = cache.get(cache_key)
     if not context:
         subjects = Subject.objects.all()
@@ -48,25 +56,35 @@ class QuestionFilter:
         self.queryset = queryset
         self.params = params
         self.user = user
+        # Total matches when the attribute index answered every filter, else None
+        self.count = None
 
     def apply(self):
         filters = {}
+        index_filters = {}
         needs_distinct = False
 
         if difficulty := self.params.get('difficulty'):
             if difficulty not in ['E', 'M', 'H']:
                 raise ValueError("Difficulty must be E, M, or H")
             filters['difficulty'] = difficulty
+            index_filters['difficulty'] = difficulty
         
         if subject_id := self.params.get('subject'):
+            if not str(subject_id).isdigit():
+                raise ValueError("Subject must be a numeric id")
             filters['topics__subject_id'] = subject_id
+            index_filters['subject_id'] = int(subject_id)
             needs_distinct = True
         
         if topic_id := self.params.get('topic'):
+            if not str(topic_id).isdigit():
+                raise ValueError("Topic must be a numeric id")
             if subject_id:
                 if not Topic.objects.filter(id=topic_id, subject_id=subject_id).exists():
                     raise ValueError("Topic does not belong to specified subject")
             filters['topics__id'] = topic_id
+            index_filters['topic_ids'] = [int(topic_id)]
             needs_distinct = True
         
         if status := self.params.get('status'):
@@ -74,15 +92,27 @@ class QuestionFilter:
                 if status not in ['PENDING', 'APPROVED', 'REJECTED']:
                     raise ValueError("Status must be PENDING, APPROVED, or REJECTED")
                 filters['approval__status'] = status
+                index_filters['status'] = status
         
+        extra_filters = {}
         if created_after := self.params.get('created_after'):
             try:
                 datetime.strptime(created_after, '%Y-%m-%d')
-                filters['created_at__gte'] = created_after
+                extra_filters['created_at__gte'] = created_after
             except ValueError:
                 raise ValueError("Invalid date format for created_after")
+
+        if index_filters:
+            # The Redis index intersects the attribute sets, avoiding the topic joins and DISTINCT
+            ids = QuestionIndexService.query(**index_filters)
+            if ids is not None:
+                if not extra_filters:
+                    self.count = len(ids)
+                if len(ids) <= QuestionIndexService.MAX_IN_IDS:
+                    return self.queryset.filter(id__in=ids, **extra_filters)
+                logger.debug(f"{len(ids)} indexed question ids exceed the IN limit, filtering in SQL")
         
-        queryset = self.queryset.filter(**filters)
+        queryset = self.queryset.filter(**filters, **extra_filters)
         return queryset.distinct() if needs_distinct else queryset
 
 @method_decorator(ensure_csrf_cookie, name='dispatch')
@@ -120,57 +150,49 @@ class QuestionListView(APIView):
                 return redirect('question_list')
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        # JSON: keyset pagination on (created_at, id), no COUNT(*) or OFFSET
+        if request.accepted_renderer.format != 'html':
+            cache_key = CacheService.make_key(
+                'question_list', request.user.id, request.user.role, params=request.query_params
+            )
+            cached_data = cache.get(cache_key)
+            if cached_data:
+                logger.debug(f"Cache hit for {cache_key}")
+                return Response(cached_data)
+            paginator = KeysetPaginator(queryset, request, count=question_filter.count)
+            try:
+                questions = paginator.paginate()
+            except ValueError as e:
+                logger.warning(f"Invalid pagination for question list by {request.user.email}: {str(e)}")
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            response_data = paginator.get_data(QuestionSerializer(questions, many=True).data)
+            cache.set(cache_key, response_data, timeout=3600)  # 1 hour
+            logger.info(f"Question list retrieved by {request.user.email} (role: {request.user.role})")
+            return Response(response_data)
+
         # Pagination
-        paginator = Paginator(queryset, 20)
+        paginator = Paginator(queryset.order_by('-created_at', '-id'), 20)
+        if question_filter.count is not None:
+            paginator.count = question_filter.count
         page = request.query_params.get('page', 1)
         try:
             questions = paginator.page(page)
         except EmptyPage:
             logger.warning(f"Invalid page {page} for question list by {request.user.email}")
-            if request.accepted_renderer.format == 'html':
-                messages.error(request, "Page not found.")
-                return redirect('question_list')
-            return Response({"error": "Page not found"}, status=status.HTTP_404_NOT_FOUND)
+            messages.error(request, "Page not found.")
+            return redirect('question_list')
 
-        # Caching
-        cache_key = f"question_list:{request.user.id}:{request.user.role}:{hash(str(request.query_params))}:{page}"
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            logger.debug(f"Cache hit for {cache_key}")
-            if request.accepted_renderer.format == 'html':
-                context = get_subject_topic_context(request.user)
-                return Response(
-                    {
-                        'count': cached_data['count'],
-                        'results': questions,
-                        **context,
-                        'current_filters': request.query_params
-                    },
-                    template_name='content/teacher/question_list.html'
-                )
-            return Response(cached_data)
-
-        serializer = QuestionSerializer(questions, many=True)
-        response_data = {
-            "count": paginator.count,
-            "results": serializer.data
-        }   
-        cache.set(cache_key, response_data, timeout=3600)  # 1 hour
         logger.info(f"Question list retrieved by {request.user.email} (role: {request.user.role})")
-
-        if request.accepted_renderer.format == 'html':
-            context = get_subject_topic_context(request.user)
-            return Response(
-                {
-                    'count': response_data['count'],
-                    'results': questions,
-                    **context,
-                    'current_filters': request.query_params
-                },
-                template_name='content/teacher/question_list.html'
-            )
-        return Response(response_data)
+        context = get_subject_topic_context(request.user)
+        return Response(
+            {
+                'count': paginator.count,
+                'results': questions,
+                **context,
+                'current_filters': request.query_params
+            },
+            template_name='content/teacher/question_list.html'
+        )
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class QuestionCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
@@ -235,6 +257,45 @@ class QuestionCreateView(APIView):
 
 
 
+class QuestionImportView(APIView):
+    """Upload a CSV/JSON/NDJSON/XLSX question file for background import, and poll its job."""
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+    renderer_classes = [JSONRenderer]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    throttle_classes = [CustomUserRateThrottle]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request, pk):
+        try:
+            job = QuestionImportJob.objects.get(pk=pk, created_by=request.user)
+        except QuestionImportJob.DoesNotExist:
+            return Response({"error": "Import not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(QuestionImportJobSerializer(job).data)
+
+    def post(self, request):
+        if not request.user.is_active or not request.user.is_verified:
+            return Response({"error": "Account not active or verified"}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "A file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or QuestionImportService.detect_format(upload.name)
+        if file_format not in QuestionImportService.FORMATS:
+            return Response(
+                {"error": f"Format must be one of {', '.join(QuestionImportService.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if upload.size > settings.QUESTION_IMPORT_MAX_BYTES:
+            return Response({"error": "File is too large"}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = QuestionImportJob.objects.create(created_by=request.user, file=upload, file_format=file_format)
+        transaction.on_commit(lambda: import_questions.delay(job.id))
+        logger.info(f"Question import {job.id} ({file_format}) queued by {request.user.email}")
+        return Response(
+            {**QuestionImportJobSerializer(job).data, 'status_url': reverse('question_import_status', args=[job.id])},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
 @method_decorator(ensure_csrf_cookie, name='dispatch')
 class QuestionUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
@@ -0,0 +1,57 @@
+# apps/examination/management/commands/benchmark_scoring.py
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from apps.examination.services.scoring_service import ScoringService
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks vectorized scoring of synthetic attempts against a per-answer Python loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=100000, help='Number of synthetic attempts')
+        parser.add_argument('--questions', type=int, default=50, help='Questions per test')
+        parser.add_argument('--blank-rate', type=float, default=0.1, help='Share of unanswered questions')
+        parser.add_argument('--skip-loop', action='store_true', help='Do not time the Python loop baseline')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        n_attempts, n_questions = options['attempts'], options['questions']
+        scheme = {'correct': 1.0, 'incorrect': -0.25, 'blank': 0.0}
+        rng = np.random.default_rng(options['seed'])
+
+        key = rng.integers(1, 5, size=n_questions, dtype=np.uint8)
+        answers = rng.integers(1, 5, size=(n_attempts, n_questions), dtype=np.uint8)
+        answers[rng.random((n_attempts, n_questions)) < options['blank_rate']] = 0
+        self.stdout.write(f"Scoring {n_attempts} attempts x {n_questions} questions (scheme {scheme})")
+
+        start = time.perf_counter()
+        scores, _, _ = ScoringService.score_matrix(answers, key, scheme)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Vectorized: {elapsed * 1000:.1f} ms ({n_attempts / elapsed:,.0f} attempts/s)"
+        ))
+
+        if options['skip_loop']:
+            return
+        w_correct, w_incorrect, w_blank = ScoringService.get_weights(scheme)
+        key_list = key.tolist()
+        start = time.perf_counter()
+        loop_scores = []
+        for row in answers.tolist():
+            score = 0.0
+            for answer, correct in zip(row, key_list):
+                if not answer:
+                    score += w_blank
+                elif answer == correct:
+                    score += w_correct
+                else:
+                    score += w_incorrect
+            loop_scores.append(score)
+        loop_elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Python loop: {loop_elapsed * 1000:.1f} ms ({n_attempts / loop_elapsed:,.0f} attempts/s), "
+            f"speed-up x{loop_elapsed / elapsed:.1f}"
+        )
+        if not np.allclose(scores, loop_scores):
+            self.stdout.write(self.style.ERROR("Vectorized scores differ from the loop baseline"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examination', '0006_remove_testattempt_is_completed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('examination', '0007_test_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testattempt',
+            name='test_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
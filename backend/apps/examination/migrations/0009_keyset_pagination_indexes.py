@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_alter_question_created_by_alter_question_topics_and_more'),
+        ('examination', '0008_testattempt_test_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='test',
+            index=models.Index(fields=['created_by', 'created_at'], name='examination_created_0fc8d5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testattempt',
+            index=models.Index(fields=['student', 'created_at'], name='examination_student_a6f169_idx'),
+        ),
+    ]
@@ -14,17 +14,31 @@ class Test(TimeStampedModel):
     max_attempts = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
     scoring_scheme = models.JSONField()
     question_filters = models.JSONField(default=dict)
+    # Bumped whenever the question set or a member question changes; keys the cached exam packet
+    version = models.PositiveIntegerField(default=1)
     
     class Meta:
         indexes = [
            
             models.Index(fields=['created_by']),
+            # Keyset pagination of a teacher's tests; the primary key completes (created_at, id)
+            models.Index(fields=['created_by', 'created_at']),
         ]
 
     def validate(self):
         if not self.subject and not self.subjects.exists():
             raise ValidationError("Test must have at least one subject")
-    
+
+    def save(self, *args, **kwargs):
+        # `version` is only bumped in SQL (ExamPacketService.bump_version); a full save of an
+        # instance loaded earlier must not write its stale copy back over a newer bump
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def percent_attempted(self):
         if not self.max_attempts:
@@ -70,6 +84,8 @@ class TestAttempt(TimeStampedModel):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(null=True, blank=True)
+    # Test version at start; seeds the question/option shuffle (null for unshuffled attempts)
+    test_version = models.PositiveIntegerField(null=True, blank=True)
     
     
     # Store calculated analytics for quick access
@@ -82,7 +98,8 @@ class TestAttempt(TimeStampedModel):
     class Meta:
         # unique_together = ('student', 'test')
         indexes = [
-            models.Index(fields=['student'])
+            models.Index(fields=['student']),
+            models.Index(fields=['student', 'created_at']),
         ]
 
     def clean(self):
@@ -96,10 +113,8 @@ class TestAttempt(TimeStampedModel):
         
 
     def calculate_score(self):
-        responses = StudentResponse.objects.filter(attempt=self)
-        correct_count = responses.filter(is_correct=True).count()
-        scoring_scheme = self.test.scoring_scheme or {'correct': 1, 'incorrect': 0}
-        self.score = correct_count * scoring_scheme['correct']
+        from apps.examination.services.scoring_service import ScoringService
+        self.score = ScoringService.score_attempts(self.test, [self.id])[self.id][0]
    
     
     def __str__(self):
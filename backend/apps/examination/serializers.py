@@ -8,6 +8,8 @@ from django.utils import timezone
 from django.core.cache import cache
 from datetime import timedelta
 from apps.content.utils.validations import log_validation_error
+from .services.shuffle_service import ShuffleService
+from apps.content.services.question_pool_service import QuestionPoolService
 import logging
 
 
@@ -20,12 +22,14 @@ class TestSerializer(serializers.ModelSerializer):
     created_by = serializers.StringRelatedField(read_only=True)
     scoring_scheme = serializers.JSONField()
     question_filters = serializers.JSONField(default=dict)
+    # On update, draw new questions even though question_filters did not change
+    redraw = serializers.BooleanField(write_only=True, required=False, default=False)
 
     class Meta:
         model = Test
         fields = [
             'id', 'title', 'created_by', 'subject','subject_name', 'questions', 'duration',
-            'max_attempts', 'scoring_scheme', 'question_filters', 'created_at', 'updated_at'
+            'max_attempts', 'scoring_scheme', 'question_filters', 'redraw', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
 
@@ -35,6 +39,7 @@ class TestSerializer(serializers.ModelSerializer):
         question_filters = data.get('question_filters', {})
         scoring_scheme = data.get('scoring_scheme', {})
         duration = data.get('duration', 10)
+        redraw = data.pop('redraw', False)
 
         if not subject:
             logger.warning("Test creation failed: No subject provided")
@@ -44,6 +49,7 @@ class TestSerializer(serializers.ModelSerializer):
             logger.warning("Test creation failed: No questions or filters provided")
             raise serializers.ValidationError({"questions": "Provide exactly 5 questions or use filters"})
 
+        expected_count = QuestionPoolService.DEFAULT_COUNT
         if question_filters:
             if 'topic' not in question_filters:
                 logger.warning("Test creation failed: Topic required in filters")
@@ -65,24 +71,71 @@ class TestSerializer(serializers.ModelSerializer):
                 logger.warning(f"Test creation failed: Invalid topic ID {question_filters.get('topic')}")
                 raise serializers.ValidationError({"question_filters": "Invalid topic ID"})
 
-            queryset = Question.objects.filter(is_active=True)
-            if topic_ids:
-                queryset = queryset.filter(topics__id__in=topic_ids).distinct()
+            count = question_filters.get('count', QuestionPoolService.DEFAULT_COUNT)
+            try:
+                count = int(count)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError({"question_filters": "count must be an integer"})
+            if not 1 <= count <= QuestionPoolService.MAX_COUNT:
+                raise serializers.ValidationError({"question_filters": f"count must be between 1 and {QuestionPoolService.MAX_COUNT}"})
+            data['question_filters']['count'] = count
+
+            if not topic_ids:
+                topic_ids = list(Topic.objects.filter(subject=subject).values_list('id', flat=True))
+            try:
+                topic_weights = {int(tid): float(w) for tid, w in (question_filters.get('topic_weights') or {}).items()}
+            except (AttributeError, TypeError, ValueError):
+                raise serializers.ValidationError({"question_filters": "topic_weights must map topic IDs to numbers"})
+            weights = {tid: topic_weights.get(tid, 1.0) for tid in topic_ids}
+            if any(w < 0 for w in weights.values()) or not any(weights.values()):
+                raise serializers.ValidationError({"question_filters": "Topic weights must be non-negative and not all zero"})
+
+            difficulty_mix = None
             if 'difficulty' in question_filters:
-                if question_filters['difficulty'] not in ['Easy', 'Medium', 'Hard']:
+                if question_filters['difficulty'] not in QuestionPoolService.DIFFICULTY_NAMES:
                     raise serializers.ValidationError({"question_filters": "Invalid difficulty (Easy, Medium, Hard)"})
-                difficulty_map = {'Easy': 'E', 'Medium': 'M', 'Hard': 'H'}
-                queryset = queryset.filter(difficulty=difficulty_map[question_filters['difficulty']])
-            
-            questions = queryset.distinct()[:5]
-            if len(questions) < 5:
-                logger.warning(f"Test creation failed: Only {len(questions)} questions match filters {question_filters}")
-                raise serializers.ValidationError({"question_filters": f"Need 5 questions, found {len(questions)} for topics {topic_ids}"})
+                difficulty_mix = {QuestionPoolService.DIFFICULTY_NAMES[question_filters['difficulty']]: 1.0}
+            elif question_filters.get('difficulty_mix'):
+                try:
+                    difficulty_mix = {
+                        QuestionPoolService.DIFFICULTY_NAMES.get(d, d): float(w)
+                        for d, w in question_filters['difficulty_mix'].items()
+                    }
+                except (AttributeError, TypeError, ValueError):
+                    raise serializers.ValidationError({"question_filters": "difficulty_mix must map difficulties to numbers"})
+                if (set(difficulty_mix) - set(QuestionPoolService.DIFFICULTIES)
+                        or any(w < 0 for w in difficulty_mix.values()) or not any(difficulty_mix.values())):
+                    raise serializers.ValidationError({"question_filters": "Invalid difficulty_mix (Easy, Medium, Hard weights)"})
+
+            current_filters = getattr(self.instance, 'question_filters', None)
+            if current_filters and not redraw and question_filters == {
+                'count': QuestionPoolService.DEFAULT_COUNT, **current_filters
+            }:
+                # Unchanged filters keep the drawn questions: attempts, regrades,
+                # shuffle seeds and item statistics all refer to them
+                questions = list(self.instance.questions.prefetch_related('topics'))
+                expected_count = len(questions)
+            else:
+                exclude = set()
+                if question_filters.get('exclude_seen_by'):
+                    try:
+                        student_ids = [int(sid) for sid in question_filters['exclude_seen_by']]
+                    except (TypeError, ValueError):
+                        raise serializers.ValidationError({"question_filters": "exclude_seen_by must be a list of student IDs"})
+                    exclude = QuestionPoolService.seen_question_ids(student_ids)
+
+                try:
+                    question_ids = QuestionPoolService.select(weights, difficulty_mix, count, exclude)
+                except ValueError as e:
+                    logger.warning(f"Test creation failed: {e} for filters {question_filters}")
+                    raise serializers.ValidationError({"question_filters": f"{e} for topics {topic_ids}"})
+                questions = list(Question.objects.filter(id__in=question_ids).prefetch_related('topics'))
+                expected_count = count
             data['questions'] = questions
 
-        if len(questions) != 5:
-            logger.warning(f"Test creation failed: Invalid question count ({len(questions)}, expected 5)")
-            raise serializers.ValidationError({"questions": "Test must have exactly 5 questions"})
+        if len(questions) != expected_count:
+            logger.warning(f"Test creation failed: Invalid question count ({len(questions)}, expected {expected_count})")
+            raise serializers.ValidationError({"questions": f"Test must have exactly {expected_count} questions"})
 
         subject_id = subject.id if subject else None
         if question_filters.get('topic'):
@@ -171,6 +224,7 @@ class TestAttemptSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['student'] = self.context['request'].user
         validated_data['start_time'] = timezone.now()
+        validated_data['test_version'] = validated_data['test'].version
         attempt = super().create(validated_data)
         # Update cache
         cache_key = f"test_attempts:{validated_data['student'].id}:{validated_data['test'].id}"
@@ -210,6 +264,10 @@ class StudentResponseSerializer(serializers.ModelSerializer):
         # if data['selected_answer'] not in question.options:
         if data['selected_answer'] and data['selected_answer'] not in question.options:
             raise serializers.ValidationError("Invalid answer option.")
+        # Answers arrive in the attempt's displayed labels
+        data['selected_answer'] = ShuffleService.to_original(
+            ShuffleService.get_seed(attempt), question.id, question.options, data['selected_answer']
+        )
         if attempt.end_time:
             raise serializers.ValidationError("Attempt is already submitted.")
         if timezone.now() > attempt.start_time + timedelta(minutes=attempt.test.duration):
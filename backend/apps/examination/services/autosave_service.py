@@ -0,0 +1,233 @@
+# apps/examination/services/autosave_service.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework import serializers
+from apps.examination.models import TestAttempt, StudentResponse
+from apps.examination.services.submission_service import SubmissionService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveService:
+    """Keeps in-progress answer sheets in Redis instead of MySQL.
+
+    Each attempt owns one hash (`attempt_answers:<attempt_id>`) whose fields
+    are question ids and whose values are packed as `<answer>:<time_taken>`.
+    Two reserved fields hold the owner and deadline so that high-frequency
+    delta updates never have to touch the database. Sheets are written to
+    StudentResponse in bulk on submit, on deadline or by the periodic sweep.
+    A third, `meta:dirty`, counts the saves since the last flush; a flush
+    resets it only if no save arrived while it was writing.
+    """
+
+    KEY_PREFIX = "attempt_answers:"
+    ACTIVE_SET_KEY = "attempt_answers:active"
+    META_STUDENT = "meta:student"
+    META_DEADLINE = "meta:deadline"
+    META_DIRTY = "meta:dirty"
+    VALID_ANSWERS = {'', 'A', 'B', 'C', 'D'}
+    GRACE_PERIOD = 86400  # keep sheets a day past the deadline in case the sweep is down
+    MAX_ANSWERS_PER_SAVE = 200
+
+    # Mark the sheet clean only if it was not saved again since it was read.
+    CLEAR_DIRTY_SCRIPT = """
+    if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+        redis.call('HSET', KEYS[1], ARGV[1], '0')
+        return 1
+    end
+    return 0
+    """
+
+    @staticmethod
+    def _key(attempt_id: int) -> str:
+        return f"{AutosaveService.KEY_PREFIX}{attempt_id}"
+
+    @staticmethod
+    def get_deadline(attempt: TestAttempt):
+        return attempt.start_time + timedelta(minutes=attempt.test.duration)
+
+    @staticmethod
+    def _parse_delta(answers: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """Validate a delta payload and pack it into hash fields."""
+        if not isinstance(answers, list) or not answers:
+            raise serializers.ValidationError({"answers": "Provide a non-empty list of answers."})
+        if len(answers) > AutosaveService.MAX_ANSWERS_PER_SAVE:
+            raise serializers.ValidationError({"answers": f"At most {AutosaveService.MAX_ANSWERS_PER_SAVE} answers per save."})
+        fields = {}
+        for item in answers:
+            try:
+                question_id = int(item['question'])
+                time_taken = max(int(item.get('time_taken') or 0), 0)
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError({"answers": "Each answer needs an integer question and time_taken."})
+            ans = (item.get('selected_answer') or '').strip().upper()
+            if ans not in AutosaveService.VALID_ANSWERS:
+                raise serializers.ValidationError({"answers": f"Invalid answer option for question {question_id}."})
+            fields[str(question_id)] = f"{ans}:{time_taken}"
+        return fields
+
+    @staticmethod
+    def _unpack(raw: Dict[bytes, bytes]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """Split a raw hash into (answer list, metadata)."""
+        sheet, meta = [], {}
+        for field, value in raw.items():
+            field, value = field.decode(), value.decode()
+            if field.startswith('meta:'):
+                meta[field] = value
+                continue
+            ans, _, time_taken = value.partition(':')
+            sheet.append({
+                'question': int(field),
+                'selected_answer': ans,
+                'time_taken': int(time_taken or 0),
+            })
+        return sheet, meta
+
+    @staticmethod
+    def save_answers(attempt_id: int, user, answers: List[Dict[str, Any]]) -> int:
+        """Merge a small delta into the attempt's sheet.
+
+        The attempt is read from the database only for the first save; later
+        saves check ownership and the deadline against the hash metadata.
+
+        Returns:
+            The number of answers stored for the attempt.
+
+        Raises:
+            TestAttempt.DoesNotExist: If the attempt does not belong to the user.
+            serializers.ValidationError: If the payload is invalid or the attempt is closed.
+        """
+        fields = AutosaveService._parse_delta(answers)
+        redis = get_redis_connection('default')
+        key = AutosaveService._key(attempt_id)
+        student_id, deadline = redis.hmget(key, AutosaveService.META_STUDENT, AutosaveService.META_DEADLINE)
+
+        if student_id is None:
+            attempt = TestAttempt.objects.select_related('test').get(pk=attempt_id, student=user)
+            if attempt.end_time:
+                raise serializers.ValidationError({"error": "Attempt already submitted"})
+            deadline = AutosaveService.get_deadline(attempt).timestamp()
+            fields[AutosaveService.META_STUDENT] = str(user.id)
+            fields[AutosaveService.META_DEADLINE] = str(deadline)
+        else:
+            if int(student_id) != user.id:
+                raise TestAttempt.DoesNotExist
+            deadline = float(deadline)
+
+        now = timezone.now().timestamp()
+        if now > deadline:
+            raise serializers.ValidationError({"error": "Test duration expired"})
+
+        pipe = redis.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.hincrby(key, AutosaveService.META_DIRTY, 1)
+        pipe.expireat(key, int(deadline) + AutosaveService.GRACE_PERIOD)
+        pipe.sadd(AutosaveService.ACTIVE_SET_KEY, attempt_id)
+        pipe.hlen(key)
+        saved = pipe.execute()[-1] - 3  # minus the metadata fields
+        logger.debug(f"Autosaved {len(answers)} answers for attempt {attempt_id} ({saved} total)")
+        return saved
+
+    @staticmethod
+    def get_sheet(attempt_id: int) -> List[Dict[str, Any]]:
+        """Return the autosaved answers for an attempt (empty if none)."""
+        raw = get_redis_connection('default').hgetall(AutosaveService._key(attempt_id))
+        return AutosaveService._unpack(raw)[0]
+
+    @staticmethod
+    def clear(attempt_id: int) -> None:
+        redis = get_redis_connection('default')
+        pipe = redis.pipeline()
+        pipe.delete(AutosaveService._key(attempt_id))
+        pipe.srem(AutosaveService.ACTIVE_SET_KEY, attempt_id)
+        pipe.execute()
+
+    @staticmethod
+    def submit(
+        attempt: TestAttempt,
+        resp_list: Optional[Iterable[Dict[str, Any]]] = None,
+        raw_form=None,
+        end_time=None
+    ) -> TestAttempt:
+        """Finalize an attempt from its autosaved sheet plus any submitted answers.
+
+        Answers in the request payload take precedence over autosaved ones.
+        """
+        sheet = AutosaveService.get_sheet(attempt.id)
+        attempt = SubmissionService.submit(
+            attempt, resp_list=resp_list, raw_form=raw_form, end_time=end_time, autosaved=sheet
+        )
+        AutosaveService.clear(attempt.id)
+        return attempt
+
+    @staticmethod
+    def flush(attempt: TestAttempt, answer_key: Optional[Dict[int, Dict[str, Any]]] = None) -> int:
+        """Write an in-progress sheet to StudentResponse without closing the attempt.
+
+        The dirty counter read with the sheet is cleared with a compare-and-set,
+        so a save landing between the read and the commit keeps the sheet dirty
+        and is written by the next flush.
+        """
+        redis = get_redis_connection('default')
+        key = AutosaveService._key(attempt.id)
+        sheet, meta = AutosaveService._unpack(redis.hgetall(key))
+        dirty = meta.get(AutosaveService.META_DIRTY, '0')
+        if not sheet or dirty == '0':
+            return 0
+        if answer_key is None:
+            answer_key = SubmissionService.load_answer_key(attempt.test)
+        rows, _, _ = SubmissionService.grade(attempt, answer_key, sheet)
+        with transaction.atomic():
+            # Same lock as SubmissionService.submit: a sheet read before a concurrent
+            # submit must not overwrite the graded final answers once it commits.
+            locked = TestAttempt.objects.select_for_update().only('id', 'end_time').get(pk=attempt.pk)
+            if locked.end_time:
+                return 0
+            StudentResponse.objects.filter(attempt=attempt).delete()
+            StudentResponse.objects.bulk_create(rows)
+        redis.eval(AutosaveService.CLEAR_DIRTY_SCRIPT, 1, key, AutosaveService.META_DIRTY, dirty)
+        return len(rows)
+
+    @staticmethod
+    def sweep() -> Dict[str, int]:
+        """Flush every active sheet and finalize attempts whose deadline has passed."""
+        redis = get_redis_connection('default')
+        attempt_ids = [int(a) for a in redis.smembers(AutosaveService.ACTIVE_SET_KEY)]
+        stats = {'finalized': 0, 'flushed': 0, 'cleared': 0}
+        if not attempt_ids:
+            return stats
+
+        now = timezone.now()
+        attempts = TestAttempt.objects.filter(id__in=attempt_ids).select_related('test')
+        found = set()
+        answer_keys = {}
+        for attempt in attempts:
+            found.add(attempt.id)
+            if attempt.end_time:
+                AutosaveService.clear(attempt.id)
+                stats['cleared'] += 1
+                continue
+            deadline = AutosaveService.get_deadline(attempt)
+            try:
+                if now > deadline:
+                    AutosaveService.submit(attempt, end_time=deadline)
+                    stats['finalized'] += 1
+                else:
+                    if attempt.test_id not in answer_keys:
+                        answer_keys[attempt.test_id] = SubmissionService.load_answer_key(attempt.test)
+                    if AutosaveService.flush(attempt, answer_keys[attempt.test_id]):
+                        stats['flushed'] += 1
+            except serializers.ValidationError as e:
+                logger.warning(f"Autosave sweep skipped attempt {attempt.id}: {e.detail}")
+                AutosaveService.clear(attempt.id)
+                stats['cleared'] += 1
+
+        for attempt_id in set(attempt_ids) - found:
+            AutosaveService.clear(attempt_id)
+            stats['cleared'] += 1
+        logger.info(f"Autosave sweep: {stats}")
+        return stats
@@ -0,0 +1,71 @@
+# apps/examination/services/exam_packet_service.py
+from typing import Any, Dict, Iterable
+from django.db.models import F
+from django_redis import get_redis_connection
+from apps.examination.models import Test
+import msgpack
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ExamPacketService:
+    """Builds and caches the delivery payload students see while taking a test.
+
+    A packet holds the question text and options of a test, never the correct
+    answers, packed with msgpack under `exam_packet:<test_id>:<version>`.
+    `Test.version` is bumped whenever the test's questions change, so a stale
+    packet is simply never read again and expires on its own.
+    """
+
+    KEY_PREFIX = "exam_packet"
+    TIMEOUT = 60 * 60 * 24
+    # Question fields whose change invalidates the packets of its tests
+    QUESTION_FIELDS = ('question_text', 'options', 'correct_answer')
+
+    @staticmethod
+    def packet_key(test_id: int, version: int) -> str:
+        return f"{ExamPacketService.KEY_PREFIX}:{test_id}:{version}"
+
+    @staticmethod
+    def build(test: Test) -> Dict[str, Any]:
+        """Build the packet for the current version of a test with one query."""
+        questions = [
+            {'id': question_id, 'question_text': question_text, 'options': options or {}}
+            for question_id, question_text, options in test.questions.order_by('id').values_list(
+                'id', 'question_text', 'options'
+            )
+        ]
+        return {'test_id': test.id, 'version': test.version, 'questions': questions}
+
+    @staticmethod
+    def get_packet(test: Test) -> Dict[str, Any]:
+        """Return the cached packet for `test.version`, building it on a miss.
+
+        Args:
+            test: The test to deliver; only `id` and `version` are read on a cache hit.
+
+        Returns:
+            A dict with `test_id`, `version` and `questions` (`id`, `question_text`, `options`).
+        """
+        redis = get_redis_connection('default')
+        key = ExamPacketService.packet_key(test.id, test.version)
+        raw = redis.get(key)
+        if raw is not None:
+            return msgpack.unpackb(raw, strict_map_key=False)
+
+        packet = ExamPacketService.build(test)
+        # NX keeps the first packet written when many students miss at once.
+        redis.set(key, msgpack.packb(packet), ex=ExamPacketService.TIMEOUT, nx=True)
+        logger.info(f"Built exam packet for test {test.id} v{test.version} ({len(packet['questions'])} questions)")
+        return packet
+
+    @staticmethod
+    def bump_version(test_ids: Iterable[int]) -> int:
+        """Invalidate the packets of the given tests by bumping their version."""
+        test_ids = list(test_ids)
+        if not test_ids:
+            return 0
+        updated = Test.objects.filter(id__in=test_ids).update(version=F('version') + 1)
+        logger.debug(f"Bumped exam packet version for tests {test_ids}")
+        return updated
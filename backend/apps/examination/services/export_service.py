@@ -0,0 +1,144 @@
+# apps/examination/services/export_service.py
+from typing import Any, Dict, Iterator, Optional, Tuple
+import csv
+import gzip
+import json
+import os
+import re
+import secrets
+from datetime import datetime
+from django.conf import settings
+from django.utils import timezone
+from apps.examination.models import Test, TestAttempt, StudentResponse
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of buffering it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class ExportService:
+    """Exports a test's attempts or responses as CSV or NDJSON.
+
+    Rows are read as `values_list` tuples in primary-key batches, so neither
+    model instances nor the whole result set are held in memory; the same
+    line generator feeds the streaming response and the gzip file export.
+    """
+
+    CHUNK_SIZE = 2000
+    FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+    # Files land in settings.EXPORT_ROOT, outside MEDIA_ROOT, and are only served
+    # through TestExportDownloadView to the test's owner.
+    FILE_PATTERN = re.compile(r'^test_(?P<test_id>\d+)_(?:attempts|responses)_\d{14}_[\w-]+\.(?:csv|ndjson)\.gz$')
+    KINDS: Dict[str, Tuple[Any, str, Tuple[Tuple[str, str], ...]]] = {
+        'attempts': (TestAttempt, 'test_id', (
+            ('attempt_id', 'id'),
+            ('student_id', 'student_id'),
+            ('student', 'student__username'),
+            ('score', 'score'),
+            ('start_time', 'start_time'),
+            ('end_time', 'end_time'),
+            ('test_version', 'test_version'),
+        )),
+        'responses': (StudentResponse, 'attempt__test_id', (
+            ('response_id', 'id'),
+            ('attempt_id', 'attempt_id'),
+            ('student_id', 'attempt__student_id'),
+            ('question_id', 'question_id'),
+            ('selected_answer', 'selected_answer'),
+            ('is_correct', 'is_correct'),
+            ('time_taken', 'time_taken'),
+        )),
+    }
+
+    @staticmethod
+    def validate(kind: str, output: str) -> None:
+        """Raise ValueError for an unknown export kind or format."""
+        if kind not in ExportService.KINDS:
+            raise ValueError(f"kind must be one of {', '.join(ExportService.KINDS)}")
+        if output not in ExportService.FORMATS:
+            raise ValueError(f"output must be one of {', '.join(ExportService.FORMATS)}")
+
+    @staticmethod
+    def get_header(kind: str) -> Tuple[str, ...]:
+        return tuple(name for name, _ in ExportService.KINDS[kind][2])
+
+    @staticmethod
+    def iter_rows(test_id: int, kind: str) -> Iterator[tuple]:
+        """Yield submitted rows for a test in id order, one keyset batch at a time.
+
+        MySQLdb buffers a whole result set on the client, so `.iterator()` alone
+        would not bound memory; each batch is a separate `id > last` query instead.
+        """
+        model, test_field, columns = ExportService.KINDS[kind]
+        fields = [field for _, field in columns]
+        submitted = 'end_time__isnull' if kind == 'attempts' else 'attempt__end_time__isnull'
+        queryset = model.objects.filter(**{test_field: test_id, submitted: False}).order_by('id')
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).values_list(*fields)[:ExportService.CHUNK_SIZE])
+            if not batch:
+                return
+            yield from batch
+            last_id = batch[-1][0]
+
+    @staticmethod
+    def iter_lines(test_id: int, kind: str, output: str) -> Iterator[str]:
+        """Yield the export as text lines, header first for CSV."""
+        header = ExportService.get_header(kind)
+        rows = (
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in ExportService.iter_rows(test_id, kind)
+        )
+        if output == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+            return
+        for row in rows:
+            yield json.dumps(dict(zip(header, row))) + '\n'
+
+    @staticmethod
+    def get_filename(test: Test, kind: str, output: str) -> str:
+        return f"test_{test.id}_{kind}.{output}"
+
+    @staticmethod
+    def write_file(test: Test, kind: str, output: str, stamp: Optional[str] = None) -> Tuple[str, int]:
+        """Write a gzip export under EXPORT_ROOT.
+
+        The file name carries a random token, so it cannot be guessed from
+        the test id and time.
+
+        Returns:
+            A tuple of (file name, number of data rows).
+        """
+        ExportService.validate(kind, output)
+        stamp = stamp or timezone.now().strftime('%Y%m%d%H%M%S')
+        name = f"test_{test.id}_{kind}_{stamp}_{secrets.token_urlsafe(16)}.{output}.gz"
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        absolute_path = os.path.join(settings.EXPORT_ROOT, name)
+
+        rows = 0
+        with gzip.open(absolute_path, 'wt', encoding='utf-8', newline='') as handle:
+            for line in ExportService.iter_lines(test.id, kind, output):
+                handle.write(line)
+                rows += 1
+        if output == 'csv':
+            rows -= 1  # header
+        logger.info(f"Exported {rows} {kind} rows of test {test.id} to {name}")
+        return name, rows
+
+    @staticmethod
+    def get_export_path(test: Test, name: str) -> Optional[str]:
+        """Absolute path of an existing export file of `test`, or None for any other name."""
+        match = ExportService.FILE_PATTERN.match(name or '')
+        if not match or int(match.group('test_id')) != test.id:
+            return None
+        path = os.path.join(settings.EXPORT_ROOT, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,149 @@
+# apps/examination/services/regrade_service.py
+from typing import Dict, List, Set
+from django.db import transaction
+from django.db.models import Case, When, Value, BooleanField, Count, Q
+from apps.content.models import Question
+from apps.examination.models import TestAttempt, StudentResponse
+from apps.examination.services.submission_service import SubmissionService
+from apps.examination.services.scoring_service import ScoringService
+from apps.analytics.models import TestAttemptHistory
+from apps.analytics.services.mastery_service import MasteryService
+from apps.analytics.services.rollup_service import RollupService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RegradeService:
+    """Recomputes stored results after a question's correct answer changes.
+
+    Responses to the question are walked in primary-key chunks: each chunk
+    gets one set-based UPDATE of `is_correct`, and the submitted attempts it
+    touches are rescored through ScoringService and written back with
+    `bulk_update`, together with their attempt history rows; flipped answers
+    also shift the students' topic mastery. Rollup buckets built from the
+    rewritten history are recomputed at the end.
+    Only one chunk of ids is held in memory at a time.
+    """
+
+    DEFAULT_CHUNK_SIZE = 1000
+
+    @staticmethod
+    def regrade_question(question_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, object]:
+        """Re-grade every response to a question and rescore the affected attempts.
+
+        Args:
+            question_id: The question whose correct answer changed.
+            chunk_size: Number of responses updated per statement.
+
+        Returns:
+            Stats with `responses`, `attempts`, `history` rows and the affected `test_ids`.
+
+        Raises:
+            Question.DoesNotExist: If the question was deleted in the meantime.
+        """
+        correct_answer = Question.objects.only('correct_answer').get(pk=question_id).correct_answer
+        rows = (
+            StudentResponse.objects.filter(question_id=question_id)
+            .order_by('pk')
+            .values_list('pk', 'attempt_id')
+            .iterator(chunk_size=chunk_size)
+        )
+        stats = {'responses': 0, 'attempts': 0, 'history': 0}
+        test_ids: Set[int] = set()
+        answer_keys: Dict[int, Dict] = {}
+
+        chunk: List[tuple] = []
+        topic_ids = None
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                topic_ids = RegradeService._regrade_chunk(
+                    question_id, correct_answer, chunk, answer_keys, test_ids, stats, topic_ids
+                )
+                chunk = []
+        if chunk:
+            RegradeService._regrade_chunk(question_id, correct_answer, chunk, answer_keys, test_ids, stats, topic_ids)
+
+        stats['test_ids'] = sorted(test_ids)
+        if stats['history']:
+            RollupService.rebuild_tests(stats['test_ids'])
+        logger.info(f"Re-graded question {question_id}: {stats}")
+        return stats
+
+    @staticmethod
+    def _regrade_chunk(question_id, correct_answer, chunk, answer_keys, test_ids, stats, topic_ids=None):
+        response_ids = [pk for pk, _ in chunk]
+        attempt_ids = {attempt_id for _, attempt_id in chunk}
+
+        with transaction.atomic():
+            # Responses of graded attempts whose correctness flips, for the topic mastery counters
+            flips = StudentResponse.objects.filter(
+                pk__in=response_ids, attempt__end_time__isnull=False
+            ).values('attempt__student_id').annotate(
+                gained=Count('id', filter=Q(is_correct=False, selected_answer=correct_answer)),
+                lost=Count('id', filter=Q(is_correct=True) & ~Q(selected_answer=correct_answer)),
+            ).order_by()
+            correct_by_student = {row['attempt__student_id']: row['gained'] - row['lost'] for row in flips}
+
+            stats['responses'] += StudentResponse.objects.filter(pk__in=response_ids).update(
+                is_correct=Case(
+                    When(selected_answer=correct_answer, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                )
+            )
+
+            # Attempts still in progress are scored when they are submitted.
+            attempts = list(
+                TestAttempt.objects.filter(id__in=attempt_ids, end_time__isnull=False)
+                .select_related('test')
+                .only('id', 'student_id', 'end_time', 'score', 'performance_metrics', 'test__id', 'test__scoring_scheme')
+            )
+            by_test: Dict[int, List[TestAttempt]] = {}
+            for attempt in attempts:
+                by_test.setdefault(attempt.test_id, []).append(attempt)
+
+            for test_id, test_attempts in by_test.items():
+                test = test_attempts[0].test
+                if test_id not in answer_keys:
+                    answer_keys[test_id] = SubmissionService.load_answer_key(test)
+                total_q = len(answer_keys[test_id])
+                results = ScoringService.score_attempts(
+                    test, [a.id for a in test_attempts], answer_key=answer_keys[test_id]
+                )
+                for attempt in test_attempts:
+                    score, correct_count = results[attempt.id]
+                    attempt.score = score
+                    metrics = dict(attempt.performance_metrics or {})
+                    metrics['accuracy'] = correct_count / total_q if total_q else 0
+                    attempt.performance_metrics = metrics
+                TestAttempt.objects.bulk_update(test_attempts, ['score', 'performance_metrics'])
+                stats['history'] += RegradeService._update_history(test_id, test_attempts)
+                test_ids.add(test_id)
+            stats['attempts'] += len(attempts)
+
+            if any(correct_by_student.values()):
+                if topic_ids is None:
+                    topic_ids = list(Question.topics.through.objects.filter(
+                        question_id=question_id
+                    ).values_list('topic_id', flat=True))
+                MasteryService.adjust_correct(topic_ids, correct_by_student)
+        return topic_ids
+
+    @staticmethod
+    def _update_history(test_id: int, attempts: List[TestAttempt]) -> int:
+        """Copy rescored attempt scores to their history rows (matched on student and completion time)."""
+        scores = {(attempt.student_id, attempt.end_time): attempt.score for attempt in attempts}
+        rows = []
+        for row in TestAttemptHistory.objects.filter(
+            test_id=test_id,
+            student_id__in={attempt.student_id for attempt in attempts},
+            completed_at__in={attempt.end_time for attempt in attempts},
+        ).only('id', 'student_id', 'completed_at', 'score'):
+            score = scores.get((row.student_id, row.completed_at))
+            if score is not None and score != row.score:
+                row.score = score
+                rows.append(row)
+        TestAttemptHistory.objects.bulk_update(rows, ['score'])
+        return len(rows)
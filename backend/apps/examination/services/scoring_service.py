@@ -0,0 +1,140 @@
+# apps/examination/services/scoring_service.py
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from collections import defaultdict
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringService:
+    """Vectorized scoring shared by submission, `calculate_score` and re-grading.
+
+    Answers are encoded as a uint8 matrix (one row per attempt, one column per
+    question, 0 for blank) and compared against the encoded key vector, so a
+    whole batch of attempts is scored with a handful of array operations.
+    The score is `correct * w_correct + incorrect * w_incorrect + blank * w_blank`
+    with the weights taken from `SubmissionService.get_scoring_scheme`, so a
+    submit, `calculate_score` and a re-grade read a malformed scheme the same way.
+    """
+
+    LABELS = 'ABCD'
+    CODES = {label: code for code, label in enumerate(LABELS, start=1)}
+
+    @staticmethod
+    def get_weights(scoring_scheme: Optional[Mapping]) -> Tuple[float, float, float]:
+        """Return (correct, incorrect, blank) weights; missing values default to 1, 0 and 0."""
+        scoring_scheme = scoring_scheme if isinstance(scoring_scheme, Mapping) else {}
+        return (
+            float(scoring_scheme.get('correct', 1)),
+            float(scoring_scheme.get('incorrect', 0)),
+            float(scoring_scheme.get('blank', 0)),
+        )
+
+    @staticmethod
+    def encode(answer: Optional[str]) -> int:
+        return ScoringService.CODES.get((answer or '').upper(), 0)
+
+    @staticmethod
+    def encode_key(question_ids: Sequence[int], answer_key: Mapping[int, Mapping]) -> np.ndarray:
+        """Encode the correct answers of `question_ids` (in that order) as a key vector."""
+        return np.fromiter(
+            (ScoringService.encode(answer_key[q]['correct_answer']) for q in question_ids),
+            dtype=np.uint8, count=len(question_ids)
+        )
+
+    @staticmethod
+    def score_matrix(
+        answers: np.ndarray,
+        key: np.ndarray,
+        scoring_scheme: Optional[Mapping]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score a batch of encoded answer sheets.
+
+        Args:
+            answers: uint8 array of shape (attempts, questions); 0 means blank.
+            key: uint8 array of shape (questions,) with the correct codes.
+            scoring_scheme: The test's scoring scheme.
+
+        Returns:
+            A tuple of (scores, correct counts, incorrect counts), one entry per row.
+        """
+        w_correct, w_incorrect, w_blank = ScoringService.get_weights(scoring_scheme)
+        answers = np.atleast_2d(answers)
+        answered = answers != 0
+        correct = (answers == key) & answered
+        correct_count = correct.sum(axis=1)
+        incorrect_count = answered.sum(axis=1) - correct_count
+        blank_count = answers.shape[1] - correct_count - incorrect_count
+        scores = correct_count * w_correct + incorrect_count * w_incorrect + blank_count * w_blank
+        return scores, correct_count, incorrect_count
+
+    @staticmethod
+    def build_matrix(
+        question_ids: Sequence[int],
+        sheets: Iterable[Iterable[Tuple[int, Optional[str]]]]
+    ) -> np.ndarray:
+        """Encode `(question_id, answer)` pairs per attempt into an answer matrix.
+
+        Answers to questions outside `question_ids` are ignored and unanswered
+        questions stay blank.
+        """
+        column = {question_id: i for i, question_id in enumerate(question_ids)}
+        sheets = list(sheets)
+        answers = np.zeros((len(sheets), len(question_ids)), dtype=np.uint8)
+        for row, sheet in enumerate(sheets):
+            for question_id, answer in sheet:
+                col = column.get(question_id)
+                if col is not None:
+                    answers[row, col] = ScoringService.encode(answer)
+        return answers
+
+    @staticmethod
+    def score_sheet(
+        answer_key: Mapping[int, Mapping],
+        sheet: Iterable[Tuple[int, Optional[str]]],
+        scoring_scheme: Optional[Mapping]
+    ) -> float:
+        """Score a single attempt; the one-row case of `score_attempts`."""
+        question_ids = list(answer_key)
+        if not question_ids:
+            return 0
+        answers = ScoringService.build_matrix(question_ids, [sheet])
+        scores, _, _ = ScoringService.score_matrix(
+            answers, ScoringService.encode_key(question_ids, answer_key), scoring_scheme
+        )
+        return float(scores[0])
+
+    @staticmethod
+    def score_attempts(test, attempt_ids: Sequence[int], answer_key: Optional[Mapping] = None) -> Dict[int, Tuple[float, int]]:
+        """Score many attempts of one test with two queries.
+
+        Returns:
+            {attempt_id: (score, correct count)} for every id in `attempt_ids`.
+        """
+        from apps.examination.models import StudentResponse
+        from apps.examination.services.submission_service import SubmissionService
+
+        attempt_ids = list(attempt_ids)
+        if answer_key is None:
+            answer_key = SubmissionService.load_answer_key(test)
+        question_ids = list(answer_key)
+        if not attempt_ids or not question_ids:
+            return {attempt_id: (0, 0) for attempt_id in attempt_ids}
+
+        sheets: Dict[int, List[Tuple[int, Optional[str]]]] = defaultdict(list)
+        rows = StudentResponse.objects.filter(attempt_id__in=attempt_ids).values_list(
+            'attempt_id', 'question_id', 'selected_answer'
+        )
+        for attempt_id, question_id, answer in rows:
+            sheets[attempt_id].append((question_id, answer))
+
+        answers = ScoringService.build_matrix(question_ids, (sheets.get(a, ()) for a in attempt_ids))
+        scores, correct_count, _ = ScoringService.score_matrix(
+            answers, ScoringService.encode_key(question_ids, answer_key),
+            SubmissionService.get_scoring_scheme(test)
+        )
+        return {
+            attempt_id: (float(score), int(correct))
+            for attempt_id, score, correct in zip(attempt_ids, scores, correct_count)
+        }
@@ -0,0 +1,96 @@
+# apps/examination/services/shuffle_service.py
+from typing import Any, Dict, List, Optional, Sequence
+from apps.examination.models import TestAttempt
+import hashlib
+import random
+
+
+class ShuffleService:
+    """Deterministic per-attempt question and option shuffling.
+
+    The seed is derived from (attempt id, test version pinned at start), so
+    the same permutation can be recomputed at delivery and at grading time
+    without storing it. Question order and each question's option labels are
+    permuted with Fisher–Yates; students answer in displayed labels, which are
+    mapped back to the original labels before grading. Attempts without a
+    pinned version (started before shuffling existed) are served unshuffled.
+    """
+
+    @staticmethod
+    def _rng(*parts) -> random.Random:
+        digest = hashlib.sha256(':'.join(str(p) for p in parts).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    @staticmethod
+    def _fisher_yates(items: Sequence, rng: random.Random) -> List:
+        items = list(items)
+        for i in range(len(items) - 1, 0, -1):
+            j = rng.randint(0, i)
+            items[i], items[j] = items[j], items[i]
+        return items
+
+    @staticmethod
+    def get_seed(attempt: TestAttempt) -> Optional[str]:
+        """Return the shuffle seed for an attempt, or None if it is served unshuffled."""
+        if attempt.test_version is None:
+            return None
+        return f"{attempt.id}:{attempt.test_version}"
+
+    @staticmethod
+    def option_order(seed: Optional[str], question_id: int, labels) -> List[str]:
+        """Return the original labels in display order for one question.
+
+        Displayed label `sorted(labels)[i]` shows the option originally labelled
+        `option_order(...)[i]`.
+        """
+        labels = sorted(labels)
+        if seed is None:
+            return labels
+        return ShuffleService._fisher_yates(labels, ShuffleService._rng(seed, question_id))
+
+    @staticmethod
+    def to_original(seed: Optional[str], question_id: int, labels, answer: str) -> str:
+        """Map a displayed answer label back to the question's original label."""
+        if seed is None or not answer:
+            return answer
+        display = sorted(labels)
+        if answer not in display:
+            return answer
+        return ShuffleService.option_order(seed, question_id, display)[display.index(answer)]
+
+    @staticmethod
+    def to_display(seed: Optional[str], question_id: int, labels, answer: str) -> str:
+        """Map an original answer label to the label shown to the student."""
+        if seed is None or not answer:
+            return answer
+        order = ShuffleService.option_order(seed, question_id, labels)
+        if answer not in order:
+            return answer
+        return sorted(labels)[order.index(answer)]
+
+    @staticmethod
+    def shuffle_questions(attempt: TestAttempt, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the packet questions as this attempt should see them.
+
+        Args:
+            attempt: The attempt being delivered.
+            questions: Packet questions (`id`, `question_text`, `options`) in canonical order.
+
+        Returns:
+            New question dicts in shuffled order with relabelled options; the
+            cached packet itself is never modified.
+        """
+        seed = ShuffleService.get_seed(attempt)
+        if seed is None:
+            return questions
+        shuffled = []
+        for question in ShuffleService._fisher_yates(questions, ShuffleService._rng(seed)):
+            options = question['options']
+            display = sorted(options)
+            order = ShuffleService.option_order(seed, question['id'], display)
+            shuffled.append({
+                'id': question['id'],
+                'question_text': question['question_text'],
+                'options': {label: options[original] for label, original in zip(display, order)},
+            })
+        return shuffled
@@ -0,0 +1,173 @@
+# apps/examination/services/submission_service.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from apps.examination.models import TestAttempt, StudentResponse
+from apps.examination.services.shuffle_service import ShuffleService
+from apps.examination.services.scoring_service import ScoringService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionService:
+    """Grades and persists a whole answer sheet in a single pass.
+
+    The answer key for the test is loaded with one query, every answer is
+    graded in memory and all StudentResponse rows are written with one bulk
+    insert, so the cost of a submit no longer grows with per-answer queries.
+    """
+
+    DEFAULT_SCORING_SCHEME = {'correct': 1, 'incorrect': 0}
+
+    @staticmethod
+    def load_answer_key(test) -> Dict[int, Dict[str, Any]]:
+        """Return {question_id: {'correct_answer', 'options'}} for a test in one query."""
+        rows = test.questions.values_list('id', 'correct_answer', 'options')
+        return {
+            question_id: {
+                'correct_answer': (correct_answer or '').upper(),
+                'options': set(options or {}),
+            }
+            for question_id, correct_answer, options in rows
+        }
+
+    @staticmethod
+    def get_scoring_scheme(test) -> Dict[str, float]:
+        """Return the test's scoring scheme, falling back to the default for invalid data."""
+        scoring_scheme = test.scoring_scheme or SubmissionService.DEFAULT_SCORING_SCHEME
+        if not isinstance(scoring_scheme, dict) or 'correct' not in scoring_scheme:
+            logger.warning(f"Invalid scoring_scheme for test {test.id}: {scoring_scheme}")
+            scoring_scheme = SubmissionService.DEFAULT_SCORING_SCHEME
+        return scoring_scheme
+
+    @staticmethod
+    def responses_from_form(raw, question_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Build the response list from the `answer_<id>`/`time_taken_<id>` form fields."""
+        resp_list = []
+        for question_id in question_ids:
+            resp_list.append({
+                'question': question_id,
+                'selected_answer': raw.get(f'answer_{question_id}', '').strip().upper(),
+                'time_taken': raw.get(f'time_taken_{question_id}', 0),
+            })
+        return resp_list
+
+    @staticmethod
+    def grade(
+        attempt: TestAttempt,
+        answer_key: Dict[int, Dict[str, Any]],
+        resp_list: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[StudentResponse], int, int]:
+        """Grade an answer sheet in memory.
+
+        Args:
+            attempt: The attempt the responses belong to.
+            answer_key: Mapping produced by `load_answer_key`.
+            resp_list: Items with `question`, `selected_answer` and `time_taken`;
+                answers are in the attempt's displayed (shuffled) labels.
+
+        Returns:
+            A tuple of (unsaved StudentResponse rows, correct count, total time).
+
+        Raises:
+            serializers.ValidationError: If an answer is not one of the question options.
+        """
+        seed = ShuffleService.get_seed(attempt)
+        graded = {}
+        for item in resp_list:
+            try:
+                question_id = int(item['question'])
+            except (KeyError, TypeError, ValueError):
+                logger.error(f"Invalid question reference {item.get('question')} for attempt {attempt.id}")
+                continue
+            key = answer_key.get(question_id)
+            if key is None:
+                logger.error(f"Question {question_id} does not belong to test {attempt.test_id}")
+                continue
+
+            ans = (item.get('selected_answer') or '').strip().upper()
+            if ans and ans not in key['options']:
+                raise serializers.ValidationError({"responses": f"Invalid answer option for question {question_id}."})
+            ans = ShuffleService.to_original(seed, question_id, key['options'], ans)
+            try:
+                time_taken = int(item.get('time_taken') or 0)
+            except (TypeError, ValueError):
+                time_taken = 0
+            # The last answer for a question wins, matching the delete-then-insert semantics.
+            graded[question_id] = (ans, bool(ans) and ans == key['correct_answer'], max(time_taken, 1))
+
+        rows = []
+        correct_count = 0
+        total_time = 0
+        for question_id, (ans, is_correct, time_taken) in graded.items():
+            correct_count += is_correct
+            total_time += time_taken
+            rows.append(StudentResponse(
+                attempt=attempt,
+                question_id=question_id,
+                selected_answer=ans,
+                is_correct=is_correct,
+                time_taken=time_taken,
+            ))
+        return rows, correct_count, total_time
+
+    @staticmethod
+    def submit(
+        attempt: TestAttempt,
+        resp_list: Optional[Iterable[Dict[str, Any]]] = None,
+        raw_form=None,
+        end_time=None,
+        autosaved: Optional[List[Dict[str, Any]]] = None
+    ) -> TestAttempt:
+        """Grade, persist and score an attempt in one transaction.
+
+        Either `resp_list` (JSON payload) or `raw_form` (the attempt page form)
+        supplies the answers; the form is parsed against the answer key so the
+        test's questions are not loaded a second time. `autosaved` answers are
+        graded first, so answers in the payload override them; blank payload
+        answers do not.
+        """
+        test = attempt.test
+        answer_key = SubmissionService.load_answer_key(test)
+        scoring_scheme = SubmissionService.get_scoring_scheme(test)
+        total_q = len(answer_key)
+
+        if not resp_list and raw_form is not None:
+            resp_list = SubmissionService.responses_from_form(raw_form, answer_key.keys())
+        resp_list = list(resp_list or [])
+        if autosaved:
+            # A blank field in the payload (e.g. the page was reloaded on another device)
+            # must not erase an answer the server already holds.
+            answered = {str(item['question']) for item in autosaved if item.get('selected_answer')}
+            resp_list = list(autosaved) + [
+                item for item in resp_list
+                if (item.get('selected_answer') or '').strip() or str(item.get('question')) not in answered
+            ]
+        rows, correct_count, total_time = SubmissionService.grade(attempt, answer_key, resp_list)
+
+        with transaction.atomic():
+            # Lock the attempt row so a double submit cannot write two answer sheets.
+            locked = TestAttempt.objects.select_for_update().only('id', 'end_time').get(pk=attempt.pk)
+            if locked.end_time:
+                raise serializers.ValidationError({"error": "Attempt already submitted"})
+
+            StudentResponse.objects.filter(attempt=attempt).delete()
+            StudentResponse.objects.bulk_create(rows)
+
+            attempt.performance_metrics = {
+                'accuracy': correct_count / total_q if total_q else 0,
+                'avg_time_per_question': total_time / total_q if total_q else 0
+            }
+            attempt.end_time = end_time or timezone.now()
+            attempt.score = ScoringService.score_sheet(
+                answer_key, ((r.question_id, r.selected_answer) for r in rows), scoring_scheme
+            )
+            attempt.save()
+
+        logger.info(
+            f"Attempt {attempt.id} graded in one pass: {len(rows)} responses, "
+            f"correct={correct_count}/{total_q}, score={attempt.score}"
+        )
+        return attempt
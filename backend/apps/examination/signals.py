@@ -1,8 +1,14 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
 from .models import TestAttempt, Test
+from .services.exam_packet_service import ExamPacketService
+from apps.content.models import Question
 from apps.analytics.models import TestAnalytics, StudentProgress
-from apps.analytics.tasks import update_test_analytics, update_student_progress, record_test_attempt_history
+from apps.analytics.tasks import (
+    apply_attempt_analytics, apply_topic_mastery, update_leaderboards, schedule_student_progress,
+    record_test_attempt_history
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,41 +33,96 @@ def update_analytics(sender, instance, **kwargs):
 
     # Check if the instance meets the conditions
     if instance.end_time and instance.score is not None:
-        logger.info(f'Processing TestAttempt {instance.id} for test {instance.test.id} (score: {instance.score}, end_time: {instance.end_time})')
-        
-        # Update TestAnalytics
-        logger.info(f'Enqueuing update_test_analytics task for test {instance.test.id}')
-        try:
-            task = update_test_analytics.delay(instance.test.id)
-            logger.info(f'update_test_analytics task enqueued with ID: {task.id}')
-        except Exception as e:
-            logger.error(f'Failed to enqueue update_test_analytics task: {str(e)}')
-
-        # Update StudentProgress
-        if hasattr(instance.test, 'subject') and instance.test.subject:
-            logger.info(f'Test has subject: {instance.test.subject.id} ({instance.test.subject.name})')
-            logger.info(f'Enqueuing update_student_progress task for student {instance.student.id}, subject {instance.test.subject.id}')
-            try:
-                # Ensure StudentProgress exists
-                progress, created = StudentProgress.objects.get_or_create(
-                    student_id=instance.student.id,
-                    subject_id=instance.test.subject.id
-                )
-                if created:
-                    logger.info(f'Created StudentProgress for student {instance.student.id}, subject {instance.test.subject.id}')
-                task = update_student_progress.delay(instance.student.id, instance.test.subject.id)
-                logger.info(f'update_student_progress task enqueued with ID: {task.id}')
-            except Exception as e:
-                logger.error(f'Failed to enqueue update_student_progress task: {str(e)}')
-        else:
-            logger.warning(f'No subject associated with test {instance.test.id} or subject is None')
-
-        # Record history
-        logger.info(f'Enqueuing record_test_attempt_history task for attempt {instance.id}')
+        # Submissions are saved inside a transaction; enqueue only once the responses are committed.
+        transaction.on_commit(lambda: enqueue_attempt_tasks(instance))
+    else:
+        logger.warning(f'TestAttempt {instance.id} not complete: end_time={instance.end_time}, score={instance.score}')
+
+
+def enqueue_attempt_tasks(instance):
+    """Queue analytics, progress and history updates for a completed attempt."""
+    logger.info(f'Processing TestAttempt {instance.id} for test {instance.test.id} (score: {instance.score}, end_time: {instance.end_time})')
+    
+    # Add the attempt to the test's incremental analytics; compaction folds it into TestAnalytics
+    logger.info(f'Enqueuing apply_attempt_analytics task for attempt {instance.id}')
+    try:
+        task = apply_attempt_analytics.delay(instance.id)
+        logger.info(f'apply_attempt_analytics task enqueued with ID: {task.id}')
+    except Exception as e:
+        logger.error(f'Failed to enqueue apply_attempt_analytics task: {str(e)}')
+
+    # Fold the attempt into the student's topic mastery before progress is recomputed from it
+    logger.info(f'Enqueuing apply_topic_mastery task for attempt {instance.id}')
+    try:
+        task = apply_topic_mastery.delay(instance.id)
+        logger.info(f'apply_topic_mastery task enqueued with ID: {task.id}')
+    except Exception as e:
+        logger.error(f'Failed to enqueue apply_topic_mastery task: {str(e)}')
+
+    # Leaderboards keep each student's best score per test and the sum per subject
+    logger.info(f'Enqueuing update_leaderboards task for attempt {instance.id}')
+    try:
+        task = update_leaderboards.delay(instance.id)
+        logger.info(f'update_leaderboards task enqueued with ID: {task.id}')
+    except Exception as e:
+        logger.error(f'Failed to enqueue update_leaderboards task: {str(e)}')
+
+    # Update StudentProgress
+    if hasattr(instance.test, 'subject') and instance.test.subject:
+        logger.info(f'Test has subject: {instance.test.subject.id} ({instance.test.subject.name})')
+        logger.info(f'Enqueuing update_student_progress task for student {instance.student.id}, subject {instance.test.subject.id}')
         try:
-            task = record_test_attempt_history.delay(instance.id)
-            logger.info(f'record_test_attempt_history task enqueued with ID: {task.id}')
+            # Ensure StudentProgress exists
+            progress, created = StudentProgress.objects.get_or_create(
+                student_id=instance.student.id,
+                subject_id=instance.test.subject.id
+            )
+            if created:
+                logger.info(f'Created StudentProgress for student {instance.student.id}, subject {instance.test.subject.id}')
+            queued = schedule_student_progress(instance.student.id, instance.test.subject.id)
+            logger.info(f'update_student_progress {"scheduled" if queued else "coalesced into a pending run"}')
         except Exception as e:
-            logger.error(f'Failed to enqueue record_test_attempt_history task: {str(e)}')
+            logger.error(f'Failed to enqueue update_student_progress task: {str(e)}')
     else:
-        logger.warning(f'TestAttempt {instance.id} not complete: end_time={instance.end_time}, score={instance.score}')
+        logger.warning(f'No subject associated with test {instance.test.id} or subject is None')
+
+    # Record history
+    logger.info(f'Enqueuing record_test_attempt_history task for attempt {instance.id}')
+    try:
+        task = record_test_attempt_history.delay(instance.id)
+        logger.info(f'record_test_attempt_history task enqueued with ID: {task.id}')
+    except Exception as e:
+        logger.error(f'Failed to enqueue record_test_attempt_history task: {str(e)}')
+
+
+@receiver(m2m_changed, sender=Test.questions.through)
+def invalidate_exam_packet_on_questions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump the packet version when questions are added to or removed from a test."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            ExamPacketService.bump_version([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        ExamPacketService.bump_version(pk_set or [])
+    elif action == 'pre_clear':
+        ExamPacketService.bump_version(instance.tests.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Question)
+def detect_exam_packet_change(sender, instance, update_fields=None, **kwargs):
+    """Note whether the save changes anything delivered in or graded against the exam packet."""
+    fields = ExamPacketService.QUESTION_FIELDS
+    if instance._state.adding or (update_fields is not None and not set(update_fields) & set(fields)):
+        instance._exam_packet_changed = False
+        return
+    stored = Question.objects.filter(pk=instance.pk).values_list(*fields).first()
+    instance._exam_packet_changed = stored != tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(post_save, sender=Question)
+@receiver(pre_delete, sender=Question)
+def invalidate_exam_packet_on_question_change(sender, instance, **kwargs):
+    """Bump the packet version of every test containing the question if its text, options or answer changed."""
+    if kwargs.get('created') or not getattr(instance, '_exam_packet_changed', True):
+        return
+    updated = ExamPacketService.bump_version(instance.tests.values_list('id', flat=True))
+    logger.debug(f'Question {instance.id} changed; bumped exam packet version for {updated} tests')
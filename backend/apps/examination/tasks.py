@@ -0,0 +1,67 @@
+from celery import shared_task
+from django.conf import settings
+from django.urls import reverse
+from .services.autosave_service import AutosaveService
+from .services.regrade_service import RegradeService
+from .services.export_service import ExportService
+from apps.content.models import Question
+from apps.analytics.tasks import schedule_test_analytics
+from apps.analytics.services.leaderboard_service import LeaderboardService
+from apps.notifications.models import Notification
+from .models import Test
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def flush_autosaved_attempts():
+    logger.info('Starting flush_autosaved_attempts')
+    try:
+        stats = AutosaveService.sweep()
+        logger.info(f'Flushed autosaved attempts: {stats}')
+        return stats
+    except Exception as e:
+        logger.error(f'Error in flush_autosaved_attempts: {str(e)}')
+        raise
+
+@shared_task
+def regrade_question(question_id):
+    logger.info(f'Starting regrade_question for question {question_id}')
+    try:
+        stats = RegradeService.regrade_question(question_id)
+    except Question.DoesNotExist:
+        logger.warning(f'No Question found for question {question_id}')
+        return None
+    except Exception as e:
+        logger.error(f'Error in regrade_question for question {question_id}: {str(e)}')
+        raise
+
+    # One analytics refresh per affected test, not one per attempt
+    for test_id in stats['test_ids']:
+        schedule_test_analytics(test_id)
+    # Scores may have gone down, so bests are forced back in line with the database
+    for test_id, subject_id in Test.objects.filter(id__in=stats['test_ids']).values_list('id', 'subject_id'):
+        LeaderboardService.resync_test(test_id, subject_id)
+    logger.info(f'Re-graded question {question_id}; refreshed analytics for tests {stats["test_ids"]}')
+    return stats
+
+@shared_task
+def export_test_results(test_id, user_id, kind='attempts', output='csv'):
+    logger.info(f'Starting export_test_results for test {test_id} ({kind}, {output})')
+    try:
+        test = Test.objects.get(pk=test_id)
+        name, rows = ExportService.write_file(test, kind, output)
+    except Test.DoesNotExist:
+        logger.warning(f'No Test found for test {test_id}')
+        return None
+    except Exception as e:
+        logger.error(f'Error in export_test_results for test {test_id}: {str(e)}')
+        raise
+
+    Notification.objects.create(
+        user_id=user_id,
+        message=f'Your {kind} export of "{test.title}" is ready ({rows} rows): '
+                f'{reverse("test_export_download", args=[test.id, name])}',
+        notification_type=Notification.NotificationType.GENERAL
+    )
+    return name
@@ -1,3 +1,502 @@
-from django.test import TestCase
+# examination/tests.py
+from datetime import timedelta
+from unittest import mock
+import gzip
+import json
+import os
+import tempfile
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework import serializers
+from apps.accounts.models import User
+from apps.common.choices.role import Role
+from apps.content.models import Subject, Topic, Question
+from .models import Test, TestAttempt, StudentResponse
+from .services.submission_service import SubmissionService
+from .services.autosave_service import AutosaveService
+from .services.exam_packet_service import ExamPacketService
+from .services.shuffle_service import ShuffleService
+from .services.scoring_service import ScoringService
+from .services.regrade_service import RegradeService
+from .services.export_service import ExportService
+from .tasks import regrade_question, export_test_results
+from apps.analytics.models import TopicMastery, TestAttemptHistory, TestRollup, StudentSubjectRollup
+from apps.analytics.services.rollup_service import RollupService
+from apps.analytics.tasks import record_test_attempt_history
+from apps.analytics.services.mastery_service import MasteryService
+from apps.content.services.question_index_service import QuestionIndexService
+from apps.notifications.models import Notification
+from apps.common.testing import delete_redis_keys
 
-# Create your tests here.
+
+class ExaminationTestMixin:
+    """Shared fixtures: one teacher test with four questions and a started attempt."""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@example.com', password='Test@1234', role=Role.STUDENT
+        )
+        self.subject = Subject.objects.create(name='Physics')
+        self.topic = Topic.objects.create(subject=self.subject, name='Motion')
+        self.questions = []
+        for i, correct in enumerate(['A', 'B', 'C', 'D']):
+            question = Question.objects.create(
+                question_text=f'Question number {i}',
+                difficulty='E',
+                options={'A': 'one', 'B': 'two', 'C': 'three', 'D': 'four'},
+                correct_answer=correct,
+                created_by=self.teacher,
+            )
+            question.topics.add(self.topic)
+            self.questions.append(question)
+        self.test = Test.objects.create(
+            title='Kinematics', created_by=self.teacher, subject=self.subject,
+            scoring_scheme={'correct': 2, 'incorrect': 0}
+        )
+        self.test.questions.set(self.questions)
+        self.attempt = TestAttempt.objects.create(
+            student=self.student, test=self.test, start_time=timezone.now()
+        )
+
+
+class SubmissionServiceTest(ExaminationTestMixin, TestCase):
+    def test_submit_grades_in_one_pass(self):
+        resp_list = [
+            {'question': self.questions[0].id, 'selected_answer': 'a', 'time_taken': 10},
+            {'question': self.questions[1].id, 'selected_answer': 'C', 'time_taken': 20},
+            {'question': self.questions[2].id, 'selected_answer': '', 'time_taken': 0},
+        ]
+        attempt = SubmissionService.submit(self.attempt, resp_list=resp_list)
+
+        self.assertEqual(attempt.score, 2)
+        self.assertIsNotNone(attempt.end_time)
+        self.assertEqual(attempt.performance_metrics['accuracy'], 0.25)
+        responses = {r.question_id: r for r in StudentResponse.objects.filter(attempt=attempt)}
+        self.assertEqual(len(responses), 3)
+        self.assertTrue(responses[self.questions[0].id].is_correct)
+        self.assertFalse(responses[self.questions[1].id].is_correct)
+        self.assertEqual(responses[self.questions[2].id].time_taken, 1)
+
+    def test_submit_uses_constant_queries(self):
+        resp_list = [
+            {'question': q.id, 'selected_answer': q.correct_answer, 'time_taken': 5} for q in self.questions
+        ]
+        # answer key, lock, delete, one bulk insert and the attempt update, plus the savepoint pair
+        with self.assertNumQueries(7):
+            SubmissionService.submit(self.attempt, resp_list=resp_list)
+
+    def test_submit_rejects_invalid_option(self):
+        with self.assertRaises(serializers.ValidationError):
+            SubmissionService.submit(
+                self.attempt, resp_list=[{'question': self.questions[0].id, 'selected_answer': 'E'}]
+            )
+        self.assertFalse(StudentResponse.objects.filter(attempt=self.attempt).exists())
+
+    def test_submit_twice_is_rejected(self):
+        SubmissionService.submit(self.attempt, resp_list=[])
+        with self.assertRaises(serializers.ValidationError):
+            SubmissionService.submit(TestAttempt.objects.get(pk=self.attempt.pk), resp_list=[])
+
+
+class AutosaveServiceTest(ExaminationTestMixin, TestCase):
+    def tearDown(self):
+        # the Redis DB is shared with the app: drop only this attempt's sheet
+        AutosaveService.clear(self.attempt.id)
+
+    def test_deltas_merge_and_submit_prefers_payload(self):
+        AutosaveService.save_answers(self.attempt.id, self.student, [
+            {'question': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 10},
+            {'question': self.questions[1].id, 'selected_answer': 'A', 'time_taken': 10},
+        ])
+        # later saves only touch Redis
+        with self.assertNumQueries(0):
+            saved = AutosaveService.save_answers(self.attempt.id, self.student, [
+                {'question': self.questions[1].id, 'selected_answer': 'B', 'time_taken': 15},
+            ])
+        self.assertEqual(saved, 2)
+
+        attempt = AutosaveService.submit(
+            self.attempt, resp_list=[
+                {'question': self.questions[0].id, 'selected_answer': '', 'time_taken': 5},
+                {'question': self.questions[2].id, 'selected_answer': 'C', 'time_taken': 5},
+            ]
+        )
+        self.assertEqual(attempt.score, 6)
+        self.assertEqual(StudentResponse.objects.filter(attempt=attempt).count(), 3)
+        self.assertEqual(AutosaveService.get_sheet(attempt.id), [])
+
+    def test_save_rejects_other_student(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='Test@1234', role=Role.STUDENT
+        )
+        with self.assertRaises(TestAttempt.DoesNotExist):
+            AutosaveService.save_answers(self.attempt.id, other, [{'question': self.questions[0].id}])
+
+    def test_sweep_flushes_and_finalizes(self):
+        AutosaveService.save_answers(self.attempt.id, self.student, [
+            {'question': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 10},
+        ])
+        stats = AutosaveService.sweep()
+        self.assertEqual(stats['flushed'], 1)
+        self.assertTrue(StudentResponse.objects.filter(attempt=self.attempt, is_correct=True).exists())
+        self.assertIsNone(TestAttempt.objects.get(pk=self.attempt.pk).end_time)
+
+        TestAttempt.objects.filter(pk=self.attempt.pk).update(
+            start_time=timezone.now() - timedelta(minutes=self.test.duration + 1)
+        )
+        stats = AutosaveService.sweep()
+        self.assertEqual(stats['finalized'], 1)
+        attempt = TestAttempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(attempt.score, 2)
+        self.assertIsNotNone(attempt.end_time)
+
+    def test_save_during_flush_keeps_sheet_dirty(self):
+        AutosaveService.save_answers(self.attempt.id, self.student, [
+            {'question': self.questions[0].id, 'selected_answer': 'B', 'time_taken': 10},
+        ])
+        grade = SubmissionService.grade
+
+        def grade_then_save(*args, **kwargs):
+            graded = grade(*args, **kwargs)
+            AutosaveService.save_answers(self.attempt.id, self.student, [
+                {'question': self.questions[1].id, 'selected_answer': 'A', 'time_taken': 5},
+            ])
+            return graded
+
+        with mock.patch.object(SubmissionService, 'grade', side_effect=grade_then_save):
+            self.assertEqual(AutosaveService.flush(self.attempt), 1)
+        self.assertEqual(AutosaveService.flush(self.attempt), 2)
+        self.assertEqual(AutosaveService.flush(self.attempt), 0)
+        self.assertEqual(StudentResponse.objects.filter(attempt=self.attempt).count(), 2)
+
+    def test_flush_after_submit_keeps_final_sheet(self):
+        AutosaveService.save_answers(self.attempt.id, self.student, [
+            {'question': self.questions[0].id, 'selected_answer': 'B', 'time_taken': 10},
+        ])
+        # The sweep loaded the attempt while it was open; the student submits before it flushes
+        stale = TestAttempt.objects.select_related('test').get(pk=self.attempt.pk)
+        SubmissionService.submit(self.attempt, resp_list=[
+            {'question': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 12},
+            {'question': self.questions[1].id, 'selected_answer': 'B', 'time_taken': 8},
+        ])
+
+        self.assertEqual(AutosaveService.flush(stale), 0)
+        rows = {r.question_id: r.selected_answer for r in StudentResponse.objects.filter(attempt=self.attempt)}
+        self.assertEqual(rows, {self.questions[0].id: 'A', self.questions[1].id: 'B'})
+        self.assertEqual(TestAttempt.objects.get(pk=self.attempt.pk).score, 4)
+
+
+class ExamPacketServiceTest(ExaminationTestMixin, TestCase):
+    def tearDown(self):
+        delete_redis_keys(f'{ExamPacketService.KEY_PREFIX}:{self.test.id}:*')
+
+    def test_packet_is_cached_without_answers(self):
+        test = Test.objects.get(pk=self.test.pk)
+        packet = ExamPacketService.get_packet(test)
+        self.assertEqual([q['id'] for q in packet['questions']], sorted(q.id for q in self.questions))
+        self.assertNotIn('correct_answer', packet['questions'][0])
+        with self.assertNumQueries(0):
+            self.assertEqual(ExamPacketService.get_packet(test), packet)
+
+    def test_version_bumps_on_question_changes(self):
+        version = Test.objects.get(pk=self.test.pk).version
+        self.questions[0].question_text = 'Reworded question'
+        self.questions[0].save()
+        self.assertEqual(Test.objects.get(pk=self.test.pk).version, version + 1)
+
+        self.test.questions.remove(self.questions[3])
+        test = Test.objects.get(pk=self.test.pk)
+        self.assertEqual(test.version, version + 2)
+        packet = ExamPacketService.get_packet(test)
+        self.assertEqual(len(packet['questions']), 3)
+        self.assertEqual(packet['questions'][0]['question_text'], 'Reworded question')
+
+    def test_version_survives_stale_saves_and_ignores_metadata_edits(self):
+        stale = Test.objects.get(pk=self.test.pk)
+        version = stale.version
+        self.questions[0].is_active = False
+        self.questions[0].metadata = {'source_page': 4}
+        self.questions[0].save()
+        self.assertEqual(Test.objects.get(pk=self.test.pk).version, version)
+
+        self.questions[0].options = {**self.questions[0].options, 'A': 'uno'}
+        self.questions[0].save()
+        stale.title = 'Renamed'
+        stale.save()
+        test = Test.objects.get(pk=self.test.pk)
+        self.assertEqual((test.title, test.version), ('Renamed', version + 1))
+
+
+class ShuffleServiceTest(ExaminationTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.attempt.test_version = self.test.version
+        self.attempt.save()
+        self.packet_questions = ExamPacketService.build(self.test)['questions']
+
+    def test_shuffle_is_deterministic_and_complete(self):
+        first = ShuffleService.shuffle_questions(self.attempt, self.packet_questions)
+        second = ShuffleService.shuffle_questions(self.attempt, self.packet_questions)
+        self.assertEqual(first, second)
+        self.assertEqual(sorted(q['id'] for q in first), sorted(q['id'] for q in self.packet_questions))
+        for question in first:
+            self.assertEqual(sorted(question['options'].values()), ['four', 'one', 'three', 'two'])
+        # The cached packet is left untouched
+        self.assertEqual(self.packet_questions[0]['options']['A'], 'one')
+
+    def test_unpinned_attempt_is_not_shuffled(self):
+        self.attempt.test_version = None
+        self.assertIs(ShuffleService.shuffle_questions(self.attempt, self.packet_questions), self.packet_questions)
+
+    def test_grader_maps_displayed_labels_back(self):
+        shuffled = ShuffleService.shuffle_questions(self.attempt, self.packet_questions)
+        correct_text = {q.id: q.options[q.correct_answer] for q in self.questions}
+        resp_list = []
+        for question in shuffled:
+            label = next(l for l, text in question['options'].items() if text == correct_text[question['id']])
+            resp_list.append({'question': question['id'], 'selected_answer': label, 'time_taken': 5})
+        attempt = SubmissionService.submit(self.attempt, resp_list=resp_list)
+        self.assertEqual(attempt.score, 8)
+        stored = dict(StudentResponse.objects.filter(attempt=attempt).values_list('question_id', 'selected_answer'))
+        self.assertEqual(stored, {q.id: q.correct_answer for q in self.questions})
+
+
+class ScoringServiceTest(ExaminationTestMixin, TestCase):
+    def test_matches_correct_count_when_incorrect_is_zero(self):
+        rng = np.random.default_rng(7)
+        key = rng.integers(1, 5, size=20, dtype=np.uint8)
+        answers = rng.integers(0, 5, size=(500, 20), dtype=np.uint8)
+        scheme = {'correct': 2, 'incorrect': 0}
+        scores, correct, _ = ScoringService.score_matrix(answers, key, scheme)
+        expected = [sum(1 for a, k in zip(row, key) if a and a == k) * 2 for row in answers.tolist()]
+        self.assertEqual(scores.tolist(), expected)
+        self.assertEqual((correct * 2).tolist(), expected)
+
+    def test_negative_marking(self):
+        self.test.scoring_scheme = {'correct': 1, 'incorrect': -0.25, 'blank': 0}
+        self.test.save()
+        resp_list = [
+            {'question': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 5},
+            {'question': self.questions[1].id, 'selected_answer': 'A', 'time_taken': 5},
+            {'question': self.questions[2].id, 'selected_answer': 'A', 'time_taken': 5},
+        ]
+        attempt = SubmissionService.submit(self.attempt, resp_list=resp_list)
+        self.assertEqual(attempt.score, 0.5)
+
+        # calculate_score goes through the same scoring path
+        attempt.score = None
+        attempt.calculate_score()
+        self.assertEqual(attempt.score, 0.5)
+
+    def test_scheme_without_correct_falls_back_everywhere(self):
+        self.test.scoring_scheme = {'incorrect': -0.25}
+        self.test.save()
+        resp_list = [
+            {'question': self.questions[0].id, 'selected_answer': 'A', 'time_taken': 5},
+            {'question': self.questions[1].id, 'selected_answer': 'A', 'time_taken': 5},
+        ]
+        attempt = SubmissionService.submit(self.attempt, resp_list=resp_list)
+        self.assertEqual(attempt.score, 1)
+        self.assertEqual(ScoringService.score_attempts(self.test, [attempt.id]), {attempt.id: (1, 1)})
+
+
+class RegradeServiceTest(ExaminationTestMixin, TestCase):
+    def tearDown(self):
+        get_redis_connection('default').delete(
+            *[f"{MasteryService.APPLIED_PREFIX}{attempt.id}" for attempt in self.attempts]
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.attempts = [self.attempt] + [
+            TestAttempt.objects.create(student=self.student, test=self.test, start_time=timezone.now())
+            for _ in range(2)
+        ]
+        for attempt, answer in zip(self.attempts, ['A', 'B', '']):
+            SubmissionService.submit(attempt, resp_list=[
+                {'question': self.questions[0].id, 'selected_answer': answer, 'time_taken': 5},
+                {'question': self.questions[1].id, 'selected_answer': 'B', 'time_taken': 5},
+            ])
+
+    def test_regrade_updates_responses_and_scores(self):
+        for attempt in self.attempts:
+            MasteryService.apply_attempt(attempt.id)
+        self.assertEqual(TopicMastery.objects.get(student=self.student, topic=self.topic).correct, 4)
+        Question.objects.filter(pk=self.questions[0].pk).update(correct_answer='B')
+        stats = RegradeService.regrade_question(self.questions[0].id, chunk_size=2)
+
+        self.assertEqual(stats['responses'], 3)
+        self.assertEqual(stats['attempts'], 3)
+        self.assertEqual(stats['test_ids'], [self.test.id])
+        scores = [TestAttempt.objects.get(pk=a.pk).score for a in self.attempts]
+        self.assertEqual(scores, [2, 4, 2])
+        self.assertEqual(
+            StudentResponse.objects.filter(question=self.questions[0], is_correct=True).count(), 1
+        )
+        # the student lost one correct answer (A) and gained one (B) on the topic
+        self.assertEqual(TopicMastery.objects.get(student=self.student, topic=self.topic).correct, 4)
+
+    def test_regrade_rewrites_history_and_built_rollups(self):
+        for attempt in self.attempts:
+            record_test_attempt_history(attempt.id)
+        RollupService.build(until=timezone.now())
+        self.assertEqual(TestRollup.objects.get(granularity='D').score_sum, 8)
+        Question.objects.filter(pk=self.questions[0].pk).update(correct_answer='C')
+        stats = RegradeService.regrade_question(self.questions[0].id)
+
+        self.assertEqual(stats['history'], 1)
+        self.assertEqual(sorted(TestAttemptHistory.objects.values_list('score', flat=True)), [2, 2, 2])
+        for model in (TestRollup, StudentSubjectRollup):
+            for bucket in model.objects.all():
+                self.assertEqual((bucket.attempt_count, bucket.score_sum, bucket.best_score), (3, 6, 2))
+        # an incremental build afterwards must not count the rows again
+        RollupService.build(until=timezone.now())
+        self.assertEqual(TestRollup.objects.get(granularity='W').score_sum, 6)
+
+    def test_task_refreshes_analytics_once_per_test(self):
+        Question.objects.filter(pk=self.questions[0].pk).update(correct_answer='B')
+        with mock.patch('apps.examination.tasks.schedule_test_analytics') as schedule:
+            regrade_question(self.questions[0].id)
+        schedule.assert_called_once_with(self.test.id)
+
+
+class ExportServiceTest(ExaminationTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        SubmissionService.submit(self.attempt, resp_list=[
+            {'question': question.id, 'selected_answer': answer, 'time_taken': 5}
+            for question, answer in zip(self.questions, ['A', 'A', 'C', ''])
+        ])
+        # still in progress, so it is left out of the export
+        TestAttempt.objects.create(student=self.student, test=self.test, start_time=timezone.now())
+
+    def test_lines_are_read_in_batches(self):
+        with mock.patch.object(ExportService, 'CHUNK_SIZE', 3):
+            lines = list(ExportService.iter_lines(self.test.id, 'responses', 'csv'))
+        self.assertEqual(lines[0].strip(), 'response_id,attempt_id,student_id,question_id,selected_answer,is_correct,time_taken')
+        self.assertEqual(len(lines), 5)
+
+        rows = [json.loads(line) for line in ExportService.iter_lines(self.test.id, 'attempts', 'ndjson')]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['attempt_id'], rows[0]['student'], rows[0]['score']), (self.attempt.id, 'student', 4))
+
+    def test_background_export_writes_gzip_and_notifies(self):
+        with tempfile.TemporaryDirectory() as export_root, override_settings(EXPORT_ROOT=export_root):
+            name = export_test_results(self.test.id, self.teacher.id, 'responses', 'ndjson')
+            with gzip.open(os.path.join(export_root, name), 'rt') as handle:
+                self.assertEqual(len(handle.readlines()), 4)
+        url = reverse('test_export_download', args=[self.test.id, name])
+        self.assertIn(url, Notification.objects.get(user=self.teacher).message)
+        # the name carries a random token, so it cannot be derived from the test id and time
+        self.assertRegex(name, rf'^test_{self.test.id}_responses_\d{{14}}_[\w-]{{20,}}\.ndjson\.gz$')
+
+    def test_download_requires_owner(self):
+        with tempfile.TemporaryDirectory() as export_root, override_settings(EXPORT_ROOT=export_root):
+            name = export_test_results(self.test.id, self.teacher.id, 'attempts', 'csv')
+            url = reverse('test_export_download', args=[self.test.id, name])
+            self.assertIn(self.client.get(url).status_code, (401, 403))
+
+            self.client.force_login(self.teacher)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(f'filename="{name}"', response['Content-Disposition'])
+            self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 2)
+            # names of other tests or outside the export directory are refused
+            self.assertEqual(self.client.get(reverse('test_export_download', args=[self.test.id, 'test_1_x'])).status_code, 404)
+
+            other = User.objects.create_user(
+                username='other', email='other@example.com', password='Test@1234', role=Role.TEACHER, is_verified=True
+            )
+            self.client.force_login(other)
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_stream_requires_owner(self):
+        self.teacher.is_verified = True
+        self.teacher.save()
+        self.client.force_login(self.teacher)
+        response = self.client.get(f'/api/tests/{self.test.id}/export/?kind=attempts')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+        self.assertEqual(self.client.get(f'/api/tests/{self.test.id}/export/?output=xml').status_code, 400)
+
+        other = User.objects.create_user(
+            username='other', email='other@example.com', password='Test@1234', role=Role.TEACHER, is_verified=True
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(f'/api/tests/{self.test.id}/export/').status_code, 404)
+
+
+class KeysetPaginationTest(ExaminationTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher.is_verified = True
+        self.teacher.save()
+        tests = [
+            Test(title=f'Test {i}', created_by=self.teacher, subject=self.subject,
+                 scoring_scheme={'correct': 1, 'incorrect': 0})
+            for i in range(6)
+        ]
+        Test.objects.bulk_create(tests)
+        # equal timestamps exercise the id tie-breaker
+        Test.objects.filter(created_by=self.teacher).update(created_at=timezone.now())
+        self.expected = list(Test.objects.filter(created_by=self.teacher).order_by('-id').values_list('id', flat=True))
+        # record the cached COUNT keys, so only those are deleted from the Redis DB shared with the app
+        patcher = mock.patch('apps.common.pagination.cache', wraps=cache)
+        self.count_cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache.delete_many([call.args[0] for call in self.count_cache.get_or_set.call_args_list])
+        delete_redis_keys(f'{QuestionIndexService.PREFIX}:*')
+
+    def test_walks_every_test_once_in_both_directions(self):
+        self.client.force_login(self.teacher)
+        url, seen, pages = '/api/tests/?page_size=3&include_total=1', [], []
+        while url:
+            data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+            self.assertEqual(data['count'], 7)
+            pages.append(data)
+            seen += [test['id'] for test in data['results']]
+            url = data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        data = self.client.get(pages[2]['previous'], HTTP_ACCEPT='application/json').json()
+        self.assertEqual([test['id'] for test in data['results']], self.expected[3:6])
+        self.assertIsNotNone(data['previous'])
+
+        response = self.client.get('/api/tests/?cursor=bogus', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_question_filters_use_index_or_subquery(self):
+        QuestionIndexService.rebuild()
+        self.client.force_login(self.teacher)
+        url = '/api/tests/?difficulty=Easy&include_total=1'
+        data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(([test['id'] for test in data['results']], data['count']), ([self.test.id], 1))
+        # more matching questions than MAX_IN_IDS: same answer through the SQL subquery
+        with mock.patch.object(QuestionIndexService, 'MAX_IN_IDS', 2):
+            data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+        self.assertEqual(([test['id'] for test in data['results']], data['count']), ([self.test.id], 1))
+
+    def test_total_of_an_empty_index_match_is_zero(self):
+        QuestionIndexService.rebuild()
+        self.client.force_login(self.teacher)
+        response = self.client.get('/api/tests/?difficulty=Hard&include_total=1', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['results'], response.json()['count']), ([], 0))
+
+    def test_student_attempts_are_paginated(self):
+        self.client.force_login(self.student)
+        data = self.client.get('/api/attempts/?page_size=1', HTTP_ACCEPT='application/json').json()
+        self.assertEqual([attempt['id'] for attempt in data['results']], [self.attempt.id])
+        self.assertIsNone(data['next'])
+        self.assertNotIn('count', data)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import TestCreateView, TestListView,TestDetailView, TestUpdateView, TestDeleteView, TestListView, TestAttemptView, StudentResponseView,TestResultsView
+from .views import TestCreateView, TestListView,TestDetailView, TestUpdateView, TestDeleteView, TestListView, TestExportView, TestExportDownloadView, TestAttemptView, AttemptAutosaveView, StudentResponseView,TestResultsView
 
 urlpatterns = [
     path('tests/', TestListView.as_view(), name='test_list'),
@@ -7,9 +7,12 @@ urlpatterns = [
     path('tests/create/', TestCreateView.as_view(), name='test_create'),
     path('tests/<int:pk>/update/', TestUpdateView.as_view(), name='test_update'),
     path('tests/<int:pk>/delete/', TestDeleteView.as_view(), name='test_delete'),
+    path('tests/<int:pk>/export/', TestExportView.as_view(), name='test_export'),
+    path('tests/<int:pk>/export/<str:name>/', TestExportDownloadView.as_view(), name='test_export_download'),
 
     path('attempts/', TestAttemptView.as_view(), name='attempt_list'),
     path('attempts/<int:pk>/', TestAttemptView.as_view(), name='attempt_detail'),
+    path('attempts/<int:pk>/autosave/', AttemptAutosaveView.as_view(), name='attempt_autosave'),
     path('responses/', StudentResponseView.as_view(), name='response_create'),
 
     path('results/test/<int:test_id>/', TestResultsView.as_view(), name='test_results'),
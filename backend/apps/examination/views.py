@@ -5,7 +5,16 @@ from rest_framework import status, permissions
 from apps.common.authentication import CookieTokenAuthentication
 from .models import Test, TestAttempt
 from .serializers import TestSerializer,TestAttemptSerializer, StudentResponseSerializer
-from apps.common.throttles import CustomUserRateThrottle
+from .services.autosave_service import AutosaveService
+from .services.exam_packet_service import ExamPacketService
+from .services.shuffle_service import ShuffleService
+from .services.export_service import ExportService
+from apps.content.services.question_pool_service import QuestionPoolService
+from apps.content.services.question_index_service import QuestionIndexService
+from .tasks import export_test_results
+from rest_framework import serializers
+from apps.common.throttles import CustomUserRateThrottle, AutosaveRateThrottle
+from apps.common.pagination import KeysetPaginator
 from apps.accounts.models import User
 from django.core.paginator import Paginator, EmptyPage
 from django.utils import timezone
@@ -18,6 +27,7 @@ from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.contrib import messages
 from django.shortcuts import redirect
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.renderers import TemplateHTMLRenderer, JSONRenderer
 from rest_framework.authentication import SessionAuthentication
 from django.core.paginator import Paginator, EmptyPage
@@ -92,10 +102,12 @@ class TestCreateView(APIView):
                 topics = raw.getlist('question_filters_topic')  # Support multiple topics
                 if topics:
                     python_data['question_filters'] = {'topic': topics}
-                    difficulty_map = {'Easy': 'E', 'Medium': 'M', 'Hard': 'H'}
                     diff = raw.get('question_filters_difficulty', '').strip()
-                    if diff in ['E', 'M', 'H']:
-                        python_data['question_filters']['difficulty'] = difficulty_map[diff]
+                    if diff in QuestionPoolService.DIFFICULTY_NAMES:
+                        python_data['question_filters']['difficulty'] = diff
+                    count = raw.get('question_filters_count', '').strip()
+                    if count:
+                        python_data['question_filters']['count'] = count
                 else:
                     python_data['question_filters'] = {}
             else:
@@ -247,11 +259,14 @@ class TestUpdateView(APIView):
                 processed_data['question_filters'] = {}
                 if topics:
                     processed_data['question_filters']['topic'] = topics
-                    difficulty_map = {'Easy': 'E', 'Medium': 'M', 'Hard': 'H'}
                     diff = raw.get('question_filters_difficulty', '').strip() or (test.question_filters.get('difficulty') if test.question_filters else '')
-                    if diff in ['E', 'M', 'H']:
-                        processed_data['question_filters']['difficulty'] = difficulty_map[diff]
+                    if diff in QuestionPoolService.DIFFICULTY_NAMES:
+                        processed_data['question_filters']['difficulty'] = diff
+                    count = raw.get('question_filters_count', '').strip() or (test.question_filters.get('count') if test.question_filters else '')
+                    if count:
+                        processed_data['question_filters']['count'] = count
                 processed_data['questions'] = []
+                processed_data['redraw'] = bool(raw.get('question_filters_redraw'))
             else:
                 processed_data['questions'] = raw.getlist('questions') or [q.id for q in test.questions.all()]
                 processed_data['question_filters'] = {}
@@ -365,6 +380,7 @@ class TestListView(APIView):
         # Initialize filter Q objects
         filters = Q()
         question_filters = Q()
+        index_filters = {}
 
         # Subject filter (direct on Test model)
         if subject_id := request.query_params.get('subject'):
@@ -379,9 +395,10 @@ class TestListView(APIView):
 
         # Topic filter (through questions)
         if topic_id := request.query_params.get('topic'):
-            try:
+            if topic_id.isdigit():
                 question_filters &= Q(topics__id=topic_id)
-            except ValueError:
+                index_filters['topic_ids'] = [int(topic_id)]
+            else:
                 logger.error(f"Invalid topic ID: {topic_id}")
 
         # Difficulty filter (through questions)
@@ -389,6 +406,7 @@ class TestListView(APIView):
             difficulty_map = {'Easy': 'E', 'Medium': 'M', 'Hard': 'H'}
             if mapped_diff := difficulty_map.get(difficulty):
                 question_filters &= Q(difficulty=mapped_diff)
+                index_filters['difficulty'] = mapped_diff
 
         # Date filter
         if created_after := request.query_params.get('created_after'):
@@ -397,18 +415,24 @@ class TestListView(APIView):
             except (ValueError, TypeError):
                 logger.error(f"Invalid date format: {created_after}")
 
-        # Apply question-related filters through questions relationship
+        # Apply question-related filters through questions relationship; the Redis
+        # index resolves the matching question ids without a subquery when built,
+        # unless there are too many of them to send as an IN list
         if question_filters:
-            filters &= Q(questions__in=Question.objects.filter(question_filters))
+            question_ids = QuestionIndexService.query(**index_filters)
+            if question_ids is None or len(question_ids) > QuestionIndexService.MAX_IN_IDS:
+                filters &= Q(questions__in=Question.objects.filter(question_filters))
+            else:
+                filters &= Q(questions__id__in=question_ids)
 
         # Final queryset with distinct results
         queryset = base_query.filter(filters).distinct()
 
-        logger.debug(f"Final queryset for {request.user.email}: {queryset.values('id', 'title', 'duration')}")
+        logger.debug(f"Test list filters for {request.user.email}: {dict(request.query_params)}")
 
         # Pagination for HTML
         if request.accepted_renderer.format == 'html':
-            paginator = Paginator(queryset, 20)
+            paginator = Paginator(queryset.order_by('-created_at', '-id'), 20)
             page = request.query_params.get('page', 1)
             
             try:
@@ -439,9 +463,15 @@ class TestListView(APIView):
                 template_name=template_name
             )
 
-        # JSON response
-        serializer = TestSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # JSON response, keyset-paginated on (created_at, id)
+        paginator = KeysetPaginator(queryset, request)
+        try:
+            tests = paginator.paginate()
+        except ValueError as e:
+            logger.warning(f"Invalid pagination for test list by {request.user.email}: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TestSerializer(tests, many=True)
+        return Response(paginator.get_data(serializer.data))
 
 
 @method_decorator(ensure_csrf_cookie, name='dispatch')
@@ -486,11 +516,13 @@ class TestDetailView(APIView):
         # Add attempt history for students
         if request.user.role == 'ST':
             attempts = TestAttempt.objects.filter(test=test, student=request.user).order_by('-end_time')
+            # Same for every attempt row; the serializer already loaded the question ids.
+            max_score = len(data['questions']) * test.scoring_scheme.get('correct', 1)
             data['attempts'] = [
                 {
                     'id': attempt.id,
                     'score': attempt.score,
-                    'max_score': test.questions.count() * test.scoring_scheme.get('correct', 1),
+                    'max_score': max_score,
                     'end_time': attempt.end_time,
                     'attempt_number': i + 1
                 } for i, attempt in enumerate(attempts)
@@ -517,21 +549,42 @@ class TestAttemptView(APIView):
         logger.debug('Processing GET request for TestAttemptView')
         if pk:
             try:
-                attempt = TestAttempt.objects.get(pk=pk, student=request.user)
+                attempt = TestAttempt.objects.select_related('test').get(pk=pk, student=request.user)
                 serializer = TestAttemptSerializer(attempt)
+                packet_questions = ExamPacketService.get_packet(attempt.test)['questions']
+                questions = ShuffleService.shuffle_questions(attempt, packet_questions)
                 if request.accepted_renderer.format == 'html':
-                    responses = StudentResponse.objects.filter(attempt=attempt)
+                    # Stored responses use the original labels; the page shows the shuffled ones.
+                    seed = ShuffleService.get_seed(attempt)
+                    labels = {q['id']: q['options'] for q in packet_questions}
+                    responses = {}
+                    for r in StudentResponse.objects.filter(attempt=attempt):
+                        r.selected_answer = ShuffleService.to_display(
+                            seed, r.question_id, labels.get(r.question_id, ()), r.selected_answer
+                        )
+                        responses[r.question_id] = r
+                    if not attempt.end_time:
+                        # Autosaved answers are newer than anything flushed to the database.
+                        for item in AutosaveService.get_sheet(attempt.id):
+                            responses[item['question']] = StudentResponse(
+                                question_id=item['question'],
+                                selected_answer=item['selected_answer'],
+                                time_taken=item['time_taken']
+                            )
                     return Response(
                         {
                             'user': request.user,
                             'attempt': attempt,
                             'test': attempt.test,
-                            'questions': attempt.test.questions.all(),
-                            'responses': {r.question.id: r for r in responses}
+                            'questions': questions,
+                            'responses': responses
                         },
                         template_name='examination/student/test_attempt.html'
                     )
-                return Response(serializer.data)
+                data = serializer.data
+                if not attempt.end_time:
+                    data['questions'] = questions
+                return Response(data)
             except TestAttempt.DoesNotExist:
                 logger.warning(f"Attempt {pk} not found for {request.user.email}")
                 if request.accepted_renderer.format == 'html':
@@ -540,13 +593,24 @@ class TestAttemptView(APIView):
                 return Response({"error": "Attempt not found"}, status=status.HTTP_404_NOT_FOUND)
 
         attempts = TestAttempt.objects.filter(student=request.user)
-        serializer = TestAttemptSerializer(attempts, many=True)
         if request.accepted_renderer.format == 'html':
             return Response(
                 {'user': request.user, 'attempts': attempts},
                 template_name='examination/student/test_attempts.html'
             )
-        return Response(serializer.data)
+        return self.paginated_attempts(request, attempts)
+
+    @staticmethod
+    def paginated_attempts(request, attempts):
+        """JSON page of `attempts`, keyset-paginated on (created_at, id)."""
+        paginator = KeysetPaginator(attempts, request)
+        try:
+            page = paginator.paginate()
+        except ValueError as e:
+            logger.warning(f"Invalid pagination for attempts of {request.user.email}: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TestAttemptSerializer(page, many=True)
+        return Response(paginator.get_data(serializer.data))
 
     def post(self, request):
         logger.debug(f"POST request data: {request.data}")
@@ -567,7 +631,7 @@ class TestAttemptView(APIView):
 
     def patch(self, request, pk):
         try:
-            attempt = TestAttempt.objects.get(pk=pk, student=request.user)
+            attempt = TestAttempt.objects.select_related('test').get(pk=pk, student=request.user)
         except TestAttempt.DoesNotExist:
             return Response({"error": "Attempt not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -577,119 +641,32 @@ class TestAttemptView(APIView):
         now = timezone.now()
         deadline = attempt.start_time + timedelta(minutes=attempt.test.duration)
         if now > deadline:
-            attempt.end_time = deadline
-            attempt.calculate_score()
-            attempt.save()
+            if AutosaveService.get_sheet(attempt.id):
+                attempt = AutosaveService.submit(attempt, end_time=deadline)
+            else:
+                attempt.end_time = deadline
+                attempt.calculate_score()
+                attempt.save()
             logger.info(f"Attempt {attempt.id} submitted by {request.user.email} with score {attempt.score}")
             return Response(
                 {"error": "Test duration expired", "score": attempt.score},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Validate scoring_scheme
-        scoring_scheme = attempt.test.scoring_scheme or {'correct': 1, 'incorrect': 0}
-        if not isinstance(scoring_scheme, dict) or 'correct' not in scoring_scheme:
-            logger.warning(f"Invalid scoring_scheme for test {attempt.test.id}: {scoring_scheme}")
-            scoring_scheme = {'correct': 1, 'incorrect': 0}
-        logger.debug(f"Scoring scheme for test {attempt.test.id}: {scoring_scheme}")
-
-        # Clear any prior responses
-        StudentResponse.objects.filter(attempt=attempt).delete()
-        logger.debug(f"Deleted prior StudentResponse objects for attempt {attempt.id}")
-
-        total_time = 0
-        correct_count = 0
-        total_q = attempt.test.questions.count()
-
-        if total_q == 0:
-            logger.warning(f"No questions found for test {attempt.test.id}")
-            attempt.end_time = now
-            attempt.score = 0
-            attempt.performance_metrics = {'accuracy': 0, 'avg_time_per_question': 0}
-            attempt.save()
-            logger.info(f"Attempt {attempt.id} submitted by {request.user.email} with score 0 (no questions)")
-            return Response({
-                'id': attempt.id,
-                'score': 0,
-                'performance_metrics': attempt.performance_metrics
-            }, status=status.HTTP_200_OK)
-
         # Handle both FormData (from test_attempt.html) and JSON (from API)
         resp_list = request.data.get('responses', [])
-        if not resp_list and request.POST:
-            # FormData case: parse request.POST
-            raw = request.POST
-            form_data_log = {key: raw.get(key) for key in raw}
+        raw_form = request.POST if not resp_list and request.POST else None
+        if raw_form is not None:
+            form_data_log = {key: raw_form.get(key) for key in raw_form}
             logger.debug(f"FormData received for attempt {attempt.id}: {form_data_log}")
-            resp_list = []
-            for question in attempt.test.questions.all():
-                ans = raw.get(f'answer_{question.id}', '').strip().upper()
-                time_taken = int(raw.get(f'time_taken_{question.id}', 0))
-                resp_list.append({
-                    'question': question.id,
-                    'selected_answer': ans,
-                    'time_taken': time_taken
-                })
         else:
-            # JSON case: log received payload
             logger.debug(f"JSON responses received for attempt {attempt.id}: {resp_list}")
 
-        for item in resp_list:
-            try:
-                q = Question.objects.get(pk=item['question'])
-            except Question.DoesNotExist:
-                logger.error(f"Question {item.get('question')} not found")
-                continue
-            ans = item.get('selected_answer', '').strip().upper() if item.get('selected_answer') else ''
-            is_correct = False
-            if ans:
-                is_correct = (ans == q.correct_answer.upper())
-                if is_correct:
-                    correct_count += 1
-            time_taken = int(item.get('time_taken', 0))
-            total_time += time_taken
-
-            # Log question details
-            logger.debug(f"Processing question {q.id}: correct_answer={q.correct_answer}, selected_answer={ans}, is_correct={is_correct}, time_taken={time_taken}")
-
-            serializer = StudentResponseSerializer(
-                data={
-                    'attempt': attempt.id,
-                    'question': q.id,
-                    'selected_answer': ans,
-                    'is_correct': is_correct,
-                    'time_taken': time_taken
-                },
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            response = serializer.save()
-            logger.debug(f"Created StudentResponse {response.id} for question {q.id}: selected_answer={ans}, is_correct={is_correct}, time_taken={time_taken}")
-
-        # Log StudentResponse objects after creation
-        responses = StudentResponse.objects.filter(attempt=attempt)
-        response_log = [
-            {
-                'response_id': r.id,
-                'question_id': r.question.id,
-                'selected_answer': r.selected_answer,
-                'is_correct': r.is_correct,
-                'time_taken': r.time_taken
-            } for r in responses
-        ]
-        logger.debug(f"StudentResponse objects for attempt {attempt.id}: {response_log}")
-
-        attempt.performance_metrics = {
-            'accuracy': correct_count / total_q if total_q else 0,
-            'avg_time_per_question': total_time / total_q if total_q else 0
-        }
-        logger.debug(f"Performance metrics for attempt {attempt.id}: correct_count={correct_count}, total_questions={total_q}, total_time={total_time}")
-
-        attempt.end_time = now
-        logger.debug(f"Calling calculate_score for attempt {attempt.id} with scoring_scheme={scoring_scheme}")
-        attempt.calculate_score()
-        logger.debug(f"Score calculated for attempt {attempt.id}: score={attempt.score}")
-        attempt.save()
+        try:
+            attempt = AutosaveService.submit(attempt, resp_list=resp_list, raw_form=raw_form, end_time=now)
+        except serializers.ValidationError as e:
+            logger.warning(f"Submission rejected for attempt {attempt.id}: {e.detail}")
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
         logger.info(f"Attempt {attempt.id} submitted by {request.user.email} with score {attempt.score}")
 
         return Response({
@@ -769,8 +746,7 @@ class TestResultsView(APIView):
                         {'user': request.user, 'attempts': attempts, 'test': test},
                         template_name='examination/student/test_results.html'
                     )
-                serializer = TestAttemptSerializer(attempts, many=True)
-                return Response(serializer.data)
+                return TestAttemptView.paginated_attempts(request, attempts)
             except Test.DoesNotExist:
                 logger.error(f"Test {test_id} not found for {request.user.email}")
                 if request.accepted_renderer.format == 'html':
@@ -785,8 +761,107 @@ class TestResultsView(APIView):
                 {'user': request.user, 'attempts': attempts},
                 template_name='examination/student/test_results.html'
             )
-        serializer = TestAttemptSerializer(attempts, many=True)
-        return Response(serializer.data)
+        return TestAttemptView.paginated_attempts(request, attempts)
+
+
+class AttemptAutosaveView(APIView):
+    """Autosave endpoint for in-progress answers.
+
+    PATCH/POST accept `{"answers": [{"question": id, "selected_answer": "A", "time_taken": 12}]}`
+    and merge them into the attempt's Redis sheet; GET returns the saved sheet.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStudent]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    renderer_classes = [JSONRenderer]
+    throttle_classes = [AutosaveRateThrottle]
+
+    def get(self, request, pk):
+        if not TestAttempt.objects.filter(pk=pk, student=request.user).exists():
+            return Response({"error": "Attempt not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': pk, 'answers': AutosaveService.get_sheet(pk)}, status=status.HTTP_200_OK)
+
+    def patch(self, request, pk):
+        try:
+            saved = AutosaveService.save_answers(pk, request.user, request.data.get('answers'))
+        except TestAttempt.DoesNotExist:
+            return Response({"error": "Attempt not found"}, status=status.HTTP_404_NOT_FOUND)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': pk, 'saved': saved}, status=status.HTTP_200_OK)
+
+    post = patch
+
+
+class TestExportView(APIView):
+    """Export a test's submitted attempts or responses.
+
+    GET streams `?kind=attempts|responses&output=csv|ndjson` directly; POST
+    with the same fields writes a gzip file under EXPORT_ROOT in the background
+    and notifies the teacher with its TestExportDownloadView URL.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    renderer_classes = [JSONRenderer]
+    throttle_classes = [CustomUserRateThrottle]
+
+    def get_export(self, request, pk, params):
+        if not request.user.is_active or not request.user.is_verified:
+            logger.warning(f"Inactive/unverified teacher {request.user.email} attempted to export test {pk}")
+            return None, None, None, Response({"error": "Account not active or verified"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            test = Test.objects.get(pk=pk, created_by=request.user)
+        except Test.DoesNotExist:
+            logger.warning(f"Test {pk} not found or not owned by {request.user.email}")
+            return None, None, None, Response({"error": "Test not found or not owned by you"}, status=status.HTTP_404_NOT_FOUND)
+        kind = params.get('kind', 'attempts')
+        output = params.get('output', 'csv')
+        try:
+            ExportService.validate(kind, output)
+        except ValueError as e:
+            return None, None, None, Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return test, kind, output, None
+
+    def get(self, request, pk):
+        test, kind, output, error = self.get_export(request, pk, request.query_params)
+        if error:
+            return error
+        response = StreamingHttpResponse(
+            ExportService.iter_lines(test.id, kind, output),
+            content_type=ExportService.FORMATS[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{ExportService.get_filename(test, kind, output)}"'
+        logger.info(f"Streaming {kind} export of test {test.id} for {request.user.email}")
+        return response
+
+    def post(self, request, pk):
+        test, kind, output, error = self.get_export(request, pk, request.data)
+        if error:
+            return error
+        export_test_results.delay(test.id, request.user.id, kind, output)
+        logger.info(f"Queued {kind} export of test {test.id} for {request.user.email}")
+        return Response(
+            {"message": "Export started. You will be notified when the file is ready."},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class TestExportDownloadView(APIView):
+    """Serve a background export file to the teacher who owns the test."""
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    throttle_classes = [CustomUserRateThrottle]
+
+    def get(self, request, pk, name):
+        try:
+            test = Test.objects.get(pk=pk, created_by=request.user)
+        except Test.DoesNotExist:
+            logger.warning(f"Test {pk} not found or not owned by {request.user.email}")
+            return Response({"error": "Test not found or not owned by you"}, status=status.HTTP_404_NOT_FOUND)
+        path = ExportService.get_export_path(test, name)
+        if not path:
+            return Response({"error": "Export not found"}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f"Serving export {name} of test {test.id} to {request.user.email}")
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name, content_type='application/gzip')
 
 
 class StudentResponseView(APIView):
@@ -1,3 +1,13 @@
 from django.contrib import admin
+from .models import MCQGenerationJob
 
-# Register your models here.
+
+@admin.register(MCQGenerationJob)
+class MCQGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_by', 'subject', 'status', 'processed_chunks', 'total_chunks', 'created_count', 'error_count', 'created_at')
+    list_filter = ('status', 'difficulty', 'created_at')
+    search_fields = ('created_by__email',)
+    readonly_fields = (
+        'total_chunks', 'processed_chunks', 'generated_count', 'created_count', 'error_count',
+        'errors', 'question_ids', 'message', 'started_at', 'finished_at'
+    )
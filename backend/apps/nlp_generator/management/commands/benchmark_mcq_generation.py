@@ -0,0 +1,102 @@
+# apps/nlp_generator/management/commands/benchmark_mcq_generation.py
+import random
+import re
+import time
+import spacy
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.nlp_generator.utils.mcq_generator import preprocess_paragraph, questions_from_doc
+
+SUBJECTS = ['The mitochondria', 'Photosynthesis', 'Isaac Newton', 'The French Revolution', 'An electric current',
+            'The water cycle', 'Marie Curie', 'A chemical reaction', 'The human heart', 'Plate tectonics']
+VERBS = ['produces', 'explains', 'transformed', 'depends on', 'releases', 'describes', 'changed', 'requires']
+OBJECTS = ['energy in living cells', 'the motion of planets', 'the political structure of Europe',
+           'a flow of electrons through a conductor', 'evaporation and condensation of water',
+           'radioactivity in heavy elements', 'oxygen for the muscles', 'the shape of continents over time',
+           'heat and light from fuel', 'the balance of forces on a body']
+CLAUSES = ['according to modern textbooks', 'during the nineteenth century', 'in most laboratory experiments',
+           'under normal conditions', 'as scientists discovered later', 'in the natural environment']
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks MCQ generation over a paragraph corpus: per-sentence re-parsing, single parse, and nlp.pipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paragraphs', type=int, default=100, help='Number of paragraphs in the corpus')
+        parser.add_argument('--sentences', type=int, default=6, help='Sentences per synthetic paragraph')
+        parser.add_argument('--file', help='Text file to take paragraphs from (blank-line separated) instead')
+        parser.add_argument('--batch-size', type=int, default=settings.MCQ_SPACY_BATCH_SIZE)
+        parser.add_argument('--n-process', type=int, default=settings.MCQ_SPACY_N_PROCESS)
+        parser.add_argument('--model', default=settings.MCQ_SPACY_MODEL)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def corpus(self, options):
+        rng = random.Random(options['seed'])
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as handle:
+                paragraphs = [p.strip() for p in re.split(r'\n\s*\n', handle.read()) if p.strip()]
+            if not paragraphs:
+                return []
+            return [paragraphs[i % len(paragraphs)] for i in range(options['paragraphs'])]
+        return [
+            ' '.join(
+                f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(CLAUSES)}."
+                for _ in range(options['sentences'])
+            )
+            for _ in range(options['paragraphs'])
+        ]
+
+    def timed(self, label, run, count, baseline=None):
+        random.seed(0)
+        start = time.perf_counter()
+        questions = run()
+        elapsed = time.perf_counter() - start
+        line = f"{label}: {elapsed * 1000:.0f} ms ({count / elapsed:,.1f} paragraphs/s"
+        line += f", {questions} questions)" if questions is not None else ")"
+        if baseline:
+            line += f", speed-up x{baseline / elapsed:.1f}"
+        self.stdout.write(line)
+        return elapsed
+
+    def handle(self, *args, **options):
+        paragraphs = [preprocess_paragraph(p) for p in self.corpus(options)]
+        if not paragraphs:
+            self.stdout.write(self.style.ERROR("No paragraphs to benchmark"))
+            return
+        disabled = list(settings.MCQ_SPACY_DISABLE)
+        full = spacy.load(options['model'])
+        nlp = spacy.load(options['model'], disable=disabled)
+        count = len(paragraphs)
+        self.stdout.write(
+            f"{count} paragraphs, {sum(len(p) for p in paragraphs):,} characters; "
+            f"model {options['model']}, disabled {disabled or 'nothing'}, components {nlp.pipe_names}"
+        )
+        # Warm up vocab and lexeme caches so the first timing is not penalized
+        list(full.pipe(paragraphs[:10]))
+        list(nlp.pipe(paragraphs[:10]))
+
+        def reparse():
+            # Parsing cost of the previous generator: the paragraph, then every sentence again
+            for paragraph in paragraphs:
+                doc = full(paragraph)
+                for sent in doc.sents:
+                    full(sent.text.strip())
+            return None
+
+        baseline = self.timed("Per-sentence re-parse, full pipeline (parsing only)", reparse, count)
+        self.timed(
+            "Single parse per paragraph, full pipeline",
+            lambda: sum(len(questions_from_doc(full(p))) for p in paragraphs), count, baseline
+        )
+        self.timed(
+            "Single parse per paragraph, components disabled",
+            lambda: sum(len(questions_from_doc(nlp(p))) for p in paragraphs), count, baseline
+        )
+        self.timed(
+            f"nlp.pipe (batch_size={options['batch_size']}, n_process={options['n_process']}), components disabled",
+            lambda: sum(
+                len(questions_from_doc(doc))
+                for doc in nlp.pipe(paragraphs, batch_size=options['batch_size'], n_process=options['n_process'])
+            ),
+            count, baseline
+        )
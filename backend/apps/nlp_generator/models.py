@@ -1,3 +1,37 @@
 from django.db import models
+from apps.common.models import TimeStampedModel
+from apps.content.models import Subject, Topic, JobStatus
 
-# Create your models here.
+
+class MCQGenerationJob(TimeStampedModel):
+    """Background MCQ generation from pasted paragraphs or an uploaded document."""
+    created_by = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='mcq_generation_jobs')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='mcq_generation_jobs')
+    topics = models.ManyToManyField(Topic, related_name='mcq_generation_jobs')
+    difficulty = models.CharField(max_length=1, choices=[('E', 'Easy'), ('M', 'Medium'), ('H', 'Hard')])
+    source_text = models.TextField()
+    status = models.CharField(max_length=20, choices=JobStatus.choices, default=JobStatus.PENDING)
+    total_chunks = models.PositiveIntegerField(default=0)
+    processed_chunks = models.PositiveIntegerField(default=0)
+    generated_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # [{'question_text': ..., 'errors': {field: message}}], capped; error_count has the full number
+    errors = models.JSONField(default=list, blank=True)
+    question_ids = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_by', 'created_at'])]
+
+    @property
+    def progress(self) -> int:
+        """Percentage of chunks processed."""
+        if not self.total_chunks:
+            return 100 if self.status == JobStatus.COMPLETED else 0
+        return int(100 * self.processed_chunks / self.total_chunks)
+
+    def __str__(self):
+        return f"MCQ generation {self.id} ({self.status})"
@@ -1,4 +1,24 @@
 from rest_framework import serializers
+from .models import MCQGenerationJob
 # nlp_generator/serializers.py
 class ParagraphInputSerializer(serializers.Serializer):
-     paragraph = serializers.CharField(trim_whitespace=False, allow_blank=True)
+     paragraph = serializers.CharField(trim_whitespace=False, allow_blank=True, required=False)
+     document = serializers.FileField(required=False)
+
+     def validate(self, data):
+          if not (data.get('paragraph') or '').strip() and not data.get('document'):
+               raise serializers.ValidationError({"paragraph": ["Enter a paragraph or upload a text document."]})
+          return data
+
+
+class MCQGenerationJobSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = MCQGenerationJob
+        fields = [
+            'id', 'subject', 'topics', 'difficulty', 'status', 'total_chunks', 'processed_chunks', 'progress',
+            'generated_count', 'created_count', 'error_count', 'errors', 'question_ids', 'message',
+            'started_at', 'finished_at', 'created_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,134 @@
+# apps/nlp_generator/services/generation_service.py
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import re
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from apps.content.models import JobStatus
+from apps.content.services.import_service import QuestionImportService
+from apps.content.utils.validations import validate_question_text
+from apps.nlp_generator.models import MCQGenerationJob
+from apps.nlp_generator.utils.mcq_generator import generate_mcqs_batch
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MCQGenerationService:
+    """Chunked MCQ generation for a MCQGenerationJob.
+
+    The source text is split into chunks of whole paragraphs (or sentences,
+    for paragraphs longer than CHUNK_CHARS). Chunks are parsed in batches by
+    `nlp.pipe` and the job row is updated after each one, so clients can
+    poll progress. Generated questions get the per-question text checks of
+    `validate_question_text`; the remaining validation, the batched duplicate
+    check and the bulk insert are those of the question import
+    (`QuestionImportService.process_batch`), SAVE_BATCH_SIZE questions at a time.
+    """
+
+    CHUNK_CHARS = 2000
+    QUESTIONS_PER_CHUNK = 5
+    SAVE_BATCH_SIZE = 100
+    MAX_REPORTED_ERRORS = 500
+
+    @staticmethod
+    def split_chunks(text: str) -> List[str]:
+        """Pack the paragraphs of `text` into chunks of at most about CHUNK_CHARS characters."""
+        limit = MCQGenerationService.CHUNK_CHARS
+        pieces = []
+        for paragraph in re.split(r'\n\s*\n', text or ''):
+            paragraph = ' '.join(paragraph.split())
+            if len(paragraph) <= limit:
+                pieces.append(paragraph)
+            else:
+                pieces.extend(re.split(r'(?<=[.!?])\s+', paragraph))
+
+        chunks, current = [], ''
+        for piece in pieces:
+            if not piece:
+                continue
+            if current and len(current) + len(piece) + 1 > limit:
+                chunks.append(current)
+                current = ''
+            current = f"{current} {piece}" if current else piece
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def build_record(question: Dict[str, Any], job: MCQGenerationJob, topic_ids: List[int]) -> Dict[str, Any]:
+        return {
+            **question,
+            'topics': topic_ids,
+            'difficulty': job.difficulty,
+            'question_type': 'MCQ',
+            'source': 'auto_nlp',
+        }
+
+    @staticmethod
+    def save_batch(
+        job: MCQGenerationJob,
+        batch: List[Tuple[int, Dict[str, Any]]],
+        topics: Dict[str, Dict],
+        seen: set,
+    ) -> List[Dict[str, Any]]:
+        """Validate and bulk-insert generated records; returns their errors keyed by question text."""
+        question_ids, errors = QuestionImportService.process_batch(batch, topics, seen, job.created_by_id)
+        texts = {number: record['question_text'] for number, record in batch}
+        job.question_ids.extend(question_ids)
+        job.created_count += len(question_ids)
+        return [{'question_text': texts[error['row']], 'errors': error['errors']} for error in errors]
+
+    @staticmethod
+    def run(job: MCQGenerationJob, progress: Optional[Callable[[MCQGenerationJob], None]] = None) -> MCQGenerationJob:
+        """Generate and save the job's questions, saving the job after every chunk."""
+        service = MCQGenerationService
+        chunks = service.split_chunks(job.source_text)
+        job.status = JobStatus.RUNNING
+        job.started_at = timezone.now()
+        job.total_chunks = len(chunks)
+        job.save(update_fields=['status', 'started_at', 'total_chunks', 'updated_at'])
+
+        job_topics = list(job.topics.select_related('subject'))
+        topic_ids = [topic.id for topic in job_topics]
+        topics = {'by_id': {topic.id: topic for topic in job_topics}, 'by_name': {}}
+        seen: set = set()
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+
+        def record_errors(errors):
+            job.error_count += len(errors)
+            job.errors.extend(errors[:max(service.MAX_REPORTED_ERRORS - len(job.errors), 0)])
+
+        for chunk_questions in generate_mcqs_batch(chunks, max_questions=service.QUESTIONS_PER_CHUNK):
+            rejected = []
+            for question in chunk_questions:
+                job.generated_count += 1
+                try:
+                    validate_question_text(question['question_text'])
+                except ValidationError as e:
+                    rejected.append({'question_text': question['question_text'], 'errors': {'question_text': e.messages[0]}})
+                    continue
+                pending.append((job.generated_count, service.build_record(question, job, topic_ids)))
+            if len(pending) >= service.SAVE_BATCH_SIZE:
+                rejected.extend(service.save_batch(job, pending, topics, seen))
+                pending = []
+            record_errors(rejected)
+            job.processed_chunks += 1
+            job.save(update_fields=[
+                'processed_chunks', 'generated_count', 'created_count', 'error_count',
+                'errors', 'question_ids', 'updated_at'
+            ])
+            if progress:
+                progress(job)
+
+        if pending:
+            record_errors(service.save_batch(job, pending, topics, seen))
+
+        job.status = JobStatus.COMPLETED
+        job.message = f"Saved {job.created_count} of {job.generated_count} generated questions ({job.error_count} rejected)"
+        job.finished_at = timezone.now()
+        job.save(update_fields=[
+            'created_count', 'error_count', 'errors', 'question_ids',
+            'status', 'message', 'finished_at', 'updated_at'
+        ])
+        logger.info(f"MCQ generation {job.id}: {job.message}")
+        return job
@@ -0,0 +1,47 @@
+from celery import shared_task
+from django.utils import timezone
+from apps.content.models import JobStatus
+from apps.nlp_generator.models import MCQGenerationJob
+from apps.nlp_generator.services.generation_service import MCQGenerationService
+from apps.notifications.models import Notification
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def generate_mcq_questions(self, job_id):
+    """Run an MCQ generation job, reporting per-chunk progress through the job row and the task state."""
+    logger.info(f"Starting generate_mcq_questions for job {job_id}")
+    try:
+        job = MCQGenerationJob.objects.get(pk=job_id)
+    except MCQGenerationJob.DoesNotExist:
+        logger.warning(f"No MCQGenerationJob found for job {job_id}")
+        return None
+
+    def report(job):
+        if not self.request.id:
+            return
+        self.update_state(state='PROGRESS', meta={
+            'processed_chunks': job.processed_chunks,
+            'total_chunks': job.total_chunks,
+            'generated_count': job.generated_count,
+            'created_count': job.created_count,
+        })
+
+    try:
+        job = MCQGenerationService.run(job, progress=report)
+    except Exception as e:
+        logger.error(f"Error in generate_mcq_questions for job {job_id}: {str(e)}")
+        MCQGenerationJob.objects.filter(pk=job_id).update(
+            status=JobStatus.FAILED, message=f"Generation failed: {str(e)}", finished_at=timezone.now()
+        )
+        raise
+
+    Notification.objects.create(
+        user_id=job.created_by_id,
+        message=f"MCQ generation {job.id} finished: {job.message}",
+        notification_type=Notification.NotificationType.GENERAL
+    )
+    return job.created_count
@@ -1,3 +1,132 @@
+import random
+from unittest import mock
+import spacy
+from spacy.tokens import Doc
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.accounts.models import User
+from apps.common.choices.role import Role
+from apps.content.models import Subject, Topic, Question, JobStatus
+from apps.content.services.duplicate_index_service import DuplicateIndexService
+from apps.content.services.question_index_service import QuestionIndexService
+from .models import MCQGenerationJob
+from .services.generation_service import MCQGenerationService
+from .tasks import generate_mcq_questions
+from .utils.mcq_generator import DistractorIndex, questions_from_doc
 
-# Create your tests here.
+
+def fake_generate(paragraphs, max_questions=5):
+    """One deterministic MCQ per sentence, standing in for the spaCy pipeline."""
+    for paragraph in paragraphs:
+        yield [
+            {
+                'question_text': sentence.strip().rstrip('.').replace('energy', '_____', 1) + '.',
+                'options': {'A': 'energy', 'B': 'matter', 'C': 'charge', 'D': 'force'},
+                'correct_answer': 'A',
+            }
+            for sentence in paragraph.split('. ') if 'energy' in sentence
+        ][:max_questions]
+
+
+@mock.patch('apps.nlp_generator.services.generation_service.generate_mcqs_batch', side_effect=fake_generate)
+class MCQGenerationJobTest(TestCase):
+    TEXT = (
+        "A moving body always carries kinetic energy with it. Stretched springs store potential energy for later use.\n\n"
+        "A moving body always carries kinetic energy with it. Fuel burning in engines releases chemical energy quickly."
+    )
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='Test@1234', role=Role.TEACHER, is_verified=True
+        )
+        self.subject = Subject.objects.create(name='Physics')
+        self.topic = Topic.objects.create(subject=self.subject, name='Energy')
+        self.client = APIClient()
+        self.client.force_login(self.teacher)
+
+    def tearDown(self):
+        # the Redis DB is shared with the app: take the generated questions back out of the indexes
+        question_ids = list(Question.objects.values_list('id', flat=True))
+        Question.objects.filter(id__in=question_ids).delete()
+        QuestionIndexService.reindex(question_ids)
+        DuplicateIndexService.reindex(question_ids)
+
+    def test_split_chunks_packs_paragraphs(self, generate):
+        with mock.patch.object(MCQGenerationService, 'CHUNK_CHARS', 60):
+            chunks = MCQGenerationService.split_chunks(
+                "First short paragraph.\n\nSecond one.\n\n" + "A long sentence that goes on. " * 4
+            )
+        self.assertEqual(chunks[0], "First short paragraph. Second one.")
+        self.assertTrue(all(len(chunk) <= 60 for chunk in chunks))
+        self.assertEqual(sum(chunk.count('A long sentence') for chunk in chunks), 4)
+
+    def test_post_queues_job_and_saves_questions_in_bulk(self, generate):
+        with mock.patch.object(generate_mcq_questions, 'delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('generate_mcq'),
+                {'paragraph': self.TEXT, 'subject': self.subject.id, 'topics': [self.topic.id], 'difficulty': 'M'},
+                HTTP_ACCEPT='application/json',
+            )
+        self.assertEqual(response.status_code, 202, response.content)
+        job = MCQGenerationJob.objects.get(pk=response.json()['id'])
+        delay.assert_called_once_with(job.id)
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['status'], JobStatus.PENDING)
+
+        with mock.patch.object(MCQGenerationService, 'CHUNK_CHARS', 120), self.captureOnCommitCallbacks(execute=True):
+            generate_mcq_questions(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.COMPLETED, job.message)
+        self.assertEqual((job.total_chunks, job.processed_chunks), (2, 2))
+        # The repeated sentence is rejected as a duplicate of the first one
+        self.assertEqual((job.generated_count, job.created_count, job.error_count), (4, 3, 1))
+        saved = Question.objects.filter(id__in=job.question_ids)
+        self.assertEqual(saved.count(), 3)
+        self.assertFalse(saved.exclude(source='auto_nlp', difficulty='M', is_active=False).exists())
+        self.assertIn('finished', self.teacher.notifications.get().message)
+
+        status_response = self.client.get(response.json()['status_url'])
+        self.assertEqual(status_response.json()['progress'], 100)
+        self.assertEqual(status_response.json()['created_count'], 3)
+
+    def test_text_or_document_is_required(self, generate):
+        response = self.client.post(
+            reverse('generate_mcq'),
+            {'paragraph': ' ', 'subject': self.subject.id, 'topics': [self.topic.id], 'difficulty': 'M'},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MCQGenerationJob.objects.exists())
+
+
+class MCQGeneratorTest(TestCase):
+    NOUNS = {'Plants', 'sunlight', 'energy', 'Chlorophyll', 'light', 'leaf'}
+
+    def make_doc(self):
+        # Tagged by hand so the test does not need a trained pipeline
+        words = (
+            "Plants convert sunlight into chemical energy daily . "
+            "Chlorophyll absorbs light inside every green leaf ."
+        ).split()
+        pos = ['NOUN' if w in self.NOUNS else 'PUNCT' if w == '.' else 'VERB' if w in ('convert', 'absorbs') else 'ADJ'
+               for w in words]
+        sent_starts = [w in ('Plants', 'Chlorophyll') for w in words]
+        return Doc(spacy.blank('en').vocab, words=words, pos=pos, sent_starts=sent_starts)
+
+    def test_questions_use_sentence_spans_and_same_pos_distractors(self):
+        random.seed(7)
+        questions = questions_from_doc(self.make_doc(), max_questions=5)
+        self.assertEqual(len(questions), 2)
+        for question in questions:
+            answer = question['options'][question['correct_answer']]
+            self.assertIn('_____', question['question_text'])
+            self.assertEqual(len(set(question['options'].values())), 4)
+            self.assertTrue(set(question['options'].values()) <= self.NOUNS)
+            self.assertNotIn(answer, question['question_text'].split())
+
+    def test_distractor_index_skips_every_spelling_of_the_answer(self):
+        doc = Doc(spacy.blank('en').vocab, words=['Energy', 'energy', 'mass', 'force', 'charge'], pos=['NOUN'] * 5)
+        index = DistractorIndex(doc)
+        for _ in range(20):
+            picked = index.sample('NOUN', 'energy')
+            self.assertEqual(sorted(picked), ['charge', 'force', 'mass'])
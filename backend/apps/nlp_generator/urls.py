@@ -1,7 +1,7 @@
 from django.urls import path
-from .views import MCQGenerationView
+from .views import MCQGenerationView, MCQGenerationJobView
 
 urlpatterns = [
     path('generate-mcq/', MCQGenerationView.as_view(), name='generate_mcq'),
-   
-]
\ No newline at end of file
+    path('generate-mcq/jobs/<int:pk>/', MCQGenerationJobView.as_view(), name='mcq_generation_status'),
+]
@@ -1,153 +1,172 @@
 import random
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
 import spacy
+from django.conf import settings
 
-nlp = spacy.load("en_core_web_sm")
+_nlp = None
+_nlp_lock = threading.Lock()
 
+PUNCTUATION = {".", ",", ";", "(", ")", "-", "_"}
+ANSWER_POS = ("NOUN", "PROPN")
+MIN_SENTENCE_WORDS = 5
+
+# Context-aware fallbacks based on POS
+FALLBACK_OPTIONS = {
+    "NOUN": ["Concept", "Element", "Principle", "Theory"],
+    "PROPN": ["Newton", "Einstein", "Galileo", "Curie"],
+}
+DEFAULT_FALLBACK_OPTIONS = ["Term", "Idea", "Object", "Entity"]
+
+
+def get_nlp():
+    """The spaCy pipeline, loaded on first use with MCQ_SPACY_DISABLE components switched off.
+
+    Only sentence boundaries (parser), POS tags (tagger, attribute_ruler) and
+    lexical attributes are used, so components like `ner` and `lemmatizer`
+    can be disabled to save time per document.
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                _nlp = spacy.load(settings.MCQ_SPACY_MODEL, disable=list(settings.MCQ_SPACY_DISABLE))
+    return _nlp
 
-import re
 
 def preprocess_paragraph(paragraph):
     paragraph = paragraph.replace("—", " ").replace("–", " ").replace("�", "")
     paragraph = re.sub(r'[^\w\s.,!?]', ' ', paragraph)  # Keep basic punctuation, remove odd characters
     return paragraph.strip()
 
-def generate_mcqs(paragraph, max_questions=5):
-    paragraph = preprocess_paragraph(paragraph)
-    doc = nlp(paragraph)
-    questions = []
-    sentences = [sent.text.strip() for sent in doc.sents if len(sent.text.strip().split()) >= 5]
+
+def _count_lowered(texts: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = defaultdict(int)
+    for text in texts:
+        counts[text.lower()] += 1
+    return counts
+
+
+class DistractorIndex:
+    """Distinct token texts of a document bucketed by POS, built in one pass over the doc."""
+
+    def __init__(self, doc):
+        buckets: Dict[str, Dict[str, None]] = defaultdict(dict)
+        for token in doc:
+            if len(token.text) > 2 and token.text.strip() not in PUNCTUATION:
+                buckets[token.pos_][token.text] = None
+        self.buckets = {pos: list(texts) for pos, texts in buckets.items()}
+        self.lowered = {pos: _count_lowered(texts) for pos, texts in self.buckets.items()}
+
+    def sample(self, pos: str, answer: str, count: int = 3) -> List[str]:
+        """Up to `count` random texts tagged `pos` that differ from the answer (case-insensitively)."""
+        bucket = self.buckets.get(pos, [])
+        # Draw enough to cover every spelling of the answer that has to be dropped
+        skip = self.lowered.get(pos, {}).get(answer.lower(), 0)
+        picked = random.sample(bucket, min(len(bucket), count + skip))
+        return [text for text in picked if text.lower() != answer.lower()][:count]
+
+
+def question_from_sentence(sent, distractors: DistractorIndex) -> Optional[dict]:
+    """Blank one random noun of the sentence span and build four labeled options, or None."""
+    sentence = sent.text.strip()
+    candidate_tokens = [
+        token for token in sent
+        if token.pos_ in ANSWER_POS
+        and not token.is_stop
+        and len(token.text) > 2
+    ]
+    if not candidate_tokens:
+        return None
+
+    answer_token = random.choice(candidate_tokens)
+    answer = answer_token.text
+    question_text = sentence.replace(answer, "_____", 1)  # Replace only first occurrence
+
+    # Skip if replacement failed or question is too short
+    if question_text == sentence or len(question_text.split()) < MIN_SENTENCE_WORDS or "_____" not in question_text:
+        return None
+
+    options = distractors.sample(answer_token.pos_, answer)
+    fallback_options = FALLBACK_OPTIONS.get(answer_token.pos_, DEFAULT_FALLBACK_OPTIONS)
+    for fallback in random.sample(fallback_options, len(fallback_options)):
+        if len(options) == 3:
+            break
+        if fallback != answer and fallback not in options:
+            options.append(fallback)
+
+    # Ensure unique options
+    all_options = options + [answer]
+    if len(all_options) != 4 or len(set(all_options)) != 4:
+        return None
+
+    random.shuffle(all_options)
+    labeled_options = dict(zip(['A', 'B', 'C', 'D'], all_options))
+    correct_option_label = next(label for label, text in labeled_options.items() if text == answer)
+    return {
+        "question_text": question_text.strip(),
+        "correct_answer": correct_option_label,
+        "options": labeled_options
+    }
+
+
+def questions_from_doc(doc, max_questions=5):
+    """Generate up to `max_questions` MCQs from a parsed document.
+
+    The document is parsed once: sentences are its `doc.sents` spans and
+    distractors come from a POS index built once per document. Sentences are
+    taken in random order; if that yields fewer than `max_questions`,
+    sentences that produced nothing get a second try with another answer.
+    """
+    distractors = DistractorIndex(doc)
+    sentences = [sent for sent in doc.sents if len(sent.text.strip().split()) >= MIN_SENTENCE_WORDS]
 
     # Shuffle sentences to ensure variety
     random.shuffle(sentences)
 
+    questions = []
+    failed = []
     for sentence in sentences:
-        sent_doc = nlp(sentence)
-        candidate_tokens = [
-            token for token in sent_doc
-            if token.pos_ in ["NOUN", "PROPN"]
-            and not token.is_stop
-            and len(token.text) > 2
-        ]
-
-        if not candidate_tokens:
-            continue
-
-        answer_token = random.choice(candidate_tokens)
-        answer = answer_token.text
-        question_text = sentence.replace(answer, "_____", 1)  # Replace only first occurrence
-
-        # Skip if replacement failed or question is too short
-        if question_text == sentence or len(question_text.split()) < 5 or "_____" not in question_text:
+        question = question_from_sentence(sentence, distractors)
+        if question is None:
+            failed.append(sentence)
             continue
-
-        # Generate distractors
-        distractor_pool = [
-            token.text for token in doc
-            if token.text.lower() != answer.lower()
-            and token.pos_ == answer_token.pos_
-            and len(token.text) > 2
-            and token.text.strip() not in [".", ",", ";", "(", ")", "-", "_"]
-        ]
-
-        # Remove duplicates and shuffle
-        distractor_pool = list(dict.fromkeys(distractor_pool))
-        random.shuffle(distractor_pool)
-
-        distractors = []
-        for d in distractor_pool:
-            if d.lower() != answer.lower() and d not in distractors:
-                distractors.append(d)
-            if len(distractors) == 3:
-                break
-
-        # Context-aware fallbacks based on POS
-        fallback_options = {
-            "NOUN": ["Concept", "Element", "Principle", "Theory"],
-            "PROPN": ["Newton", "Einstein", "Galileo", "Curie"]
-        }.get(answer_token.pos_, ["Term", "Idea", "Object", "Entity"])
-
-        while len(distractors) < 3:
-            fallback = random.choice(fallback_options)
-            if fallback != answer and fallback not in distractors:
-                distractors.append(fallback)
-
-        # Ensure unique options
-        all_options = distractors + [answer]
-        if len(set(all_options)) != 4:  # Skip if options aren't unique
-            continue
-
-        random.shuffle(all_options)
-        labeled_options = dict(zip(['A', 'B', 'C', 'D'], all_options))
-        correct_option_label = next(label for label, text in labeled_options.items() if text == answer)
-
-        questions.append({
-            "question_text": question_text.strip(),
-            "correct_answer": correct_option_label,
-            "options": labeled_options
-        })
-
+        questions.append(question)
         if len(questions) >= max_questions:
-            break
-
-    # If fewer than max_questions, try to generate more from remaining sentences
-    if len(questions) < max_questions and len(sentences) > len(questions):
-        for sentence in sentences[len(questions):]:
-            sent_doc = nlp(sentence)
-            candidate_tokens = [
-                token for token in sent_doc
-                if token.pos_ in ["NOUN", "PROPN"]
-                and not token.is_stop
-                and len(token.text) > 2
-            ]
-
-            if not candidate_tokens:
-                continue
-
-            answer_token = random.choice(candidate_tokens)
-            answer = answer_token.text
-            question_text = sentence.replace(answer, "_____", 1)
-
-            if question_text == sentence or len(question_text.split()) < 5 or "_____" not in question_text:
-                continue
-
-            distractor_pool = [
-                token.text for token in doc
-                if token.text.lower() != answer.lower()
-                and token.pos_ == answer_token.pos_
-                and len(token.text) > 2
-                and token.text.strip() not in [".", ",", ";", "(", ")", "-", "_"]
-            ]
-
-            distractor_pool = list(dict.fromkeys(distractor_pool))
-            random.shuffle(distractor_pool)
-
-            distractors = []
-            for d in distractor_pool:
-                if d.lower() != answer.lower() and d not in distractors:
-                    distractors.append(d)
-                if len(distractors) == 3:
-                    break
-
-            while len(distractors) < 3:
-                fallback = random.choice(fallback_options.get(answer_token.pos_, ["Term", "Idea", "Object", "Entity"]))
-                if fallback != answer and fallback not in distractors:
-                    distractors.append(fallback)
-
-            all_options = distractors + [answer]
-            if len(set(all_options)) != 4:
-                continue
-
-            random.shuffle(all_options)
-            labeled_options = dict(zip(['A', 'B', 'C', 'D'], all_options))
-            correct_option_label = next(label for label, text in labeled_options.items() if text == answer)
-
-            questions.append({
-                "question_text": question_text.strip(),
-                "correct_answer": correct_option_label,
-                "options": labeled_options
-            })
+            return questions
 
+    for sentence in failed:
+        question = question_from_sentence(sentence, distractors)
+        if question is not None:
+            questions.append(question)
             if len(questions) >= max_questions:
                 break
-
     return questions
+
+
+def generate_mcqs(paragraph, max_questions=5):
+    return questions_from_doc(get_nlp()(preprocess_paragraph(paragraph)), max_questions)
+
+
+def generate_mcqs_batch(
+    paragraphs: Iterable[str],
+    max_questions: int = 5,
+    batch_size: Optional[int] = None,
+    n_process: Optional[int] = None,
+) -> Iterator[List[dict]]:
+    """Yield the MCQs of each paragraph, in order, parsing them with `nlp.pipe`.
+
+    Results are produced lazily, so callers can report progress between
+    paragraphs. `n_process` > 1 forks worker processes, which daemonic
+    processes (such as Celery prefork children) cannot do.
+    """
+    docs = get_nlp().pipe(
+        (preprocess_paragraph(paragraph) for paragraph in paragraphs),
+        batch_size=batch_size or settings.MCQ_SPACY_BATCH_SIZE,
+        n_process=n_process or settings.MCQ_SPACY_N_PROCESS,
+    )
+    for doc in docs:
+        yield questions_from_doc(doc, max_questions)
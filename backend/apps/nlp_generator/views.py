@@ -7,13 +7,16 @@ from rest_framework.permissions import AllowAny,IsAuthenticated
 from apps.common.authentication import CookieTokenAuthentication
 from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
 from django.contrib import messages
-from apps.content.serializers import QuestionSerializer
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import ensure_csrf_cookie
 from apps.common.throttles import CustomUserRateThrottle
 from apps.common.permissions import IsTeacher
-from .serializers import ParagraphInputSerializer
-from apps.nlp_generator.utils.mcq_generator import generate_mcqs
+from .serializers import ParagraphInputSerializer, MCQGenerationJobSerializer
+from .models import MCQGenerationJob
+from .tasks import generate_mcq_questions
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
 from django.shortcuts import redirect
 from django.contrib import messages
 from apps.content.models import Topic,Subject
@@ -89,7 +92,7 @@ class MCQGenerationView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         
-        paragraph = request.data.get("paragraph")
+        paragraph = request.data.get("paragraph") or ""
         topic_ids = request.data.getlist("topics")
         logger.debug(f"topic_ids: {topic_ids}")
         difficulty = request.data.get("difficulty")
@@ -104,6 +107,16 @@ class MCQGenerationView(APIView):
                 raise ValueError("No valid topics selected")
             if difficulty not in ['E', 'M', 'H']:
                 raise ValueError("Invalid difficulty level")
+            document = serializer.validated_data.get('document')
+            if document:
+                if document.size > settings.MCQ_GENERATION_MAX_CHARS:
+                    raise ValueError("Document is too large")
+                try:
+                    paragraph = document.read().decode('utf-8-sig')
+                except UnicodeDecodeError:
+                    raise ValueError("Document must be a UTF-8 text file")
+            if len(paragraph) > settings.MCQ_GENERATION_MAX_CHARS:
+                raise ValueError(f"Text must be under {settings.MCQ_GENERATION_MAX_CHARS} characters")
         except (ValueError, Subject.DoesNotExist) as e:
             if request.accepted_renderer.format == 'html':
                 messages.error(request, str(e))
@@ -121,48 +134,34 @@ class MCQGenerationView(APIView):
                 )
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        generated_questions = generate_mcqs(paragraph)
-        logger.debug(f"Generated {len(generated_questions)} questions: {generated_questions}")
-
-        saved_questions = []
-        errors = []
-
-        for q_data in generated_questions:
-            serializer = QuestionSerializer(data={
-                **q_data,
-                "subject": subject.id,
-                "topics": [t.id for t in topics],
-                "difficulty": difficulty,
-                "question_type": "MCQ",
-            }, context={"request": request})
-
-            if serializer.is_valid():
-                question = serializer.save()
-                saved_questions.append(question)
-            else:
-                errors.append({
-                    "question_text": q_data["question_text"],
-                    "errors": serializer.errors
-                })
-                logger.warning(f"Validation error for question: {q_data['question_text']} - {serializer.errors}")
+        job = MCQGenerationJob.objects.create(
+            created_by=request.user, subject=subject, difficulty=difficulty, source_text=paragraph
+        )
+        job.topics.set(topics)
+        transaction.on_commit(lambda: generate_mcq_questions.delay(job.id))
+        logger.info(f"MCQ generation {job.id} ({len(paragraph)} chars) queued by {request.user.email}")
 
         if request.accepted_renderer.format == 'html':
-            if saved_questions:
-                messages.success(request, f"{len(saved_questions)} questions were generated and saved successfully.")
-                return redirect('question_list')
-            if errors:
-                messages.warning(request, f"{len(errors)} questions failed validation: {', '.join([e['question_text'][:50] for e in errors])}")
-            if not generated_questions:
-                messages.warning(request, "No valid MCQs could be generated from the provided paragraph.")
+            messages.success(request, "MCQ generation started. You will be notified when the questions are saved.")
             return redirect("generate_mcq")
-
         return Response(
-            {
-                "saved_count": len(saved_questions),
-                "saved_questions": QuestionSerializer(saved_questions, many=True).data,
-                "errors": errors,
-            },
-            status=status.HTTP_201_CREATED if saved_questions else status.HTTP_400_BAD_REQUEST
+            {**MCQGenerationJobSerializer(job).data, 'status_url': reverse('mcq_generation_status', args=[job.id])},
+            status=status.HTTP_202_ACCEPTED
         )
 
 
+class MCQGenerationJobView(APIView):
+    """Progress and results of a queued MCQ generation job."""
+    permission_classes = [IsAuthenticated, IsTeacher]
+    authentication_classes = [CookieTokenAuthentication, SessionAuthentication]
+    renderer_classes = [JSONRenderer]
+    throttle_classes = [CustomUserRateThrottle]
+
+    def get(self, request, pk):
+        try:
+            job = MCQGenerationJob.objects.prefetch_related('topics').get(pk=pk, created_by=request.user)
+        except MCQGenerationJob.DoesNotExist:
+            return Response({"error": "Generation job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(MCQGenerationJobSerializer(job).data)
+
+
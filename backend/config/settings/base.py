@@ -2,6 +2,7 @@ from pathlib import Path
 from decouple import config, Csv
 import sys
 from datetime import timedelta
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -145,6 +146,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Result exports contain student data; kept out of MEDIA_ROOT and served only to the test owner
+EXPORT_ROOT = config('EXPORT_ROOT', default=str(BASE_DIR / 'private' / 'exports'))
+# Uploaded question banks hold answer keys; kept out of MEDIA_ROOT and deleted after the import
+IMPORT_ROOT = config('IMPORT_ROOT', default=str(BASE_DIR / 'private' / 'imports'))
 
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -176,7 +181,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        'autosave': '120/min'
     },
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',  # For ReactJS
@@ -238,6 +244,45 @@ CELERY_TIMEZONE = 'Asia/Karachi' #Your Time Zone
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Largest accepted bulk question import upload
+QUESTION_IMPORT_MAX_BYTES = config('QUESTION_IMPORT_MAX_BYTES', default=100 * 1024 * 1024, cast=int)
+# Longest text (characters, or bytes for uploaded documents) accepted for one MCQ generation job
+MCQ_GENERATION_MAX_CHARS = config('MCQ_GENERATION_MAX_CHARS', default=1000000, cast=int)
+# spaCy pipeline for MCQ generation; only the parser and POS tagging are used
+MCQ_SPACY_MODEL = config('MCQ_SPACY_MODEL', default='en_core_web_sm')
+MCQ_SPACY_DISABLE = config('MCQ_SPACY_DISABLE', cast=Csv(), default='ner,lemmatizer')
+MCQ_SPACY_BATCH_SIZE = config('MCQ_SPACY_BATCH_SIZE', default=32, cast=int)
+# Processes for nlp.pipe; keep 1 inside Celery prefork workers, which cannot fork children
+MCQ_SPACY_N_PROCESS = config('MCQ_SPACY_N_PROCESS', default=1, cast=int)
+# Seconds during which repeated analytics triggers for the same key collapse into one run
+ANALYTICS_COALESCE_WINDOW = config('ANALYTICS_COALESCE_WINDOW', default=30, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'flush-autosaved-attempts': {
+        'task': 'apps.examination.tasks.flush_autosaved_attempts',
+        'schedule': timedelta(seconds=config('AUTOSAVE_FLUSH_INTERVAL', default=60, cast=int)),
+    },
+    'build-history-rollups': {
+        'task': 'apps.analytics.tasks.build_history_rollups',
+        'schedule': crontab(hour=config('HISTORY_ROLLUP_HOUR', default=2, cast=int), minute=0),
+    },
+    'analyze-item-statistics': {
+        'task': 'apps.analytics.tasks.analyze_item_statistics',
+        'schedule': crontab(hour=config('ITEM_ANALYSIS_HOUR', default=3, cast=int), minute=0),
+    },
+    'calibrate-items': {
+        'task': 'apps.analytics.tasks.calibrate_items',
+        'schedule': crontab(hour=config('IRT_CALIBRATION_HOUR', default=4, cast=int), minute=0),
+        'kwargs': {'model': config('IRT_MODEL', default='2PL')},
+    },
+    'rebuild-question-index': {
+        'task': 'apps.content.tasks.rebuild_question_index',
+        'schedule': crontab(hour=config('QUESTION_INDEX_REBUILD_HOUR', default=1, cast=int), minute=30),
+    },
+    'compact-test-analytics': {
+        'task': 'apps.analytics.tasks.compact_test_analytics',
+        'schedule': timedelta(seconds=config('ANALYTICS_COMPACT_INTERVAL', default=60, cast=int)),
+    },
+}
 
 
 # Authentication strategy configuration